@@ -0,0 +1,216 @@
+"""Bulk-ingest a directory or ZIP archive of documents into the RAG store.
+
+Usage:
+    python -m app.cli.ingest path/to/library [--workers 4] [--batch-chunks 1024]
+    python -m app.cli.ingest course.zip
+
+Text extraction and chunking run in a process pool, chunks from many
+documents are embedded together, and files whose content hash was already
+ingested are skipped. Completed documents are recorded in a manifest after each batch
+is persisted, so an interrupted run picks up where it stopped.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Set
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+from app.config import Config
+from app.utils.file_handlers import file_sha256
+
+MANIFEST_PATH = "data/ingest_manifest.jsonl"
+
+_processor = None
+_split = None
+
+
+def iter_documents(root: str) -> Iterator[str]:
+    """Yield supported files under ``root`` in a stable order"""
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() in Config.ALLOWED_EXTENSIONS:
+                yield os.path.join(directory, name)
+
+
+def load_manifest(path: str) -> Set[str]:
+    done = set()
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)['content_hash'])
+                except (json.JSONDecodeError, KeyError):
+                    continue
+    return done
+
+
+def _init_worker():
+    global _processor, _split
+    from functools import partial
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from app.services.chunking import StructuredChunker, split_document
+    from app.services.document_processor import DocumentProcessor
+    _processor = DocumentProcessor()
+    # Same settings as RAGService, so add_documents can store these chunks as they are
+    _split = partial(
+        split_document,
+        strategy=Config.CHUNKING_STRATEGY,
+        chunker=StructuredChunker(chunk_size=Config.CHUNK_SIZE, chunk_overlap=Config.CHUNK_OVERLAP),
+        text_splitter=RecursiveCharacterTextSplitter(
+            chunk_size=Config.CHUNK_SIZE, chunk_overlap=Config.CHUNK_OVERLAP, length_function=len
+        ),
+    )
+
+
+def _extract(path: str, content_hash: str, upload_folder: str) -> Dict:
+    """Runs in a worker process: store the file content-addressed, extract and chunk it"""
+    from app.utils.file_handlers import content_addressed_path
+
+    file_ext = os.path.splitext(path)[1].lower()
+    stored_path = content_addressed_path(upload_folder, content_hash, file_ext)
+    if not os.path.exists(stored_path):
+        tmp_path = f"{stored_path}.{os.getpid()}.tmp"
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, stored_path)
+
+    document_data = _processor.process_document(stored_path, content_hash)
+    document_data['file_name'] = os.path.basename(path)
+    document_data['content_hash'] = content_hash
+    if document_data.get('content'):
+        document_data['chunks'] = _split(document_data)
+    return document_data
+
+
+def page_count(document_data: Dict) -> int:
+    pages = [b['page'] for b in document_data.get('blocks') or [] if b.get('page')]
+    return max(pages) if pages else 1
+
+
+class Progress:
+    def __init__(self, total: int):
+        self.total = total
+        self.start = time.perf_counter()
+        self.docs = self.pages = self.chunks = self.skipped = self.failed = 0
+
+    def report(self, final: bool = False):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        print(
+            f"{'done' if final else 'progress'}: {self.docs + self.skipped + self.failed}/{self.total} files "
+            f"({self.skipped} skipped, {self.failed} failed) | "
+            f"{self.docs / elapsed:.2f} docs/s, {self.pages / elapsed:.2f} pages/s, "
+            f"{self.chunks / elapsed:.2f} chunks/s",
+            flush=True
+        )
+
+
+def ingest(source: str, workers: int, batch_chunks: int, manifest_path: str,
+           upload_folder: str, rag_service=None) -> Progress:
+    extract_dir: Optional[str] = None
+    if zipfile.is_zipfile(source):
+        extract_dir = tempfile.mkdtemp(prefix="ingest_")
+        with zipfile.ZipFile(source) as archive:
+            archive.extractall(extract_dir)
+        root = extract_dir
+    elif os.path.isdir(source):
+        root = source
+    else:
+        raise SystemExit(f"{source} is neither a directory nor a ZIP archive")
+
+    try:
+        if rag_service is None and Config.RAG_SERVICE_ADDRESS:
+            # The shared RAG process owns the store while it is running
+            from app.services.rag_remote import RemoteRAGService
+            rag_service = RemoteRAGService(Config.RAG_SERVICE_ADDRESS, Config.RAG_SERVICE_AUTHKEY)
+        elif rag_service is None:
+            from app.services.rag_service import RAGService
+            # Batches are already large, so write them straight to the store
+            rag_service = RAGService(use_ingest_buffer=False)
+
+        done = load_manifest(manifest_path)
+        os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+        os.makedirs(upload_folder, exist_ok=True)
+
+        paths = list(iter_documents(root))
+        progress = Progress(len(paths))
+
+        # Hash first so duplicates and already-ingested files never reach the pool
+        jobs = []
+        for path in paths:
+            content_hash = file_sha256(path)
+            if content_hash in done:
+                progress.skipped += 1
+                continue
+            done.add(content_hash)
+            jobs.append((path, content_hash))
+
+        batch: List[Dict] = []
+        batch_size = 0
+
+        def write_batch():
+            nonlocal batch, batch_size
+            if not batch:
+                return
+            rag_service.add_documents(batch)
+            rag_service.flush()
+            with open(manifest_path, "a", encoding="utf-8") as manifest:
+                for doc in batch:
+                    manifest.write(json.dumps({
+                        'content_hash': doc['content_hash'],
+                        'file_name': doc['file_name'],
+                        'file_path': doc['file_path'],
+                    }) + "\n")
+            progress.report()
+            batch, batch_size = [], 0
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {
+                pool.submit(_extract, path, content_hash, upload_folder): path
+                for path, content_hash in jobs
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    document_data = future.result()
+                except Exception as e:
+                    progress.failed += 1
+                    print(f"Failed to extract {path}: {e}")
+                    continue
+
+                chunks = len(document_data.get('chunks') or ())
+                progress.docs += 1
+                progress.pages += page_count(document_data)
+                progress.chunks += chunks
+                batch.append(document_data)
+                batch_size += chunks
+                if batch_size >= batch_chunks:
+                    write_batch()
+
+        write_batch()
+        progress.report(final=True)
+        return progress
+    finally:
+        if extract_dir:
+            shutil.rmtree(extract_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory or .zip archive of documents")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="extraction processes (default: CPU count)")
+    parser.add_argument("--batch-chunks", type=int, default=1024,
+                        help="chunks to accumulate before embedding and writing a batch")
+    parser.add_argument("--manifest", default=MANIFEST_PATH,
+                        help="file recording ingested content hashes, used to resume")
+    args = parser.parse_args()
+
+    ingest(args.source, args.workers, args.batch_chunks, args.manifest, Config.UPLOAD_FOLDER)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Run the shared embedding and vector search process for multi-worker mode.
+
+Usage:
+    python -m app.cli.rag_server [--address data/rag.sock]
+    RAG_SERVICE_ADDRESS=data/rag.sock uvicorn app.main:app --workers 4
+
+The server loads the embedding model and opens the vector store once; API
+workers started with RAG_SERVICE_ADDRESS call it over the Unix socket
+instead of creating their own RAGService.
+"""
+import argparse
+import logging
+import signal
+
+from app.config import Config
+from app.utils.metrics import configure_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address", default=Config.RAG_SERVICE_ADDRESS or "data/rag.sock",
+                        help="Unix socket path to listen on")
+    parser.add_argument("--persist-directory", default=Config.CHROMA_PERSIST_DIRECTORY)
+    args = parser.parse_args()
+
+    configure_logging(getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO))
+
+    from app.services.rag_remote import RAGServer
+    from app.services.rag_service import RAGService
+
+    rag_service = RAGService(persist_directory=args.persist_directory)
+    server = RAGServer(rag_service, args.address, Config.RAG_SERVICE_AUTHKEY)
+
+    def stop(signum, frame):
+        server.close()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.close()
+        rag_service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Export the vector store to a snapshot file, or load one into it.
+
+Usage:
+    python -m app.cli.snapshot export data/vector_snapshot.zip
+    python -m app.cli.snapshot import data/vector_snapshot.zip [--replace]
+
+A snapshot holds the chunks, their metadata and vectors and the document
+records, so importing it needs no re-ingestion and no embedding. Ship one
+at VECTOR_SNAPSHOT_PATH and new instances load it on startup. With
+RAG_SERVICE_ADDRESS set the command goes through the running RAG server,
+which owns the store; paths are then resolved by the server.
+"""
+import argparse
+import json
+import os
+
+from app.config import Config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write the store to a snapshot file")
+    export_parser.add_argument("path")
+    import_parser = commands.add_parser("import", help="load a snapshot into the store")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--replace", action="store_true",
+                               help="delete every ingested document before loading")
+    parser.add_argument("--persist-directory", default=Config.CHROMA_PERSIST_DIRECTORY)
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.path)
+    if Config.RAG_SERVICE_ADDRESS:
+        from app.services.rag_remote import RemoteRAGService
+        rag_service = RemoteRAGService(Config.RAG_SERVICE_ADDRESS, Config.RAG_SERVICE_AUTHKEY)
+    else:
+        # Importing is this command's job; don't let startup load the same file first
+        Config.VECTOR_SNAPSHOT_PATH = ""
+        from app.services.rag_service import RAGService
+        rag_service = RAGService(persist_directory=args.persist_directory, use_ingest_buffer=False)
+
+    try:
+        if args.command == "export":
+            result = rag_service.export_snapshot(path)
+        else:
+            result = rag_service.import_snapshot(path, replace=args.replace)
+    finally:
+        rag_service.close()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Build the topic index of the knowledge base, or print it.
+
+Usage:
+    python -m app.cli.topics build [--topics 20] [--no-labels]
+    python -m app.cli.topics list
+
+``build`` clusters every chunk embedding with k-means, stores the topic ->
+chunk index next to the vector store and names each topic with one LLM
+call (keyword labels are kept if the model is unavailable or with
+``--no-labels``). Run it after large ingests; ``GET /topics`` and
+topic-scoped retrieval use the latest build. With RAG_SERVICE_ADDRESS set
+the clustering runs in the RAG server, which owns the store.
+"""
+import argparse
+import json
+import logging
+
+from app.config import Config
+from app.utils.metrics import configure_logging
+
+
+def label_topics(topics, gemini_service) -> dict:
+    """One model call per topic; topics whose call fails keep their keyword label"""
+    from app.services.gemini_service import GeminiUnavailableError
+
+    labels = {}
+    for topic in topics:
+        try:
+            labels[topic['topic_id']] = gemini_service.label_topic(topic['keywords'], topic['samples'])
+        except GeminiUnavailableError as e:
+            print(f"Could not label topic {topic['topic_id']} ({topic['label']}): {e}")
+    return labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="cluster the chunks and label the topics")
+    build_parser.add_argument("--topics", type=int, default=None,
+                              help="number of topics (default: TOPIC_COUNT, or sqrt(chunks / 2))")
+    build_parser.add_argument("--no-labels", action="store_true", help="keep keyword labels, no LLM calls")
+    commands.add_parser("list", help="print the current topics")
+    parser.add_argument("--persist-directory", default=Config.CHROMA_PERSIST_DIRECTORY)
+    args = parser.parse_args()
+
+    configure_logging(getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO))
+
+    if Config.RAG_SERVICE_ADDRESS:
+        from app.services.rag_remote import RemoteRAGService
+        rag_service = RemoteRAGService(Config.RAG_SERVICE_ADDRESS, Config.RAG_SERVICE_AUTHKEY)
+    else:
+        from app.services.rag_service import RAGService
+        rag_service = RAGService(persist_directory=args.persist_directory, use_ingest_buffer=False)
+
+    try:
+        if args.command == "build":
+            topics = rag_service.build_topics(args.topics)
+            if not args.no_labels:
+                from app.services.gemini_service import GeminiService
+                rag_service.label_topics(label_topics(topics, GeminiService()))
+        print(json.dumps(rag_service.list_topics(), indent=2, ensure_ascii=False))
+    finally:
+        rag_service.close()
+
+
+if __name__ == "__main__":
+    main()
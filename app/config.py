@@ -9,6 +9,21 @@ class Config:
     #OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+    # Override the API host, e.g. http://127.0.0.1:8089 for benchmarks/fake_llm_server.py
+    GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+    
+    # Gemini call policy
+    GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))  # seconds per attempt
+    GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+    GEMINI_RETRY_BASE_DELAY = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "0.5"))
+    GEMINI_RETRY_MAX_DELAY = float(os.getenv("GEMINI_RETRY_MAX_DELAY", "8"))
+    GEMINI_BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5"))  # consecutive failures
+    GEMINI_BREAKER_RESET = float(os.getenv("GEMINI_BREAKER_RESET", "30"))  # seconds open
+    GEMINI_HEDGE_DELAY = float(os.getenv("GEMINI_HEDGE_DELAY", "0"))  # 0 disables hedging on /ask
+    GEMINI_HEDGE_BUDGET = float(os.getenv("GEMINI_HEDGE_BUDGET", "0.1"))  # max share of calls that hedge
+    GEMINI_JSON_MODE = os.getenv("GEMINI_JSON_MODE", "true").lower() == "true"  # schema-constrained JSON output
+    MCQ_REASK_ATTEMPTS = int(os.getenv("MCQ_REASK_ATTEMPTS", "1"))  # follow-up calls for missing MCQs
+    SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"  # share identical in-flight calls
     
     # Database Configuration
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./tutor.db")
@@ -16,10 +31,101 @@ class Config:
     # File Upload Configuration
     UPLOAD_FOLDER = "static/uploads"
     MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+    UPLOAD_PART_SIZE = 8 * 1024 * 1024  # max size of one resumable upload part
+    # Resumable uploads expire after this many idle seconds; all open ones together may declare MAX_BYTES
+    UPLOAD_RESUME_TTL = int(os.getenv("UPLOAD_RESUME_TTL", str(24 * 3600)))
+    UPLOAD_RESUME_MAX_BYTES = int(os.getenv("UPLOAD_RESUME_MAX_BYTES", str(20 * MAX_FILE_SIZE)))
     ALLOWED_EXTENSIONS = {'.pdf', '.docx', '.txt', '.jpg', '.png', '.jpeg'}
     
     # Vector Database Configuration
     CHROMA_PERSIST_DIRECTORY = "data/embeddings"
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")  # chroma, numpy or faiss
+    # numpy backend only: float32, int8 or pca codes scanned at search time
+    VECTOR_CODEC = os.getenv("VECTOR_CODEC", "float32")
+    VECTOR_PCA_DIM = int(os.getenv("VECTOR_PCA_DIM", "128"))
+    VECTOR_RESCORE_FACTOR = int(os.getenv("VECTOR_RESCORE_FACTOR", "4"))  # candidates per result rescored exactly
+    VECTOR_KEEP_FLOAT = os.getenv("VECTOR_KEEP_FLOAT", "true").lower() == "true"  # false: codes only, smaller disk
+    # Loaded once at startup into a new persist directory, e.g. on a fresh serverless instance
+    VECTOR_SNAPSHOT_PATH = os.getenv("VECTOR_SNAPSHOT_PATH", "data/vector_snapshot.zip")
+    TOPIC_COUNT = int(os.getenv("TOPIC_COUNT", "0"))  # topics per index build; 0 picks sqrt(chunks / 2)
+    
+    # Ingestion Configuration
+    CHUNKING_STRATEGY = os.getenv("CHUNKING_STRATEGY", "structured")  # structured or recursive
+    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+    INGEST_BUFFER_ENABLED = os.getenv("INGEST_BUFFER_ENABLED", "true").lower() == "true"
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "512"))  # chunks per store write
+    INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "2.0"))  # seconds
+    
+    # Adaptive retrieval: k from the score distribution, no context below the threshold
+    ADAPTIVE_RETRIEVAL_ENABLED = os.getenv("ADAPTIVE_RETRIEVAL_ENABLED", "true").lower() == "true"
+    RETRIEVAL_MIN_K = int(os.getenv("RETRIEVAL_MIN_K", "1"))
+    RETRIEVAL_MAX_K = int(os.getenv("RETRIEVAL_MAX_K", "5"))
+    RETRIEVAL_SCORE_THRESHOLD = float(os.getenv("RETRIEVAL_SCORE_THRESHOLD", "1.4"))  # max distance, 2 - 2cos
+    RETRIEVAL_SCORE_MARGIN = float(os.getenv("RETRIEVAL_SCORE_MARGIN", "0.3"))  # keep results this close to the best
+    
+    # Query embedding micro-batching for concurrent searches
+    QUERY_BATCH_ENABLED = os.getenv("QUERY_BATCH_ENABLED", "true").lower() == "true"
+    QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", "32"))  # max queries per model call
+    QUERY_BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", "2"))  # extra wait to fill a batch
+    
+    # Study packs: summaries, revision notes and MCQs precomputed per document
+    STUDY_PACKS_ENABLED = os.getenv("STUDY_PACKS_ENABLED", "false").lower() == "true"
+    STUDY_PACK_DIRECTORY = "data/study_packs"
+    STUDY_PACK_MAX_SECTIONS = int(os.getenv("STUDY_PACK_MAX_SECTIONS", "12"))
+    STUDY_PACK_MCQS_PER_SECTION = int(os.getenv("STUDY_PACK_MCQS_PER_SECTION", "5"))
+    
+    # Extracted text cached per page, keyed by content hash and extractor version
+    EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() == "true"
+    EXTRACTION_CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", "data/extraction_cache.sqlite3")
+    EXTRACTION_CACHE_MAX_MB = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "512"))
+    
+    # Quiz sessions: server-side answer keys and live results, kept in the shared cache
+    QUIZ_TTL = int(os.getenv("QUIZ_TTL", "86400"))  # seconds a quiz stays available
+    QUIZ_MAX_ACTIVE = int(os.getenv("QUIZ_MAX_ACTIVE", "1000"))
+    QUIZ_MAX_ATTEMPTS = int(os.getenv("QUIZ_MAX_ATTEMPTS", "5000"))  # per quiz
+    
+    # Rubric grading: one cached rubric per question, duplicate answers reuse grades
+    RUBRIC_GRADING_ENABLED = os.getenv("RUBRIC_GRADING_ENABLED", "true").lower() == "true"
+    GRADE_REUSE_SIMILARITY = float(os.getenv("GRADE_REUSE_SIMILARITY", "0.97"))  # cosine of answer embeddings
+    GRADING_JOB_DIRECTORY = "data/grading_jobs"
+    
+    # Local pre-grading: empty, exact, clearly right or off-topic answers skip the model
+    PRE_GRADING_ENABLED = os.getenv("PRE_GRADING_ENABLED", "true").lower() == "true"
+    PRE_GRADE_CONFIDENCE = float(os.getenv("PRE_GRADE_CONFIDENCE", "0.9"))  # below this the LLM decides
+    PRE_GRADE_MATCH_SIMILARITY = float(os.getenv("PRE_GRADE_MATCH_SIMILARITY", "0.9"))  # cosine for full marks
+    PRE_GRADE_OFF_TOPIC_SIMILARITY = float(os.getenv("PRE_GRADE_OFF_TOPIC_SIMILARITY", "0.15"))
+    GRADING_JOB_WORKERS = int(os.getenv("GRADING_JOB_WORKERS", "4"))  # concurrent answers per job
+    
+    # Multi-worker mode: API workers call one shared RAG process over a Unix socket
+    RAG_SERVICE_ADDRESS = os.getenv("RAG_SERVICE_ADDRESS")  # e.g. data/rag.sock; unset runs RAG in-process
+    # Unset: the server writes a random key to <RAG_SERVICE_ADDRESS>.key (0600) and workers read it
+    RAG_SERVICE_AUTHKEY = os.getenv("RAG_SERVICE_AUTHKEY", "").encode() or None
+    SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "data/shared_cache.sqlite3")  # cross-worker state
+    
+    # HTTP caching: compressed responses, ETags and reuse of identical generations
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"  # brotli if installed, else gzip
+    COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "500"))
+    HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "300"))  # seconds clients keep study packs
+    STATIC_CACHE_MAX_AGE = int(os.getenv("STATIC_CACHE_MAX_AGE", "86400"))
+    # Seconds identical generation requests share one result; 0 (default) generates fresh material every time
+    GENERATION_CACHE_TTL = int(os.getenv("GENERATION_CACHE_TTL", "0"))
+    
+    # Admission control: worker slots shared by priority class, per API process
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "16"))  # gated requests running at once
+    ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))  # waiters per class before 429
+    ADMISSION_TENANT_QUEUE = int(os.getenv("ADMISSION_TENANT_QUEUE", "16"))  # waiters per tenant per class
+    ADMISSION_BATCH_SHARE = float(os.getenv("ADMISSION_BATCH_SHARE", "0.5"))  # slots batch work may hold
+    ADMISSION_INTERACTIVE_MAX_WAIT = float(os.getenv("ADMISSION_INTERACTIVE_MAX_WAIT", "5"))  # seconds queued
+    ADMISSION_STANDARD_MAX_WAIT = float(os.getenv("ADMISSION_STANDARD_MAX_WAIT", "15"))
+    ADMISSION_BATCH_MAX_WAIT = float(os.getenv("ADMISSION_BATCH_MAX_WAIT", "30"))
+    # Comma-separated proxy addresses whose X-Tenant-ID header is trusted; others are keyed by client address
+    ADMISSION_TRUSTED_PROXIES = [p.strip() for p in os.getenv("ADMISSION_TRUSTED_PROXIES", "").split(",") if p.strip()]
+    
+    # Observability Configuration
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     
     # Session Configuration
     SESSION_TIMEOUT = 3600
\ No newline at end of file
@@ -1,135 +1,607 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+import logging
 import os
-import shutil
+import time
+import uuid
 from typing import List
 
 from app.services.document_processor import DocumentProcessor
 from app.services.rag_service import RAGService
+from app.services.rag_remote import RemoteRAGService
 from app.services.mcp_service import MCPService
 from app.services.tutor_service import TutorService
 from app.services.grading_service import GradingService
+from app.services.grading_jobs import GradingJobService
+from app.services.study_pack_service import StudyPackService
+from app.services.quiz_service import AnswersHiddenError, QuizClosedError, QuizNotFoundError, QuizService
+from app.services.topic_index import TopicNotFoundError
 from app.config import Config
-from app.services.gemini_service import GeminiService
+from app.services.gemini_service import GeminiService, GeminiUnavailableError
+from app.services.document_registry import document_id
+from app.utils.file_handlers import (
+    MultipartFileStream,
+    ResumableUploadStore,
+    UploadNotFoundError,
+    UploadTooLargeError,
+    UploadsFullError,
+    save_upload_stream,
+)
+from app.utils.admission import AdmissionController, AdmissionMiddleware
+from app.utils.http_cache import CachedStaticFiles, CompressionMiddleware, etag_response
+from app.utils.shared_cache import SharedCache
+from app.utils.metrics import (
+    configure_logging,
+    registry,
+    reset_request_id,
+    set_request_id,
+)
+
+configure_logging(getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO))
+logger = logging.getLogger(__name__)
+
+HTTP_REQUESTS = registry.counter(
+    "tutor_http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+HTTP_LATENCY = registry.histogram(
+    "tutor_http_request_duration_seconds", "HTTP request latency", ["method", "route"]
+)
 
 app = FastAPI(title="AI Textbook Tutor", version="1.0.0")
+if Config.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=Config.COMPRESSION_MIN_BYTES)
+
+# Priority class per route; routes not listed (reads, metrics, static) are never queued
+ADMISSION_PRIORITIES = {
+    "/ask": "interactive",
+    "/grade": "interactive",
+    "/generate-mcq": "standard",
+    "/quizzes": "standard",
+    "/generate-summary": "batch",
+    "/upload": "batch",
+    "/uploads/{upload_id}/complete": "batch",
+    "/grade/jobs": "batch",
+}
+if Config.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware, controller=AdmissionController.from_config(Config), router=app.router,
+        priorities=ADMISSION_PRIORITIES, trusted_proxies=Config.ADMISSION_TRUSTED_PROXIES
+    )
 
 # Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="static", max_age=Config.STATIC_CACHE_MAX_AGE), name="static")
 
 # Templates
 templates = Jinja2Templates(directory="templates")
 
 # Initialize services
 document_processor = DocumentProcessor()
-rag_service = RAGService()
-mcp_service = MCPService()
-tutor_service = TutorService(rag_service.vectorstore, model_name="gemini")
-grading_service = GradingService()
+if Config.RAG_SERVICE_ADDRESS:
+    # Multi-worker mode: embeddings and vector search live in app.cli.rag_server
+    rag_service = RemoteRAGService(Config.RAG_SERVICE_ADDRESS, Config.RAG_SERVICE_AUTHKEY)
+else:
+    rag_service = RAGService()
+shared_cache = SharedCache(Config.SHARED_CACHE_PATH)
+mcp_service = MCPService(cache=shared_cache, ttl=Config.GENERATION_CACHE_TTL)
+tutor_service = TutorService(rag_service, model_name="gemini")
+grading_service = GradingService(embed=rag_service.embed_query, cache=shared_cache)
+grading_jobs = GradingJobService(
+    grading_service, Config.GRADING_JOB_DIRECTORY, workers=Config.GRADING_JOB_WORKERS, cache=shared_cache
+)
 gemini_service = GeminiService()
+study_pack_service = StudyPackService(
+    mcp_service, Config.STUDY_PACK_DIRECTORY,
+    max_sections=Config.STUDY_PACK_MAX_SECTIONS,
+    mcqs_per_section=Config.STUDY_PACK_MCQS_PER_SECTION,
+    cache=shared_cache
+)
+quiz_service = QuizService(
+    shared_cache, ttl=Config.QUIZ_TTL, max_quizzes=Config.QUIZ_MAX_ACTIVE, max_attempts=Config.QUIZ_MAX_ATTEMPTS
+)
+resumable_uploads = ResumableUploadStore(
+    Config.UPLOAD_FOLDER, Config.MAX_FILE_SIZE, Config.UPLOAD_PART_SIZE,
+    ttl=Config.UPLOAD_RESUME_TTL, max_reserved=Config.UPLOAD_RESUME_MAX_BYTES
+)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Tag the request with an id (propagated into logs) and record its latency"""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex[:16]
+    token = set_request_id(request_id)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        if Config.METRICS_ENABLED:
+            # Label by route template, not the raw path, to keep cardinality bounded
+            route = request.scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            HTTP_REQUESTS.inc(method=request.method, route=route_path, status=status)
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=request.method, route=route_path)
+        reset_request_id(token)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus-style counters and latency histograms"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("startup")
+def resume_background_work():
+    grading_jobs.resume_pending()
+
+@app.on_event("shutdown")
+def shutdown_services():
+    # Make sure buffered uploads reach the vector store before exit
+    rag_service.close()
+    study_pack_service.close()
+    grading_jobs.close()
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return etag_response(request, templates.TemplateResponse(request, "index.html"))
+
+def _check_upload_name(filename: str) -> str:
+    """Validate the client file name and return its extension"""
+    if not filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+    
+    file_ext = os.path.splitext(filename)[1].lower()
+    if file_ext not in Config.ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="File type not supported")
+    return file_ext
+
+def _too_large(error: UploadTooLargeError) -> HTTPException:
+    return HTTPException(status_code=413, detail=str(error))
+
+def _discard_document_files(record: dict, keep_path: str = None):
+    """Remove the stored upload and study pack of a deleted document version"""
+    if record.get('file_path') == keep_path:
+        return
+    if record.get('content_hash'):
+        study_pack_service.delete(record['content_hash'])
+        if document_processor.cache is not None:
+            document_processor.cache.delete(record['content_hash'])
+    if record.get('file_path') and os.path.exists(record['file_path']):
+        os.remove(record['file_path'])
+
+def _process_saved_upload(file_path: str, filename: str, content_hash: str, size: int,
+                          replaces: str = None) -> dict:
+    """Extract a stored upload and add it to the RAG system, optionally replacing a document"""
+    # Process document
+    try:
+        document_data = document_processor.process_document(file_path, content_hash)
+        document_data['file_name'] = filename
+        document_data['content_hash'] = content_hash
+        logger.info(f"Document processed successfully. Content length: {len(document_data['content'])}")
+    except Exception as doc_error:
+        logger.error(f"Error processing document: {doc_error}")
+        raise HTTPException(status_code=500, detail=f"Document processing error: {str(doc_error)}")
+    
+    # Add to RAG system
+    try:
+        if replaces:
+            replaced = rag_service.replace_document(replaces, document_data)
+            if replaced:
+                _discard_document_files(replaced, keep_path=file_path)
+        else:
+            rag_service.add_documents([document_data])
+        logger.info("Document added to RAG system successfully")
+    except Exception as rag_error:
+        logger.error(f"Error adding to RAG system: {rag_error}")
+        raise HTTPException(status_code=500, detail=f"RAG system error: {str(rag_error)}")
+    
+    # Summaries and MCQs are generated in the background, once per content hash
+    if Config.STUDY_PACKS_ENABLED:
+        study_pack = study_pack_service.schedule(document_data)
+    else:
+        study_pack = study_pack_service.status(content_hash)
+    
+    return {
+        "message": "Document uploaded and processed successfully",
+        "filename": filename,
+        "document_id": document_id(document_data),
+        "content_hash": content_hash,
+        "size": size,
+        "content_length": len(document_data['content']),
+        "study_pack": study_pack
+    }
 
 @app.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
-    """Upload and process documents"""
+async def upload_document(request: Request, replaces: str = None):
+    """Upload and process documents (multipart field ``file``); ``replaces`` swaps out an existing document.
+
+    The body is parsed here rather than through ``File(...)``, which would
+    spool the whole upload before any check ran.
+    """
     try:
-        # Validate file
-        if not file.filename:
-            raise HTTPException(status_code=400, detail="No file provided")
-        
-        file_ext = os.path.splitext(file.filename)[1].lower()
-        if file_ext not in Config.ALLOWED_EXTENSIONS:
-            raise HTTPException(status_code=400, detail="File type not supported")
-        
-        # Save file
-        file_path = os.path.join(Config.UPLOAD_FOLDER, file.filename)
-        os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        print(f"File saved to: {file_path}")
+        # Reject oversized requests before reading any of the body
+        declared_size = request.headers.get("content-length")
+        if declared_size and declared_size.isdigit() and int(declared_size) > Config.MAX_FILE_SIZE + 64 * 1024:
+            raise HTTPException(status_code=413, detail=f"File exceeds the {Config.MAX_FILE_SIZE} byte limit")
+        if replaces and await run_in_threadpool(rag_service.get_document, replaces) is None:
+            raise HTTPException(status_code=404, detail="Document to replace not found")
         
-        # Process document
         try:
-            document_data = document_processor.process_document(file_path)
-            print(f"Document processed successfully. Content length: {len(document_data['content'])}")
-        except Exception as doc_error:
-            print(f"Error processing document: {doc_error}")
-            raise HTTPException(status_code=500, detail=f"Document processing error: {str(doc_error)}")
+            upload = MultipartFileStream(request.stream(), request.headers.get("content-type"))
+            filename = await upload.open()
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        file_ext = _check_upload_name(filename)
         
-        # Add to RAG system
+        # Save file, hashing while writing; stops reading at the size limit
         try:
-            rag_service.add_documents([document_data])
-            print("Document added to RAG system successfully")
-        except Exception as rag_error:
-            print(f"Error adding to RAG system: {rag_error}")
-            raise HTTPException(status_code=500, detail=f"RAG system error: {str(rag_error)}")
+            file_path, content_hash, size = await save_upload_stream(
+                upload, Config.UPLOAD_FOLDER, file_ext, Config.MAX_FILE_SIZE
+            )
+        except UploadTooLargeError as e:
+            raise _too_large(e)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        return {
-            "message": "Document uploaded and processed successfully",
-            "filename": file.filename,
-            "content_length": len(document_data['content'])
-        }
+        logger.info(f"File saved to: {file_path}")
+        return await run_in_threadpool(
+            _process_saved_upload, file_path, filename, content_hash, size, replaces
+        )
     
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Unexpected error in upload: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Unexpected error in upload: {e}")
         raise HTTPException(status_code=500, detail=f"Upload error: {str(e)}")
 
+@app.post("/uploads")
+async def create_resumable_upload(request: dict):
+    """Start a resumable upload; parts are then sent with PUT /uploads/{id}/parts/{n}"""
+    filename = request.get("filename")
+    total_size = request.get("total_size")
+    file_ext = _check_upload_name(filename)
+    if not isinstance(total_size, int) or total_size <= 0:
+        raise HTTPException(status_code=400, detail="total_size must be a positive integer")
+    
+    try:
+        return await run_in_threadpool(resumable_uploads.create, filename, file_ext, total_size)
+    except UploadTooLargeError as e:
+        raise _too_large(e)
+    except UploadsFullError as e:
+        raise HTTPException(status_code=507, detail=str(e))
+
+@app.get("/uploads/{upload_id}")
+async def resumable_upload_status(upload_id: str):
+    """Report the parts received so far, so a client can resume"""
+    try:
+        return resumable_uploads.status(upload_id)
+    except UploadNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+@app.put("/uploads/{upload_id}/parts/{part_number}")
+async def upload_part(upload_id: str, part_number: int, request: Request):
+    """Receive one part of a resumable upload as the raw request body"""
+    if part_number < 0:
+        raise HTTPException(status_code=400, detail="part_number must be >= 0")
+    try:
+        return await resumable_uploads.write_part(upload_id, part_number, request.stream())
+    except UploadNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadTooLargeError as e:
+        raise _too_large(e)
+
+@app.post("/uploads/{upload_id}/complete")
+async def complete_resumable_upload(upload_id: str):
+    """Assemble a resumable upload and process it like /upload"""
+    try:
+        file_path, content_hash, size, state = await resumable_uploads.complete(upload_id)
+    except UploadNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    except UploadTooLargeError as e:
+        raise _too_large(e)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    logger.info(f"File saved to: {file_path}")
+    return await run_in_threadpool(_process_saved_upload, file_path, state['filename'], content_hash, size)
+
+def _llm_unavailable(error: GeminiUnavailableError) -> HTTPException:
+    """503 with a Retry-After hint while Gemini is failing"""
+    retry_after = max(1, int(error.retry_after + 0.999))
+    return HTTPException(
+        status_code=503,
+        detail="The tutor model is temporarily unavailable, please retry shortly",
+        headers={"Retry-After": str(retry_after)}
+    )
+
+@app.get("/documents")
+async def list_documents():
+    """Documents in the knowledge base"""
+    return {"documents": await run_in_threadpool(rag_service.list_documents)}
+
+@app.get("/documents/{doc_id}")
+async def get_document(doc_id: str):
+    record = await run_in_threadpool(rag_service.get_document, doc_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return record
+
+def _delete_document(doc_id: str) -> dict:
+    record = rag_service.delete_document(doc_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    _discard_document_files(record)
+    return record
+
+@app.delete("/documents/{doc_id}")
+async def delete_document(doc_id: str):
+    """Remove a document, its chunks, its study pack and the stored file"""
+    record = await run_in_threadpool(_delete_document, doc_id)
+    return {"message": "Document deleted", "document_id": doc_id, "chunks_deleted": record['chunk_count']}
+
+def _stored_pack(content_hash: str) -> dict:
+    pack = study_pack_service.get(content_hash)
+    if pack is None:
+        status = study_pack_service.status(content_hash)
+        raise HTTPException(status_code=404, detail=f"No study pack for this document (status: {status})")
+    return pack
+
+def _pack_sections(pack: dict, section) -> list:
+    if section is None:
+        return pack['sections']
+    try:
+        return [pack['sections'][int(section)]]
+    except (ValueError, TypeError, IndexError):
+        raise HTTPException(status_code=404, detail="Section not found")
+
+def _cacheable(request: Request, content: dict) -> JSONResponse:
+    """Generated study material: clients keep it briefly and revalidate with its ETag"""
+    return etag_response(request, JSONResponse(content), f"private, max-age={Config.HTTP_CACHE_MAX_AGE}")
+
+# Generation kind -> response field, for material readable under /generations
+GENERATION_FIELDS = {"mcq": "mcqs", "summary": "summary"}
+
+def _wants_fresh(request: dict, http_request: Request) -> bool:
+    """``"fresh": true`` or ``Cache-Control: no-cache`` skips a stored generation"""
+    cache_control = http_request.headers.get("cache-control", "").lower()
+    return bool(request.get("fresh")) or "no-cache" in cache_control or "no-store" in cache_control
+
+def _generated(kind: str, key: str, content: dict) -> JSONResponse:
+    """A POST generation's result; Content-Location names the GET resource that carries its ETag"""
+    response = JSONResponse(content)
+    if mcp_service.material(kind, key) is not None:
+        response.headers["Content-Location"] = f"/generations/{kind}/{key}"
+    return response
+
+@app.get("/generations/{kind}/{key}")
+async def get_generation(kind: str, key: str, http_request: Request):
+    """Generated MCQs or summary by the key from a POST's Content-Location, while it is cached"""
+    if kind not in GENERATION_FIELDS:
+        raise HTTPException(status_code=404, detail="Unknown generation kind")
+    material = await run_in_threadpool(mcp_service.material, kind, key)
+    if material is None:
+        raise HTTPException(status_code=404, detail="Generation not found or expired")
+    return _cacheable(http_request, {GENERATION_FIELDS[kind]: material})
+
+@app.get("/study-packs/{content_hash}")
+async def get_study_pack(content_hash: str, http_request: Request):
+    """Precomputed summaries, revision notes and MCQs for an uploaded document"""
+    return _cacheable(http_request, await run_in_threadpool(_stored_pack, content_hash))
+
+@app.get("/topics")
+async def list_topics(http_request: Request):
+    """Topics of the knowledge base, from the precomputed topic index"""
+    # Changes whenever the index is rebuilt, so always revalidate
+    return etag_response(http_request, JSONResponse(await run_in_threadpool(rag_service.list_topics)))
+
+def _topic_context(topic_id: str, topic: str) -> tuple:
+    """Label and most relevant passages of an indexed topic"""
+    labels = {t['topic_id']: t['label'] for t in rag_service.list_topics()['topics']}
+    if topic_id not in labels:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    results = rag_service.search_topic(topic_id, topic, k=5)
+    return topic or labels[topic_id], "\n\n".join(r['content'] for r in results)
+
 @app.post("/ask")
 async def ask_question(request: dict):
-    """Ask a question to the tutor"""
+    """Ask a question to the tutor, optionally restricted to one topic (topic_id)"""
     try:
         question = request.get("question")
         if not question:
             raise HTTPException(status_code=400, detail="Question is required")
+        topic_id = request.get("topic_id")
         
-        response = tutor_service.ask_question(question)
+        response = await run_in_threadpool(
+            tutor_service.ask_question, question, topic_id=None if topic_id is None else str(topic_id)
+        )
         return response
     
+    except HTTPException:
+        raise
+    except TopicNotFoundError:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    except GeminiUnavailableError as e:
+        raise _llm_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/generate-mcq")
-async def generate_mcq(request: dict):
-    """Generate MCQs for a topic"""
+async def generate_mcq(request: dict, http_request: Request):
+    """Generate MCQs for a topic, or for an indexed topic (topic_id)"""
     try:
         topic = request.get("topic")
         context = request.get("context", "")
         
+        # Serve the precomputed MCQ bank of an uploaded document
+        if request.get("content_hash"):
+            pack = await run_in_threadpool(_stored_pack, request["content_hash"])
+            sections = _pack_sections(pack, request.get("section"))
+            return {"mcqs": [mcq for s in sections for mcq in s['mcqs']]}
+        
+        # An indexed topic supplies its own label and passages
+        if request.get("topic_id") is not None:
+            topic, topic_context = await run_in_threadpool(_topic_context, str(request["topic_id"]), topic)
+            context = context or topic_context
+        
         if not topic:
             raise HTTPException(status_code=400, detail="Topic is required")
         
-        mcqs = mcp_service.generate_mcqs(topic, context)
-        return {"mcqs": mcqs}
+        mcqs = await run_in_threadpool(
+            mcp_service.generate_mcqs, topic, context, _wants_fresh(request, http_request)
+        )
+        if any(mcq.get("fallback") for mcq in mcqs):
+            # Generic questions because the model's answer did not parse; flagged, never cached
+            return {"mcqs": mcqs, "fallback": True}
+        return await run_in_threadpool(_generated, "mcq", mcp_service.mcq_key(topic, context), {"mcqs": mcqs})
     
+    except HTTPException:
+        raise
+    except TopicNotFoundError:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    except GeminiUnavailableError as e:
+        raise _llm_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/generate-summary")
-async def generate_summary(request: dict):
+async def generate_summary(request: dict, http_request: Request):
     """Generate summary of content"""
     try:
         content = request.get("content")
+        
+        # Serve the precomputed section summaries of an uploaded document
+        if request.get("content_hash"):
+            pack = await run_in_threadpool(_stored_pack, request["content_hash"])
+            sections = _pack_sections(pack, request.get("section"))
+            return {"summary": "\n\n".join(s['summary'] for s in sections)}
+        
         if not content:
             raise HTTPException(status_code=400, detail="Content is required")
         
-        summary = mcp_service.generate_summary(content)
-        return {"summary": summary}
+        summary = await run_in_threadpool(
+            mcp_service.generate_summary, content, _wants_fresh(request, http_request)
+        )
+        return await run_in_threadpool(_generated, "summary", mcp_service.summary_key(content), {"summary": summary})
+    
+    except HTTPException:
+        raise
+    except GeminiUnavailableError as e:
+        raise _llm_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _quiz_mcqs(request: dict) -> list:
+    """The question set of a new quiz: given, from a study pack, or generated"""
+    if request.get("mcqs"):
+        return request["mcqs"]
+    if request.get("content_hash"):
+        pack = _stored_pack(request["content_hash"])
+        return [mcq for s in _pack_sections(pack, request.get("section")) for mcq in s['mcqs']]
+    if request.get("topic"):
+        mcqs = mcp_service.generate_mcqs(request["topic"], request.get("context", ""))
+        if any(mcq.get("fallback") for mcq in mcqs):
+            raise HTTPException(status_code=502, detail="The model returned no usable questions, try again")
+        return mcqs
+    raise HTTPException(status_code=400, detail="Provide mcqs, content_hash or topic")
+
+@app.post("/quizzes")
+async def create_quiz(request: dict):
+    """Create a quiz; the answer key stays on the server and the response holds the teacher key"""
+    try:
+        mcqs = await run_in_threadpool(_quiz_mcqs, request)
+        return quiz_service.create(mcqs, request.get("title", ""), request.get("time_limit"))
     
+    except HTTPException:
+        raise
+    except GeminiUnavailableError as e:
+        raise _llm_unavailable(e)
+    except QuizClosedError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _quiz_error(error: Exception) -> HTTPException:
+    if isinstance(error, QuizNotFoundError):
+        return HTTPException(status_code=404, detail="Quiz or attempt not found")
+    if isinstance(error, (QuizClosedError, AnswersHiddenError)):
+        return HTTPException(status_code=409, detail=str(error))
+    return HTTPException(status_code=400, detail=str(error))
+
+def _check_teacher(quiz_id: str, teacher_key: str):
+    if not quiz_service.check_teacher_key(quiz_id, teacher_key):
+        raise HTTPException(status_code=403, detail="Invalid quiz key")
+
+@app.get("/quizzes/{quiz_id}")
+async def get_quiz(quiz_id: str):
+    """Questions and options, without answers"""
+    try:
+        return quiz_service.get(quiz_id)
+    except QuizNotFoundError as e:
+        raise _quiz_error(e)
+
+@app.post("/quizzes/{quiz_id}/attempts")
+async def start_quiz_attempt(quiz_id: str, request: dict):
+    """Start a (timed) attempt; one per student_id"""
+    try:
+        return quiz_service.start(quiz_id, request.get("student_id"))
+    except (QuizNotFoundError, QuizClosedError, ValueError) as e:
+        raise _quiz_error(e)
+
+@app.post("/quizzes/{quiz_id}/attempts/{attempt_id}/answers")
+async def answer_quiz_question(quiz_id: str, attempt_id: str, request: dict):
+    """Record one answer, graded against the stored key"""
+    try:
+        return quiz_service.answer(quiz_id, attempt_id, request.get("question"), request.get("answer"))
+    except (QuizNotFoundError, QuizClosedError, ValueError) as e:
+        raise _quiz_error(e)
+
+@app.post("/quizzes/{quiz_id}/attempts/{attempt_id}/finish")
+async def finish_quiz_attempt(quiz_id: str, attempt_id: str):
+    """Close an attempt and return its score; answers and explanations once the quiz is closed"""
+    try:
+        return quiz_service.finish(quiz_id, attempt_id)
+    except QuizNotFoundError as e:
+        raise _quiz_error(e)
+
+@app.get("/quizzes/{quiz_id}/attempts/{attempt_id}")
+async def quiz_attempt_result(quiz_id: str, attempt_id: str):
+    """Result of a finished attempt, with correct answers once the teacher has closed the quiz"""
+    try:
+        return quiz_service.result(quiz_id, attempt_id)
+    except (QuizNotFoundError, AnswersHiddenError) as e:
+        raise _quiz_error(e)
+
+@app.post("/quizzes/{quiz_id}/close")
+async def close_quiz(quiz_id: str, x_quiz_key: str = Header(None)):
+    """End the quiz for everyone and release the correct answers (teacher only)"""
+    try:
+        _check_teacher(quiz_id, x_quiz_key)
+        return quiz_service.close(quiz_id)
+    except QuizNotFoundError as e:
+        raise _quiz_error(e)
+
+@app.get("/quizzes/{quiz_id}/results")
+async def quiz_results(quiz_id: str, x_quiz_key: str = Header(None)):
+    """Live aggregate results for the teacher (X-Quiz-Key header)"""
+    try:
+        _check_teacher(quiz_id, x_quiz_key)
+        return quiz_service.results(quiz_id)
+    except QuizNotFoundError as e:
+        raise _quiz_error(e)
+
+@app.delete("/quizzes/{quiz_id}")
+async def delete_quiz(quiz_id: str, x_quiz_key: str = Header(None)):
+    try:
+        _check_teacher(quiz_id, x_quiz_key)
+        quiz_service.delete(quiz_id)
+    except QuizNotFoundError as e:
+        raise _quiz_error(e)
+    return {"message": "Quiz deleted", "quiz_id": quiz_id}
+
 @app.post("/grade")
 async def grade_answer(request: dict):
     """Grade a student's answer"""
@@ -142,14 +614,48 @@ async def grade_answer(request: dict):
         if not all([question, correct_answer, student_answer]):
             raise HTTPException(status_code=400, detail="Missing required fields")
         
-        grade = grading_service.grade_answer(
-            question, correct_answer, student_answer, context
+        grade = await run_in_threadpool(
+            grading_service.grade_answer, question, correct_answer, student_answer, context
         )
         return grade
     
+    except HTTPException:
+        raise
+    except GeminiUnavailableError as e:
+        raise _llm_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/grade/jobs")
+async def create_grading_job(request: dict):
+    """Grade many student answers to one question in the background"""
+    question = request.get("question")
+    correct_answer = request.get("correct_answer")
+    if not question or not correct_answer:
+        raise HTTPException(status_code=400, detail="Missing required fields")
+    try:
+        return await run_in_threadpool(
+            grading_jobs.submit, question, correct_answer, request.get("answers"), request.get("context", "")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/grade/jobs/{job_id}")
+async def grading_job_status(job_id: str):
+    """Progress of a grading job and the grades so far, keyed by answer id"""
+    job = await run_in_threadpool(grading_jobs.status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Grading job not found")
+    return job
+
+@app.post("/grade/jobs/{job_id}/retry")
+async def retry_grading_job(job_id: str):
+    """Continue a failed grading job from its last saved answer"""
+    job = await run_in_threadpool(grading_jobs.retry, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Grading job not found")
+    return job
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
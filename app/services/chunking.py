@@ -0,0 +1,143 @@
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import List, Dict, Tuple
+import re
+
+# Characters that mark a line as (mostly) mathematical notation
+MATH_CHARS = set("=+-*/^_()[]{}<>|√∑∫∏∂∆πθλμσΩ≈≠≤≥±×÷∞→")
+
+
+def is_formula(text: str) -> bool:
+    """Heuristic: short blocks dominated by math symbols and digits"""
+    stripped = text.strip()
+    if not stripped or len(stripped) > 300:
+        return False
+    math = sum(1 for c in stripped if c in MATH_CHARS or c.isdigit())
+    words = len(re.findall(r"[A-Za-z]{4,}", stripped))
+    return "=" in stripped and math >= len(stripped) * 0.2 and words <= 6
+
+
+class StructuredChunker:
+    """Turn structural blocks from DocumentProcessor into section-aligned chunks.
+
+    A block is a dict with ``text``, ``page`` and ``heading_level`` (0 for body
+    text). Chunks never cross a heading, blocks are packed whole up to
+    ``chunk_size`` characters, and a formula is kept with the text before it.
+    Only blocks larger than ``chunk_size`` on their own are cut: tables
+    (``kind: table``) between rows with the header row repeated, anything
+    else with the regular recursive splitter.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 formula_slack: float = 0.25):
+        self.chunk_size = chunk_size
+        self.formula_slack = formula_slack
+        self.fallback_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len
+        )
+
+    def split_blocks(self, blocks: List[Dict]) -> List[Tuple[str, Dict]]:
+        """Return (chunk_text, metadata) pairs with section and page metadata"""
+        chunks: List[Tuple[str, Dict]] = []
+        headings: List[Tuple[int, str]] = []
+        parts: List[str] = []
+        pages: List[int] = []
+        size = 0
+        has_body = False
+
+        def section_metadata() -> Dict:
+            metadata = {
+                'section': " > ".join(text for _, text in headings),
+                'heading': headings[-1][1] if headings else "",
+                'section_level': headings[-1][0] if headings else 0,
+            }
+            if pages:
+                metadata['page_start'] = min(pages)
+                metadata['page_end'] = max(pages)
+            return metadata
+
+        def flush():
+            nonlocal parts, pages, size, has_body
+            if has_body:
+                chunks.append(("\n\n".join(parts), section_metadata()))
+            parts, pages, size, has_body = [], [], 0, False
+
+        for block in blocks:
+            text = (block.get('text') or "").strip()
+            if not text:
+                continue
+            level = block.get('heading_level', 0)
+            page = block.get('page')
+
+            if level:
+                # A new heading closes the running chunk; consecutive headings stay together
+                if has_body:
+                    flush()
+                while headings and headings[-1][0] >= level:
+                    headings.pop()
+                headings.append((level, text))
+                parts.append(text)
+                size += len(text)
+                if page is not None:
+                    pages.append(page)
+                continue
+
+            if len(text) > self.chunk_size:
+                flush()
+                if block.get('kind') == 'table':
+                    pieces = self._split_table(text)
+                else:
+                    pieces = self.fallback_splitter.split_text(text)
+                for piece in pieces:
+                    metadata = section_metadata()
+                    if page is not None:
+                        metadata['page_start'] = metadata['page_end'] = page
+                    chunks.append((piece, metadata))
+                continue
+
+            limit = self.chunk_size
+            if is_formula(text):
+                limit = int(self.chunk_size * (1 + self.formula_slack))
+            if has_body and size + len(text) > limit:
+                flush()
+                # Carry the heading into the continuation so the chunk stays self-describing
+                if headings:
+                    parts.append(headings[-1][1])
+                    size += len(headings[-1][1])
+
+            parts.append(text)
+            size += len(text) + 2
+            has_body = True
+            if page is not None:
+                pages.append(page)
+
+        flush()
+        return chunks
+    
+    def _split_table(self, text: str) -> List[str]:
+        """Cut a table between rows, starting every piece with the header row"""
+        header, *rows = text.split("\n")
+        if len(header) > self.chunk_size // 2:
+            return self.fallback_splitter.split_text(text)
+        pieces: List[str] = []
+        lines = [header]
+        size = len(header)
+        for row in rows:
+            if len(lines) > 1 and size + len(row) + 1 > self.chunk_size:
+                pieces.append("\n".join(lines))
+                lines, size = [header], len(header)
+            lines.append(row)
+            size += len(row) + 1
+        pieces.append("\n".join(lines))
+        # A single row longer than a chunk still needs cutting
+        return [p for piece in pieces
+                for p in (self.fallback_splitter.split_text(piece) if len(piece) > self.chunk_size else [piece])]
+
+
+def split_document(doc: Dict, strategy: str, chunker: StructuredChunker,
+                   text_splitter: RecursiveCharacterTextSplitter) -> List[Tuple[str, Dict]]:
+    """Split a processed document into (text, metadata) chunks"""
+    if strategy == "structured" and doc.get('blocks'):
+        return chunker.split_blocks(doc['blocks'])
+    return [(chunk, {}) for chunk in text_splitter.split_text(doc['content'])]
@@ -1,13 +1,90 @@
 import os 
 import PyPDF2
 from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml.ns import qn
 import pytesseract
 from PIL import Image
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import fitz
+import re
+import logging
+from app.config import Config
+from app.services.extraction_cache import ExtractionCache
+from app.utils.file_handlers import file_sha256
+from app.utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Bump when extraction output changes, so cached pages are not replayed
+EXTRACTOR_VERSION = "v2"
+
+_W_P = qn('w:p')
+_W_TBL = qn('w:tbl')
+_W_TR = qn('w:tr')
+_W_TC = qn('w:tc')
+_W_T = qn('w:t')
+_W_TAB = qn('w:tab')
+_W_BR = qn('w:br')
+_W_CR = qn('w:cr')
+_W_SDT = qn('w:sdt')
+_W_SDT_CONTENT = qn('w:sdtContent')
+_W_PPR = qn('w:pPr')
+_W_PSTYLE = qn('w:pStyle')
+_W_NUMPR = qn('w:numPr')
+_W_ILVL = qn('w:ilvl')
+_W_VAL = qn('w:val')
+
+
+def _body_elements(parent) -> Iterator:
+    """Paragraphs and tables of a document body in order, unwrapping content controls"""
+    for child in parent.iterchildren():
+        if child.tag == _W_SDT:
+            content = child.find(_W_SDT_CONTENT)
+            if content is not None:
+                yield from _body_elements(content)
+        elif child.tag in (_W_P, _W_TBL):
+            yield child
+
+
+def _paragraph_text(paragraph) -> str:
+    """Text of a w:p element, read straight from the XML runs"""
+    parts = []
+    for node in paragraph.iter(_W_T, _W_TAB, _W_BR, _W_CR):
+        if node.tag == _W_T:
+            parts.append(node.text or "")
+        elif node.tag == _W_TAB:
+            parts.append("\t")
+        else:
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _table_rows(table) -> Iterator[str]:
+    """One ' | '-separated line per non-empty row; nested tables are flattened into their cell"""
+    for row in table.iterchildren(_W_TR):
+        cells = [
+            " ".join(filter(None, (_paragraph_text(p).strip() for p in cell.iter(_W_P))))
+            for cell in row.iterchildren(_W_TC)
+        ]
+        if any(cells):
+            yield " | ".join(cells)
+
+
+def _heading_level(style: str) -> int:
+    if style == "Title":
+        return 1
+    if style.startswith("Heading"):
+        digits = style[len("Heading"):].strip()
+        return int(digits) if digits.isdigit() else 1
+    return 0
+
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, cache: Optional[ExtractionCache] = None):
+        if cache is None and Config.EXTRACTION_CACHE_ENABLED:
+            cache = ExtractionCache(Config.EXTRACTION_CACHE_PATH, Config.EXTRACTION_CACHE_MAX_MB * 1024 * 1024)
+        self.cache = cache
         self.supported_formats = {
             '.pdf': self.process_pdf,
             '.docx': self.process_docx,
@@ -17,26 +94,110 @@ class DocumentProcessor:
             '.png': self.process_image,
             '.jpeg': self.process_image,
         }
+        # Formats whose layout we can read; the block list also feeds structured chunking
+        self.block_extractors = {
+            '.pdf': self.extract_pdf_blocks,
+            '.docx': self.extract_docx_blocks,
+            '.txt': self.extract_txt_blocks,
+        }
     
-    def process_document(self, file_path: str) -> dict:
-        """Process the uploaded document and extract text from it"""
+    def process_document(self, file_path: str, content_hash: str = None) -> dict:
+        """Process the uploaded document and extract text from it.
+
+        With the extraction cache, text of a file seen before (same content
+        hash) is replayed instead of extracted again.
+        """
         file_extension = os.path.splitext(file_path)[1].lower()
 
         if file_extension not in self.supported_formats:
             raise ValueError(f"Unsupported file format: {file_extension}")
+        if self.cache is not None and not content_hash:
+            content_hash = file_sha256(file_path)
         
-        processor = self.supported_formats[file_extension]
-        content = processor(file_path)
+        with span("extract"):
+            replayed = self.replay(content_hash) if self.cache is not None else None
+            if replayed is not None:
+                content, blocks = replayed['content'], replayed['blocks']
+            else:
+                content, blocks = self._extract(file_path, file_extension, content_hash)
 
         return {
             'file_name': os.path.basename(file_path),
             'file_extension': file_extension,
             'content': content,
+            'blocks': blocks,
             'file_path': file_path,
             'file_type': file_extension,
             'metadata': self.metadata(file_path)
         }
     
+    def _extract(self, file_path: str, file_extension: str, content_hash: str = None) -> Tuple[str, List[Dict]]:
+        """Extract (content, blocks), filling the cache when it is enabled"""
+        caching = self.cache is not None and content_hash
+        blocks = []
+        block_extractor = self.block_extractors.get(file_extension)
+        if block_extractor:
+            try:
+                if file_extension == '.pdf':
+                    # Cached page by page, so an interrupted run resumes mid-document
+                    blocks = self.extract_pdf_blocks(file_path, content_hash)
+                else:
+                    blocks = block_extractor(file_path)
+            except Exception as e:
+                logger.warning(f"Could not extract document structure, using plain text: {e}")
+                blocks = []
+
+        if blocks:
+            content = "\n\n".join(block['text'] for block in blocks)
+        else:
+            processor = self.supported_formats[file_extension]
+            content = processor(file_path)
+        
+        if caching and file_extension != '.pdf':
+            # Whole-file formats (and OCR) are cached as a single page
+            self.cache.put_page(content_hash, self._extractor(file_extension), 0,
+                                {'content': content, 'blocks': blocks})
+            self.cache.put_manifest(content_hash, EXTRACTOR_VERSION,
+                                    {'file_extension': file_extension, 'pages': 1})
+        return content, blocks
+    
+    @staticmethod
+    def _extractor(file_extension: str) -> str:
+        return f"{file_extension}:{EXTRACTOR_VERSION}"
+    
+    def replay(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Content and blocks of a previously extracted file, without reading it.
+
+        Returns None when the document is not (completely) cached, for
+        example after eviction or an extractor version change.
+        """
+        if self.cache is None or not content_hash:
+            return None
+        manifest = self.cache.get_manifest(content_hash, EXTRACTOR_VERSION)
+        if manifest is None:
+            return None
+        file_extension = manifest['file_extension']
+        extractor = self._extractor(file_extension)
+        
+        if file_extension != '.pdf':
+            page = self.cache.get_page(content_hash, extractor, 0)
+            if page is None:
+                return None
+            return {'file_extension': file_extension, 'content': page['content'], 'blocks': page['blocks']}
+        
+        pages = []
+        for number in range(manifest['pages']):
+            page = self.cache.get_page(content_hash, extractor, number)
+            if page is None:
+                return None
+            pages.append(page)
+        blocks = self._pdf_blocks(pages)
+        return {
+            'file_extension': file_extension,
+            'content': "\n\n".join(block['text'] for block in blocks),
+            'blocks': blocks,
+        }
+    
     def process_pdf(self, file_path: str) -> str:
         """Process PDF files and extract text"""
         text = ""
@@ -55,23 +216,15 @@ class DocumentProcessor:
         return text
     
     def process_docx(self, file_path: str) -> str:
-        """Process DOCX files and extract text"""
-        doc = Document(file_path)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+        """Process DOCX files and extract text, tables included"""
+        return "\n".join(block['text'] for block in self.iter_docx_blocks(file_path))
     
     def process_doc(self, file_path: str) -> str:
         """Process DOC files and extract text"""
         # For .doc files, we'll try to convert them or use a fallback
         try:
             # Try to open as docx first (if it's actually a docx file with wrong extension)
-            doc = Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
-            return text
+            return self.process_docx(file_path)
         except:
             # Fallback: return a message that .doc files need conversion
             return f"Note: .doc files need to be converted to .docx format for proper processing. File: {os.path.basename(file_path)}"
@@ -88,6 +241,163 @@ class DocumentProcessor:
         text = pytesseract.image_to_string(image)
         return text
     
+    def extract_pdf_blocks(self, file_path: str, content_hash: str = None) -> List[Dict[str, Any]]:
+        """Extract text blocks with page numbers; larger fonts become headings"""
+        caching = self.cache is not None and content_hash
+        extractor = self._extractor('.pdf')
+        pages = []
+        docs = fitz.open(file_path)
+        try:
+            for page in docs:
+                raw = self.cache.get_page(content_hash, extractor, page.number) if caching else None
+                if raw is None:
+                    raw = self._read_pdf_page(page)
+                    if caching:
+                        self.cache.put_page(content_hash, extractor, page.number, raw)
+                pages.append(raw)
+        finally:
+            docs.close()
+        
+        blocks = self._pdf_blocks(pages)
+        if caching and blocks:
+            self.cache.put_manifest(content_hash, EXTRACTOR_VERSION, {'file_extension': '.pdf', 'pages': len(pages)})
+        return blocks
+    
+    @staticmethod
+    def _read_pdf_page(page) -> Dict[str, list]:
+        """Text blocks of one page with their largest font size, and characters per font size"""
+        blocks = []
+        size_weights: Dict[float, int] = {}
+        for block in page.get_text("dict")["blocks"]:
+            if block.get("type") != 0:
+                continue
+            lines = []
+            block_size = 0.0
+            for line in block["lines"]:
+                spans = line["spans"]
+                lines.append("".join(text_span["text"] for text_span in spans))
+                for text_span in spans:
+                    size = round(text_span["size"], 1)
+                    block_size = max(block_size, size)
+                    size_weights[size] = size_weights.get(size, 0) + len(text_span["text"])
+            text = "\n".join(lines).strip()
+            if text:
+                blocks.append([text, block_size])
+        return {'blocks': blocks, 'sizes': list(size_weights.items())}
+    
+    @staticmethod
+    def _pdf_blocks(pages: List[Dict[str, list]]) -> List[Dict[str, Any]]:
+        """Assign heading levels across all pages by font size"""
+        raw_blocks = []
+        size_weights: Dict[float, int] = {}
+        for number, page in enumerate(pages):
+            for text, size in page['blocks']:
+                raw_blocks.append((text, number + 1, size))
+            for size, chars in page['sizes']:
+                size_weights[size] = size_weights.get(size, 0) + chars
+
+        if not raw_blocks:
+            return []
+
+        # Body text is the size carrying the most characters
+        body_size = max(size_weights.items(), key=lambda item: item[1])[0]
+        heading_sizes = sorted(
+            {size for text, _, size in raw_blocks if size >= body_size * 1.15 and len(text) <= 200},
+            reverse=True
+        )
+        levels = {size: min(i + 1, 3) for i, size in enumerate(heading_sizes)}
+
+        blocks = []
+        for text, page_number, size in raw_blocks:
+            level = levels.get(size, 0) if len(text) <= 200 else 0
+            blocks.append({'text': text, 'page': page_number, 'heading_level': level})
+        return blocks
+    
+    def extract_docx_blocks(self, file_path: str) -> List[Dict[str, Any]]:
+        """Extract paragraphs, lists and tables with heading levels taken from the paragraph style"""
+        return list(self.iter_docx_blocks(file_path))
+    
+    def iter_docx_blocks(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """Yield DOCX blocks in document order.
+        
+        Paragraphs become blocks with their heading level, consecutive list
+        items are gathered into one ``kind: list`` block, and each table
+        becomes a ``kind: table`` block with one ' | '-separated line per
+        row and its row count. Text is read from the XML directly, which
+        avoids python-docx's per-paragraph object and style lookups.
+        """
+        doc = Document(file_path)
+        styles = {style.style_id: style.name for style in doc.styles}
+        default_style = doc.styles.default(WD_STYLE_TYPE.PARAGRAPH)
+        default_name = default_style.name if default_style is not None else ""
+        list_items: List[str] = []
+        
+        def list_block() -> Dict[str, Any]:
+            block = {'text': "\n".join(list_items), 'page': None, 'heading_level': 0,
+                     'kind': 'list', 'items': len(list_items)}
+            list_items.clear()
+            return block
+        
+        for element in _body_elements(doc.element.body):
+            if element.tag == _W_TBL:
+                if list_items:
+                    yield list_block()
+                rows = list(_table_rows(element))
+                if rows:
+                    yield {'text': "\n".join(rows), 'page': None, 'heading_level': 0,
+                           'kind': 'table', 'rows': len(rows)}
+                continue
+            
+            text = _paragraph_text(element).strip()
+            if not text:
+                continue
+            properties = element.find(_W_PPR)
+            style_id = None
+            numbering = None
+            if properties is not None:
+                style_element = properties.find(_W_PSTYLE)
+                if style_element is not None:
+                    style_id = style_element.get(_W_VAL)
+                numbering = properties.find(_W_NUMPR)
+            style = styles.get(style_id, default_name) if style_id else default_name
+            level = _heading_level(style or "")
+            
+            if not level and (numbering is not None or (style or "").startswith("List")):
+                depth = 0
+                if numbering is not None:
+                    ilvl = numbering.find(_W_ILVL)
+                    if ilvl is not None and (ilvl.get(_W_VAL) or "").isdigit():
+                        depth = int(ilvl.get(_W_VAL))
+                list_items.append(f"{'  ' * depth}- {text}")
+                continue
+            
+            if list_items:
+                yield list_block()
+            yield {'text': text, 'page': None, 'heading_level': level}
+        
+        if list_items:
+            yield list_block()
+    
+    def extract_txt_blocks(self, file_path: str) -> List[Dict[str, Any]]:
+        """Split plain text on blank lines; markdown '#' and 'Chapter N' lines are headings"""
+        with open(file_path, 'r', encoding='utf-8') as file:
+            text = file.read()
+
+        blocks = []
+        for paragraph in re.split(r"\n\s*\n", text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            level = 0
+            heading = re.match(r"^(#{1,6})\s+(.+)$", paragraph)
+            if heading and "\n" not in paragraph:
+                level = len(heading.group(1))
+                paragraph = heading.group(2).strip()
+            elif re.match(r"^(chapter|unit|part)\s+[\dIVXLC]+\b", paragraph, re.IGNORECASE) and len(paragraph) <= 120:
+                level = 1
+            blocks.append({'text': paragraph, 'page': None, 'heading_level': level})
+        return blocks
+    
     def metadata(self, file_path: str) -> dict:
         """Extract metadata from the file"""
         return {
@@ -0,0 +1,86 @@
+from typing import Dict, List, Optional
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+def document_id(document: Dict) -> str:
+    """Stable id of a processed document, derived from its content hash"""
+    content_hash = document.get('content_hash')
+    if not content_hash:
+        content_hash = hashlib.sha256(document.get('content', '').encode('utf-8')).hexdigest()
+    return content_hash[:16]
+
+
+def chunk_id(doc_id: str, index: int) -> str:
+    return f"{doc_id}:{index}"
+
+
+class DocumentRegistry:
+    """Maps every ingested document to its chunks.
+
+    A document with ``chunk_count`` chunks owns the ids ``<doc_id>:0`` to
+    ``<doc_id>:<chunk_count - 1>``, so deleting or citing it never scans the
+    vector store. File-level details (name, path, type) live here once per
+    document instead of in every chunk's metadata. Records are held in
+    memory and saved to a JSON file on each change.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._documents: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for record in json.load(f):
+                    self._documents[record['document_id']] = record
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(list(self._documents.values()), f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, doc_id: str) -> Optional[Dict]:
+        return self._documents.get(doc_id)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._documents
+
+    def list(self) -> List[Dict]:
+        return list(self._documents.values())
+
+    def register(self, document: Dict, chunk_count: int) -> Dict:
+        record = {
+            'document_id': document_id(document),
+            'file_name': document.get('file_name'),
+            'file_path': document.get('file_path'),
+            'file_type': document.get('file_type'),
+            'content_hash': document.get('content_hash'),
+            'chunk_count': chunk_count,
+            'added_at': time.time(),
+        }
+        with self._lock:
+            self._documents[record['document_id']] = record
+            self._save()
+        return record
+
+    def restore(self, records: List[Dict]):
+        """Add records exported from another registry, saving once"""
+        with self._lock:
+            for record in records:
+                self._documents[record['document_id']] = record
+            self._save()
+
+    def remove(self, doc_id: str) -> Optional[Dict]:
+        with self._lock:
+            record = self._documents.pop(doc_id, None)
+            if record is not None:
+                self._save()
+        return record
+
+    @staticmethod
+    def chunk_ids(record: Dict) -> List[str]:
+        return [chunk_id(record['document_id'], i) for i in range(record['chunk_count'])]
@@ -0,0 +1,96 @@
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = registry.histogram(
+    "tutor_query_embedding_batch_size", "Queries embedded per batched model call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+QUEUE_WAIT = registry.histogram(
+    "tutor_query_embedding_wait_seconds", "Time a query waited for its batch to start",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+
+
+class EmbeddingBatcher:
+    """Micro-batches concurrent query embeddings into one model call.
+
+    ``embed_query`` is called from many request threads at once. A single
+    worker thread takes the first waiting query, collects more for up to
+    ``max_wait`` seconds or until ``max_batch`` are queued, embeds them with
+    one ``embed_documents`` call and hands each caller its vector. Queries
+    that arrive while a batch is running are picked up by the next one, so
+    ``max_wait=0`` still batches under load without delaying a lone request.
+    """
+
+    def __init__(self, embeddings, max_batch: int = 32, max_wait: float = 0.002):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Optional[Tuple[str, Future, float]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def embed_query(self, text: str) -> List[float]:
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                return self.embeddings.embed_query(text)
+            self._queue.put((text, future, time.perf_counter()))
+        return future.result()
+
+    def _collect(self, first) -> Tuple[list, bool]:
+        """Gather a batch starting with ``first``; the flag is True on shutdown"""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stopping = self._collect(first)
+
+            started = time.perf_counter()
+            for _, _, queued_at in batch:
+                QUEUE_WAIT.observe(started - queued_at)
+            BATCH_SIZE.observe(len(batch))
+
+            try:
+                vectors = self.embeddings.embed_documents([text for text, _, _ in batch])
+            except Exception as e:
+                logger.error(f"Batched query embedding failed: {e}")
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            # Queued before the sentinel, so every waiting caller is still served
+            self._queue.put(None)
+        self._thread.join(timeout=5)
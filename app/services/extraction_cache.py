@@ -0,0 +1,118 @@
+"""Persistent cache of extracted text, one entry per document page.
+
+Entries are keyed by the file's content hash, the extractor (file type and
+extractor version) and the page index, so reprocessing an unchanged file
+replays its text instead of re-parsing the PDF or re-running OCR, and an
+interrupted extraction only redoes the pages it had not reached. Page -1
+holds a document's manifest (file type and page count); a document with a
+manifest can be rebuilt without its source file. The cache is a SQLite
+file shared by worker processes and is trimmed to ``max_bytes`` by evicting
+the least recently used pages.
+"""
+from typing import Any, Optional
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app.utils.metrics import registry
+
+EXTRACTION_CACHE = registry.counter(
+    "tutor_extraction_cache_total", "Extraction cache page lookups by result", ["result"]
+)
+EXTRACTION_CACHE_EVICTIONS = registry.counter(
+    "tutor_extraction_cache_evictions_total", "Cached pages evicted to stay under the size limit"
+)
+
+MANIFEST_PAGE = -1
+
+
+class ExtractionCache:
+    touch_interval = 60.0  # seconds; reads refresh last_used at most this often
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " content_hash TEXT NOT NULL, extractor TEXT NOT NULL, page INTEGER NOT NULL,"
+            " payload TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (content_hash, extractor, page))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS pages_last_used ON pages (last_used)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_page(self, content_hash: str, extractor: str, page: int) -> Optional[Any]:
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT payload, last_used FROM pages WHERE content_hash = ? AND extractor = ? AND page = ?",
+            (content_hash, extractor, page)
+        ).fetchone()
+        if page != MANIFEST_PAGE:
+            EXTRACTION_CACHE.inc(result="hit" if row else "miss")
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > self.touch_interval:
+            conn.execute(
+                "UPDATE pages SET last_used = ? WHERE content_hash = ? AND extractor = ? AND page = ?",
+                (now, content_hash, extractor, page)
+            )
+        return json.loads(row[0])
+
+    def put_page(self, content_hash: str, extractor: str, page: int, payload: Any):
+        data = json.dumps(payload, ensure_ascii=False)
+        self._connection().execute(
+            "INSERT OR REPLACE INTO pages (content_hash, extractor, page, payload, size, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (content_hash, extractor, page, data, len(data), time.time())
+        )
+
+    def get_manifest(self, content_hash: str, version: str) -> Optional[dict]:
+        return self.get_page(content_hash, version, MANIFEST_PAGE)
+
+    def put_manifest(self, content_hash: str, version: str, manifest: dict):
+        """Record a completely extracted document, then trim the cache"""
+        self.put_page(content_hash, version, MANIFEST_PAGE, manifest)
+        self.evict()
+
+    def delete(self, content_hash: str):
+        self._connection().execute("DELETE FROM pages WHERE content_hash = ?", (content_hash,))
+
+    def size(self) -> int:
+        return self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def evict(self) -> int:
+        """Drop least recently used pages until the cache fits ``max_bytes``"""
+        conn = self._connection()
+        excess = self.size() - self.max_bytes
+        evicted = 0
+        while excess > 0:
+            rows = conn.execute(
+                "SELECT rowid, size FROM pages ORDER BY last_used LIMIT 256"
+            ).fetchall()
+            if not rows:
+                break
+            batch = []
+            for rowid, size in rows:
+                batch.append((rowid,))
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.executemany("DELETE FROM pages WHERE rowid = ?", batch)
+            evicted += len(batch)
+        if evicted:
+            EXTRACTION_CACHE_EVICTIONS.inc(evicted)
+        return evicted
@@ -1,46 +1,246 @@
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import HumanMessage, SystemMessage
 from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
 import json
 from app.config import Config
+from app.utils.json_stream import IncrementalObjectParser, parse_json_object, strip_code_fences
+import logging
+from app.utils.metrics import registry, span
+from app.utils.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    HedgeBudget,
+    RetryPolicy,
+    call_with_retry,
+    hedged_call,
+)
+
+logger = logging.getLogger(__name__)
+
+LLM_REQUESTS = registry.counter("tutor_llm_requests_total", "Gemini calls by outcome", ["outcome"])
+JSON_PARSE = registry.counter(
+    "tutor_llm_json_parse_total", "Parsing of structured LLM output (ok, salvaged, failed)", ["kind", "outcome"]
+)
+
+MCQ_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "question": {"type": "string"},
+            "options": {"type": "array", "items": {"type": "string"}},
+            "correct_answer": {"type": "string", "enum": ["A", "B", "C", "D"]},
+            "explanation": {"type": "string"},
+        },
+        "required": ["question", "options", "correct_answer", "explanation"],
+    },
+}
+
+GRADE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer"},
+        "feedback": {"type": "string"},
+        "strengths": {"type": "array", "items": {"type": "string"}},
+        "improvements": {"type": "array", "items": {"type": "string"}},
+        "suggestions": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["score", "feedback", "strengths", "improvements", "suggestions"],
+}
+
+RETRYABLE_ERRORS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.TooManyRequests,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.GatewayTimeout,
+    TimeoutError,
+    ConnectionError,
+)
+
+# Shared by every GeminiService instance: they all talk to the same provider
+_breaker = CircuitBreaker(Config.GEMINI_BREAKER_THRESHOLD, Config.GEMINI_BREAKER_RESET)
+_retry_policy = RetryPolicy(Config.GEMINI_MAX_RETRIES, Config.GEMINI_RETRY_BASE_DELAY, Config.GEMINI_RETRY_MAX_DELAY)
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="gemini-hedge")
+_hedge_budget = HedgeBudget(Config.GEMINI_HEDGE_BUDGET)
+
+
+class GeminiUnavailableError(RuntimeError):
+    """Gemini could not produce a response (retries exhausted or circuit open)"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GeminiBlockedError(GeminiUnavailableError):
+    """This one response had no text (safety-blocked or empty candidate); the next call may succeed"""
+
+
+def _schema_unsupported(error: BaseException) -> bool:
+    """Whether the SDK or model rejected the structured-output settings themselves"""
+    if not isinstance(error, (TypeError, ValueError, google_exceptions.InvalidArgument)):
+        return False
+    message = str(error).lower()
+    return "response_schema" in message or "response_mime_type" in message
+
+
+def _is_retryable(error: BaseException) -> bool:
+    if isinstance(error, RETRYABLE_ERRORS):
+        return True
+    # The REST transport surfaces network failures as requests exceptions
+    module = type(error).__module__
+    return module.startswith("requests") or module.startswith("urllib3")
+
+
+def _normalize_mcq(mcq: Dict) -> Optional[Dict]:
+    """Validate one MCQ object; returns a cleaned copy or None"""
+    question = mcq.get("question")
+    options = mcq.get("options")
+    if not isinstance(question, str) or not question.strip():
+        return None
+    if not isinstance(options, list) or len(options) != 4 or not all(isinstance(o, str) for o in options):
+        return None
+    answer = str(mcq.get("correct_answer", "")).strip()
+    if answer in options:
+        answer = "ABCD"[options.index(answer)]
+    answer = answer[:1].upper()
+    if answer not in ("A", "B", "C", "D"):
+        return None
+    return {
+        "question": question.strip(),
+        "options": options,
+        "correct_answer": answer,
+        "explanation": str(mcq.get("explanation", "")),
+    }
+
+
+def ungraded() -> Dict:
+    """Placeholder grade for a response that could not be parsed"""
+    return {
+        "score": 0,
+        "feedback": "Error processing grade",
+        "strengths": [],
+        "improvements": [],
+        "suggestions": [],
+        "ungraded": True
+    }
+
+
+def _is_timeout(error: BaseException) -> bool:
+    return isinstance(error, (google_exceptions.DeadlineExceeded, TimeoutError)) or "Timeout" in type(error).__name__
+
 
 class GeminiService:
     def __init__(self):
         # Check if API key is configured
         if not Config.GEMINI_API_KEY:
-            print("Warning: GEMINI_API_KEY not found in environment variables")
+            logger.warning("GEMINI_API_KEY not found in environment variables")
             self.use_gemini = False
             return
         
         try:
             # Configure Gemini API
-            genai.configure(api_key=Config.GEMINI_API_KEY)
+            client_kwargs = {}
+            if Config.GEMINI_API_ENDPOINT:
+                # Plain-HTTP hosts such as the local benchmark server need the REST transport
+                client_kwargs = {
+                    "transport": "rest",
+                    "client_options": {"api_endpoint": Config.GEMINI_API_ENDPOINT}
+                }
+            genai.configure(api_key=Config.GEMINI_API_KEY, **client_kwargs)
             self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
             self.chat_model = ChatGoogleGenerativeAI(
                 model=Config.GEMINI_MODEL,
                 google_api_key=Config.GEMINI_API_KEY,
                 temperature=0.7,
-                max_output_tokens=2048
+                max_output_tokens=2048,
+                **client_kwargs
             )
+            self.json_mode = Config.GEMINI_JSON_MODE
             self.use_gemini = True
-            print(f"Gemini service initialized successfully with model: {Config.GEMINI_MODEL}")
+            logger.info(f"Gemini service initialized successfully with model: {Config.GEMINI_MODEL}")
         except Exception as e:
-            print(f"Error initializing Gemini service: {e}")
+            logger.error(f"Error initializing Gemini service: {e}")
             self.use_gemini = False
         
-    def generate_response(self, prompt: str, context: str = "") -> str:
-        """Generate a response using Gemini"""
+    def generate_response(self, prompt: str, context: str = "", hedge: bool = False,
+                          generation_config: Optional[Dict] = None) -> str:
+        """Generate a response using Gemini.
+        
+        Each attempt is bounded by GEMINI_TIMEOUT and retryable failures are
+        retried with jittered backoff. Raises GeminiUnavailableError when no
+        answer could be produced. With ``hedge`` a second request is started if
+        the first is slower than GEMINI_HEDGE_DELAY.
+        """
         if not self.use_gemini:
             return f"Mock Gemini Response: {prompt[:100]}... (API key not configured or service not initialized)"
         
+        full_prompt = f"{context}\n\n{prompt}" if context else prompt
         try:
-            full_prompt = f"{context}\n\n{prompt}" if context else prompt
-            response = self.model.generate_content(full_prompt)
-            return response.text
+            with span("llm_call"):
+                if hedge and Config.GEMINI_HEDGE_DELAY > 0:
+                    text = hedged_call(
+                        lambda: self._generate_with_retry(full_prompt, generation_config),
+                        Config.GEMINI_HEDGE_DELAY,
+                        _hedge_executor,
+                        on_hedge=lambda: LLM_REQUESTS.inc(outcome="hedge_sent"),
+                        on_hedge_won=lambda: LLM_REQUESTS.inc(outcome="hedge_won"),
+                        budget=_hedge_budget
+                    )
+                else:
+                    text = self._generate_with_retry(full_prompt, generation_config)
+            LLM_REQUESTS.inc(outcome="success")
+            return text
+        except CircuitOpenError as e:
+            LLM_REQUESTS.inc(outcome="circuit_open")
+            raise GeminiUnavailableError(str(e), retry_after=_breaker.retry_after()) from e
+        except GeminiBlockedError as e:
+            LLM_REQUESTS.inc(outcome="blocked")
+            logger.warning(str(e))
+            raise
         except Exception as e:
-            print(f"Error generating Gemini response: {e}")
-            return f"Error generating response: {str(e)}"
+            LLM_REQUESTS.inc(outcome="timeout" if _is_timeout(e) else "error")
+            logger.error(f"Error generating Gemini response: {e}")
+            raise GeminiUnavailableError(f"Error generating response: {str(e)}",
+                                         retry_after=_breaker.retry_after()) from e
+    
+    def _generate_with_retry(self, full_prompt: str, generation_config: Optional[Dict] = None) -> str:
+        def attempt():
+            # retry=None turns off the SDK's built-in 600s retry loop so this policy is the only one
+            response = self.model.generate_content(
+                full_prompt,
+                generation_config=generation_config,
+                request_options={"timeout": Config.GEMINI_TIMEOUT, "retry": None}
+            )
+            try:
+                return response.text
+            except ValueError as e:
+                # The SDK raises ValueError when no candidate has text, e.g. a safety block
+                raise GeminiBlockedError(f"Gemini returned no text: {e}") from e
+        
+        def on_retry(error):
+            LLM_REQUESTS.inc(outcome="retry")
+            logger.warning(f"Retrying Gemini call after {type(error).__name__}: {error}")
+        
+        try:
+            return call_with_retry(attempt, _retry_policy, _is_retryable, breaker=_breaker, on_retry=on_retry)
+        except (TypeError, ValueError, google_exceptions.InvalidArgument) as e:
+            if not generation_config or not self.json_mode or not _schema_unsupported(e):
+                raise
+            # Older SDKs or models reject response schemas; fall back to prompt-only JSON
+            logger.warning(f"Structured output unavailable, falling back to plain prompts: {e}")
+            self.json_mode = False
+            return self._generate_with_retry(full_prompt, None)
+    
+    def _json_config(self, schema: Dict) -> Optional[Dict]:
+        """Generation config asking for schema-constrained JSON, when enabled"""
+        if not self.json_mode:
+            return None
+        return {"response_mime_type": "application/json", "response_schema": schema}
     
     def chat_response(self, messages: List[Dict]) -> str:
         """Generate chat response using LangChain integration"""
@@ -58,11 +258,16 @@ class GeminiService:
             response = self.chat_model.invoke(langchain_messages)
             return response.content
         except Exception as e:
-            print(f"Error in chat response: {e}")
+            logger.error(f"Error in chat response: {e}")
             return f"Error in chat response: {str(e)}"
     
-    def generate_mcq(self, topic: str, context: str = "") -> List[Dict]:
-        """Generate multiple choice questions"""
+    def generate_mcq(self, topic: str, context: str = "", count: int = 5) -> List[Dict]:
+        """Generate multiple choice questions.
+
+        Raises GeminiUnavailableError when the model cannot be reached. If it
+        answers but nothing parses, generic questions marked ``fallback`` are
+        returned instead.
+        """
         if not self.use_gemini:
             # Return mock MCQs if Gemini is not available
             return [
@@ -90,10 +295,22 @@ class GeminiService:
                 }
             ]
         
-        # Shorter, more concise prompt
-        prompt = f"""
-        Generate 5 MCQs for topic: {topic}
+        mcqs: List[Dict] = []
+        seen = set()
+        for _ in range(1 + Config.MCQ_REASK_ATTEMPTS):
+            missing = count - len(mcqs)
+            if missing <= 0:
+                break
+            # Re-asks only request the questions still missing
+            avoid = ""
+            if mcqs:
+                avoid = "Do not repeat these questions: " + "; ".join(m["question"] for m in mcqs)
+            
+            # Shorter, more concise prompt
+            prompt = f"""
+        Generate {missing} MCQs for topic: {topic}
         Context: {context}
+        {avoid}
         
         Return ONLY this JSON format:
         [
@@ -107,60 +324,51 @@ class GeminiService:
         
         Rules: A=first option, B=second, etc. Make options complete sentences.
         """
-        
-        try:
-            response = self.generate_response(prompt)
-            print(f"Raw Gemini Response: {response}")
             
-            # Clean the response - remove any markdown formatting
-            cleaned_response = response.strip()
-            if cleaned_response.startswith("```json"):
-                cleaned_response = cleaned_response[7:]
-            if cleaned_response.endswith("```"):
-                cleaned_response = cleaned_response[:-3]
-            cleaned_response = cleaned_response.strip()
-            
-            # Try to parse JSON response
-            mcqs = json.loads(cleaned_response)
-            
-            # Validate the structure
-            if not isinstance(mcqs, list):
-                raise ValueError("Response is not a list")
-            
-            for mcq in mcqs:
-                required_fields = ["question", "options", "correct_answer", "explanation"]
-                for field in required_fields:
-                    if field not in mcq:
-                        raise ValueError(f"Missing field: {field}")
-                
-                # Ensure options is an array with actual text
-                if not isinstance(mcq["options"], list) or len(mcq["options"]) != 4:
-                    raise ValueError("Options must be an array with exactly 4 elements")
-            
-            return mcqs
-            
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {e}")
-            print(f"Cleaned response: {cleaned_response}")
-            
-            # Try to extract JSON from the response
             try:
-                # Look for JSON-like content between square brackets
-                start = cleaned_response.find('[')
-                end = cleaned_response.rfind(']') + 1
-                if start != -1 and end != 0:
-                    json_part = cleaned_response[start:end]
-                    mcqs = json.loads(json_part)
-                    return mcqs
-            except:
-                pass
+                response = self.generate_response(prompt, generation_config=self._json_config(MCQ_SCHEMA))
+            except GeminiUnavailableError as e:
+                if not mcqs:
+                    raise
+                logger.error(f"Error re-asking for missing MCQs: {e}")
+                break
+            logger.debug(f"Raw Gemini Response: {response}")
             
-            # Fallback: Generate structured MCQs manually
-            return self._generate_fallback_mcqs(topic, context)
+            with span("json_parse"):
+                new_mcqs, outcome = self._parse_mcqs(response)
+            JSON_PARSE.inc(kind="mcq", outcome=outcome)
             
-        except Exception as e:
-            print(f"Error generating MCQs: {e}")
-            return self._generate_fallback_mcqs(topic, context)
+            for mcq in new_mcqs:
+                key = mcq["question"].lower()
+                if key not in seen:
+                    seen.add(key)
+                    mcqs.append(mcq)
+        
+        if not mcqs:
+            return [dict(mcq, fallback=True) for mcq in self._generate_fallback_mcqs(topic, context)]
+        return mcqs[:count]
+    
+    def _parse_mcqs(self, response: str):
+        """Extract valid MCQs; returns (mcqs, outcome) with outcome ok, salvaged or failed"""
+        cleaned = strip_code_fences(response)
+        try:
+            parsed = json.loads(cleaned)
+            if isinstance(parsed, dict):
+                parsed = [parsed]
+            if isinstance(parsed, list):
+                valid = [m for m in (_normalize_mcq(p) for p in parsed if isinstance(p, dict)) if m]
+                if valid and len(valid) == len(parsed):
+                    return valid, "ok"
+        except json.JSONDecodeError:
+            pass
+        
+        # Truncated or slightly malformed output: keep every complete, valid object
+        parser = IncrementalObjectParser()
+        valid = [m for m in (_normalize_mcq(p) for p in parser.feed(cleaned)) if m]
+        if valid:
+            return valid, "salvaged"
+        logger.error(f"Could not parse MCQs from response: {cleaned[:200]}")
+        return [], "failed"
 
     def _generate_fallback_mcqs(self, topic: str, context: str = "") -> List[Dict]:
         """Generate fallback MCQs when Gemini fails"""
@@ -241,6 +449,24 @@ class GeminiService:
         
         return self.generate_response(prompt)
     
+    def label_topic(self, keywords: List[str], samples: List[str]) -> str:
+        """A short title for the topic shared by sample passages"""
+        if not self.use_gemini:
+            return " / ".join(keywords[:3])
+        
+        excerpts = "\n\n".join(f"- {sample[:600]}" for sample in samples)
+        prompt = f"""
+        These passages come from the same topic of a study corpus.
+        Typical words: {", ".join(keywords)}
+        
+        {excerpts}
+        
+        Reply with a title for the topic of 2 to 6 words, as a student would
+        look it up in a syllabus. Reply with the title only.
+        """
+        lines = self.generate_response(prompt).strip().splitlines()
+        return lines[0].strip().strip('"*#').strip()[:80] if lines else ""
+    
     def grade_answer(self, question: str, correct_answer: str, student_answer: str, context: str = "") -> Dict:
         """Grade a student's answer"""
         if not self.use_gemini:
@@ -276,15 +502,63 @@ class GeminiService:
         }}
         """
         
-        try:
-            response = self.generate_response(prompt)
-            grade_data = json.loads(response)
+        grade_data = self._request_grade(prompt)
+        if grade_data is not None:
             return grade_data
+        return ungraded()
+    
+    def build_rubric(self, question: str, correct_answer: str, context: str = "") -> str:
+        """Condense the question, model answer and context into a short marking rubric"""
+        if not self.use_gemini:
+            return f"Full marks: {correct_answer}"
+        
+        prompt = f"""
+        Write a compact marking rubric for this question.
+        
+        Question: {question}
+        Correct Answer: {correct_answer}
+        Context: {context}
+        
+        List at most 6 key points a correct answer must contain, one per line,
+        each with its share of the 100 marks, then one line of common mistakes.
+        No introduction, no other text.
+        """
+        return self.generate_response(prompt).strip()
+    
+    def grade_with_rubric(self, question: str, rubric: str, student_answer: str) -> Optional[Dict]:
+        """Grade against a prebuilt rubric; None when the response could not be parsed"""
+        if not self.use_gemini:
+            return self.grade_answer(question, rubric, student_answer)
+        
+        prompt = (
+            f"Question: {question}\nRubric:\n{rubric}\nStudent Answer: {student_answer}\n"
+            "Grade the answer against the rubric. Return JSON with score (0-100), feedback, "
+            "strengths, improvements and suggestions."
+        )
+        return self._request_grade(prompt)
+    
+    def _request_grade(self, prompt: str) -> Optional[Dict]:
+        response = self.generate_response(prompt, generation_config=self._json_config(GRADE_SCHEMA))
+        with span("json_parse"):
+            grade_data, outcome = self._parse_grade(response)
+        JSON_PARSE.inc(kind="grade", outcome=outcome)
+        if grade_data is None:
+            logger.error(f"Could not parse grade from response: {response[:200]}")
+        return grade_data
+    
+    def _parse_grade(self, response: str):
+        """Extract the grade object; returns (grade, outcome) with outcome ok, salvaged or failed"""
+        cleaned = strip_code_fences(response)
+        outcome = "ok"
+        try:
+            grade_data = json.loads(cleaned)
         except json.JSONDecodeError:
-            return {
-                "score": 0,
-                "feedback": "Error processing grade",
-                "strengths": [],
-                "improvements": [],
-                "suggestions": []
-            }
\ No newline at end of file
+            grade_data = parse_json_object(cleaned)
+            outcome = "salvaged"
+        if not isinstance(grade_data, dict) or "score" not in grade_data:
+            return None, "failed"
+        
+        for field in ("strengths", "improvements", "suggestions"):
+            grade_data.setdefault(field, [])
+        grade_data.setdefault("feedback", "")
+        return grade_data, outcome
\ No newline at end of file
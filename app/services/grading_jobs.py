@@ -0,0 +1,231 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import json
+import logging
+import os
+import secrets
+import time
+
+from app.utils.metrics import registry
+from app.utils.shared_cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+GRADING_JOBS = registry.counter(
+    "tutor_grading_jobs_total", "Batch grading jobs by outcome", ["outcome"]
+)
+
+
+def _boot_id() -> str:
+    try:
+        with open("/proc/sys/kernel/random/boot_id", "r") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _process_started(pid: int) -> Optional[str]:
+    """Start time of ``pid`` (ticks since boot), so a reused pid is not mistaken for its
+    predecessor; None if no such process. Without procfs only liveness is known."""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            return f.read().rsplit(")", 1)[1].split()[19]
+    except FileNotFoundError:
+        return None
+    except (OSError, IndexError):
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass
+    return "alive"
+
+
+def _claim_owner() -> Dict:
+    pid = os.getpid()
+    return {"pid": pid, "boot_id": _boot_id(), "started": _process_started(pid)}
+
+
+def _owner_alive(owner) -> bool:
+    if not isinstance(owner, dict) or owner.get("boot_id") != _boot_id():
+        return False
+    return _process_started(owner.get("pid", 0)) == owner.get("started")
+
+
+class GradingJobService:
+    """Grade every student answer to one question in the background.
+
+    A job is a JSON file under ``directory`` holding the question, the
+    answers and the grades so far. Grades are written back every
+    ``save_every`` answers, so a job interrupted by a restart resumes where
+    it stopped (``resume_pending``) instead of regrading. Answers go through
+    GradingService, so the rubric is built once per job and duplicate
+    answers reuse earlier grades. A SharedCache claim keeps two API workers
+    from running the same job; it names the owning process, so a restarted
+    server takes over claims its crashed predecessor left behind. Answers
+    the model could not grade are left out of the grades and the job ends
+    ``failed``, so ``retry`` grades just those.
+    """
+
+    claim_ttl = 300  # seconds; refreshed on every save while the job runs
+
+    def __init__(self, grading_service, directory: str = "data/grading_jobs", workers: int = 4,
+                 save_every: int = 10, max_answers: int = 5000, cache: Optional[SharedCache] = None):
+        self.grading_service = grading_service
+        self.directory = directory
+        self.workers = workers
+        self.save_every = save_every
+        self.max_answers = max_answers
+
+        os.makedirs(directory, exist_ok=True)
+        self.cache = cache or SharedCache(os.path.join(directory, "claims.sqlite3"))
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="grading-job")
+
+    # -- storage -------------------------------------------------------
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _load(self, job_id: str) -> Optional[Dict]:
+        if not job_id.replace("-", "").replace("_", "").isalnum():
+            return None
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _save(self, job: Dict):
+        job["updated_at"] = time.time()
+        path = self._path(job["job_id"])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    # -- jobs ----------------------------------------------------------
+    def submit(self, question: str, correct_answer: str, answers: List[Dict], context: str = "") -> Dict:
+        """Queue a job; each answer is {"id": ..., "student_answer": ...}"""
+        if not answers or len(answers) > self.max_answers:
+            raise ValueError(f"A grading job needs between 1 and {self.max_answers} answers")
+        cleaned = []
+        for i, answer in enumerate(answers):
+            if not isinstance(answer, dict) or not isinstance(answer.get("student_answer"), str):
+                raise ValueError(f"Answer {i} needs a student_answer string")
+            cleaned.append({"id": str(answer.get("id", i)), "student_answer": answer["student_answer"]})
+        if len({a["id"] for a in cleaned}) != len(cleaned):
+            raise ValueError("Answer ids must be unique")
+
+        job = {
+            "job_id": secrets.token_urlsafe(12),
+            "status": "pending",
+            "question": question,
+            "correct_answer": correct_answer,
+            "context": context,
+            "answers": cleaned,
+            "grades": {},
+            "created_at": time.time(),
+        }
+        self._save(job)
+        self._schedule(job["job_id"])
+        return self.status(job["job_id"], include_grades=False)
+
+    def status(self, job_id: str, include_grades: bool = True) -> Optional[Dict]:
+        job = self._load(job_id)
+        if job is None:
+            return None
+        result = {
+            "job_id": job_id,
+            "status": job["status"],
+            "total": len(job["answers"]),
+            "graded": len(job["grades"]),
+            "created_at": job["created_at"],
+            "updated_at": job.get("updated_at"),
+        }
+        if include_grades:
+            result["grades"] = job["grades"]
+        return result
+
+    def _claim(self, job_id: str) -> bool:
+        key = f"grading_job:{job_id}"
+        owner = _claim_owner()
+        if self.cache.add(key, owner, ttl=self.claim_ttl):
+            return True
+        current = self.cache.get(key)
+        if current is None:
+            return self.cache.add(key, owner, ttl=self.claim_ttl)
+        if _owner_alive(current):
+            return False
+        # The claiming process is gone; compare-and-swap so only one taker wins
+        logger.info(f"Taking over grading job {job_id} from a stopped process")
+        return self.cache.replace(key, current, owner, ttl=self.claim_ttl)
+
+    def _schedule(self, job_id: str):
+        if self._claim(job_id):
+            self._executor.submit(self._run, job_id)
+
+    def resume_pending(self) -> int:
+        """Restart jobs left unfinished by a previous process; returns how many"""
+        resumed = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            job = self._load(name[:-len(".json")])
+            if job is not None and job["status"] in ("pending", "running"):
+                self._schedule(job["job_id"])
+                resumed += 1
+        if resumed:
+            logger.info(f"Resuming {resumed} grading job(s)")
+        return resumed
+
+    def _run(self, job_id: str):
+        job = self._load(job_id)
+        claim = f"grading_job:{job_id}"
+        try:
+            job["status"] = "running"
+            remaining = [a for a in job["answers"] if a["id"] not in job["grades"]]
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="grading-job-answer") as pool:
+                # Bounded windows keep progress saved and memory flat on large jobs
+                for start in range(0, len(remaining), self.save_every):
+                    window = remaining[start:start + self.save_every]
+                    grades = pool.map(
+                        lambda a: self.grading_service.grade_answer(
+                            job["question"], job["correct_answer"], a["student_answer"], job["context"]
+                        ),
+                        window
+                    )
+                    for answer, grade in zip(window, grades):
+                        if not grade.get("ungraded"):
+                            job["grades"][answer["id"]] = grade
+                    self._save(job)
+                    self.cache.set(claim, _claim_owner(), ttl=self.claim_ttl)
+            missing = len(job["answers"]) - len(job["grades"])
+            if missing:
+                raise RuntimeError(f"{missing} answer(s) could not be graded")
+            job["status"] = "done"
+            GRADING_JOBS.inc(outcome="done")
+        except Exception as e:
+            # Grades so far are kept; the job can be resumed later
+            logger.error(f"Grading job {job_id} stopped after {len(job['grades'])} answers: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+            GRADING_JOBS.inc(outcome="failed")
+        finally:
+            self._save(job)
+            self.cache.delete(claim)
+
+    def retry(self, job_id: str) -> Optional[Dict]:
+        """Resume a failed job from its last saved grade"""
+        job = self._load(job_id)
+        if job is None:
+            return None
+        if job["status"] == "failed":
+            job["status"] = "pending"
+            job.pop("error", None)
+            self._save(job)
+            self._schedule(job_id)
+        return self.status(job_id, include_grades=False)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
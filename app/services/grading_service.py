@@ -1,14 +1,190 @@
-from typing import Dict, List
-from app.services.gemini_service import GeminiService
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from app.config import Config
+from app.services.gemini_service import GeminiService, ungraded
+from app.services.pre_grader import PreGrader, terms_agree
+from app.utils.metrics import STAGE_LATENCY, registry, span
+from app.utils.shared_cache import SharedCache
+from app.utils.singleflight import SingleFlight, flight_key
+from app.utils.text_processors import answer_tokens, normalize_answer
 import json
+import threading
+import time
+
+import numpy as np
+
+_rubric_flights = SingleFlight("grading_rubric")
+_grade_flights = SingleFlight("grade")
+
+RUBRICS = registry.counter(
+    "tutor_grading_rubrics_total", "Rubric lookups by result (cached, built)", ["result"]
+)
+GRADES = registry.counter(
+    "tutor_grades_total", "Rubric-mode grades by source (llm, exact, similar)", ["source"]
+)
+PRE_GRADES = registry.counter(
+    "tutor_pre_grades_total", "Answers by local pre-grading rule, or llm when left to the model", ["outcome"]
+)
+PRE_GRADE_SAVED = registry.counter(
+    "tutor_grading_latency_saved_seconds_total", "Estimated model time saved by local pre-grading"
+)
+
+
+def letter_grade(percentage: float) -> str:
+    """Convert percentage to letter grade"""
+    if percentage >= 90:
+        return 'A+'
+    elif percentage >= 80:
+        return 'A'
+    elif percentage >= 70:
+        return 'B'
+    elif percentage >= 60:
+        return 'C'
+    elif percentage >= 50:
+        return 'D'
+    else:
+        return 'F'
 
 class GradingService:
-    def __init__(self):
+    """Grades free-text answers with Gemini.
+
+    In rubric mode each question (with its correct answer and context) is
+    condensed into a short rubric once, cached in the SharedCache, and every
+    student answer is graded against it with a small prompt. Grades are
+    cached by the normalized answer text, and when ``embed`` is given an
+    answer whose embedding is within ``reuse_similarity`` (cosine) of an
+    already graded one reuses that grade too, provided both have the same
+    numbers, operators, negations and term order.
+    
+    Before either mode, a PreGrader settles empty, exact and clearly right
+    or clearly off-topic answers locally.
+    """
+    
+    cache_ttl = 7 * 24 * 3600
+    max_questions = 256  # questions whose answer embeddings are kept for reuse
+    max_answers = 512  # graded answer embeddings kept per question
+    
+    def __init__(self, embed: Optional[Callable[[str], List[float]]] = None,
+                 cache: Optional[SharedCache] = None, use_rubrics: bool = None,
+                 reuse_similarity: float = None, pre_grading: bool = None):
         self.gemini_service = GeminiService()
+        self.embed = embed
+        if pre_grading is None:
+            pre_grading = Config.PRE_GRADING_ENABLED
+        self.pre_grader = PreGrader.from_config(embed) if pre_grading else None
+        self.cache = cache
+        self.use_rubrics = Config.RUBRIC_GRADING_ENABLED if use_rubrics is None else use_rubrics
+        self.reuse_similarity = Config.GRADE_REUSE_SIMILARITY if reuse_similarity is None else reuse_similarity
+        # rubric key -> (unit answer embeddings, their grades, their answer tokens)
+        self._graded: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
     
     def grade_answer(self, question: str, correct_answer: str, student_answer: str, context: str = "") -> Dict:
-        """Grade student answer using Gemini"""
-        return self.gemini_service.grade_answer(question, correct_answer, student_answer, context)
+        """Grade student answer, locally when the case is clear, otherwise using Gemini"""
+        if self.pre_grader is not None:
+            grade = self._pre_grade(correct_answer, student_answer)
+            if grade is not None:
+                return grade
+        
+        if not self.use_rubrics or not self.gemini_service.use_gemini:
+            return self.gemini_service.grade_answer(question, correct_answer, student_answer, context)
+        
+        rubric_key, rubric = self.rubric(question, correct_answer, context)
+        # Signs and operators stay in the key: "-5" and "5" must not share a grade
+        answer_key = flight_key(rubric_key, normalize_answer(student_answer))
+        return _grade_flights.do(
+            answer_key, lambda: self._grade_with_rubric(rubric_key, rubric, answer_key, question, student_answer)
+        )
+    
+    def _pre_grade(self, correct_answer: str, student_answer: str) -> Optional[Dict]:
+        start = time.perf_counter()
+        with span("pre_grade"):
+            grade = self.pre_grader.grade(correct_answer, student_answer)
+        if grade is None:
+            PRE_GRADES.inc(outcome="llm")
+            return None
+        PRE_GRADES.inc(outcome=grade["rule"])
+        snapshot = STAGE_LATENCY.snapshot(stage="llm_call")
+        if snapshot and snapshot[1]:
+            PRE_GRADE_SAVED.inc(max(0.0, snapshot[0] / snapshot[1] - (time.perf_counter() - start)))
+        return grade
+    
+    def rubric(self, question: str, correct_answer: str, context: str = "") -> tuple:
+        """(key, rubric text) for a question, built once and cached"""
+        key = flight_key(question, correct_answer, context)
+        rubric = self.cache.get(f"rubric:{key}") if self.cache else None
+        if rubric is not None:
+            RUBRICS.inc(result="cached")
+            return key, rubric
+        
+        def build():
+            RUBRICS.inc(result="built")
+            text = self.gemini_service.build_rubric(question, correct_answer, context)
+            if self.cache:
+                self.cache.set(f"rubric:{key}", text, ttl=self.cache_ttl)
+            return text
+        
+        return key, _rubric_flights.do(key, build)
+    
+    def _grade_with_rubric(self, rubric_key: str, rubric: str, answer_key: str,
+                           question: str, student_answer: str) -> Dict:
+        grade = self.cache.get(f"grade:{answer_key}") if self.cache else None
+        if grade is not None:
+            GRADES.inc(source="exact")
+            return grade
+        
+        vector = self._embed(student_answer)
+        tokens = answer_tokens(student_answer)
+        if vector is not None:
+            grade = self._similar_grade(rubric_key, vector, tokens)
+            if grade is not None:
+                GRADES.inc(source="similar")
+                return grade
+        
+        grade = self.gemini_service.grade_with_rubric(question, rubric, student_answer)
+        if grade is None:
+            return ungraded()  # not cached, the next attempt may parse
+        GRADES.inc(source="llm")
+        if self.cache:
+            self.cache.set(f"grade:{answer_key}", grade, ttl=self.cache_ttl)
+        if vector is not None:
+            self._remember(rubric_key, vector, grade, tokens)
+        return grade
+    
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        if self.embed is None or not text or not text.strip():
+            return None
+        vector = np.asarray(self.embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+    
+    def _similar_grade(self, rubric_key: str, vector: np.ndarray, tokens: List[str]) -> Optional[Dict]:
+        with self._lock:
+            entry = self._graded.get(rubric_key)
+            if entry is None:
+                return None
+            self._graded.move_to_end(rubric_key)
+            vectors, grades, graded_tokens = entry
+        similarities = vectors @ vector
+        # Closest first; a near-identical embedding alone cannot tell "x = 5" from "x = -5"
+        for index in np.argsort(-similarities):
+            if similarities[index] < self.reuse_similarity:
+                break
+            if terms_agree(tokens, graded_tokens[index]):
+                return grades[index]
+        return None
+    
+    def _remember(self, rubric_key: str, vector: np.ndarray, grade: Dict, tokens: List[str]):
+        with self._lock:
+            vectors, grades, graded_tokens = self._graded.pop(
+                rubric_key, (np.empty((0, len(vector)), np.float32), [], [])
+            )
+            if len(grades) < self.max_answers:
+                vectors = np.vstack([vectors, vector])
+                grades, graded_tokens = grades + [grade], graded_tokens + [tokens]
+            self._graded[rubric_key] = (vectors, grades, graded_tokens)
+            while len(self._graded) > self.max_questions:
+                self._graded.popitem(last=False)
     
     def grade_mcq_answers(self, answers: List[Dict]) -> Dict:
         """Grade multiple choice question answers"""
@@ -37,18 +213,7 @@ class GradingService:
     
     def _get_letter_grade(self, percentage: float) -> str:
         """Convert percentage to letter grade"""
-        if percentage >= 90:
-            return 'A+'
-        elif percentage >= 80:
-            return 'A'
-        elif percentage >= 70:
-            return 'B'
-        elif percentage >= 60:
-            return 'C'
-        elif percentage >= 50:
-            return 'D'
-        else:
-            return 'F'
+        return letter_grade(percentage)
     
     def _fallback_grading(self, question: str, correct_answer: str, 
                          student_answer: str) -> Dict:
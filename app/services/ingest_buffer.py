@@ -0,0 +1,191 @@
+from typing import List, Dict, Optional
+import numpy as np
+import threading
+import base64
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionBuffer:
+    """Write-behind buffer between document ingestion and the vector store.
+
+    Chunk embeddings from many uploads are accumulated in memory and written
+    to the store in one batch (followed by a single ``persist()``) once
+    ``max_batch`` chunks are pending or ``flush_interval`` seconds have passed.
+    Every upload is first appended to a write-ahead spool file and fsynced, so
+    a crash before the flush loses nothing: the spool is replayed on startup.
+    """
+
+    spool_file = "spool.wal"
+    flushing_file = "spool.wal.flushing"
+
+    def __init__(self, vectorstore, spool_directory: str, max_batch: int = 512,
+                 flush_interval: float = 2.0):
+        self.vectorstore = vectorstore
+        self.spool_directory = spool_directory
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._records: List[Dict] = []
+        self._pending_chunks = 0
+        self._last_flush = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        os.makedirs(spool_directory, exist_ok=True)
+        self._spool_path = os.path.join(spool_directory, self.spool_file)
+        self._flushing_path = os.path.join(spool_directory, self.flushing_file)
+        self.recover()
+        self._spool = open(self._spool_path, "a", encoding="utf-8")
+
+    # -- spool encoding ------------------------------------------------
+    @staticmethod
+    def _encode(texts, metadatas, embeddings, ids=None) -> Dict:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        return {
+            "texts": list(texts),
+            "metadatas": list(metadatas),
+            "ids": list(ids) if ids else None,
+            "shape": list(vectors.shape),
+            "vectors": base64.b64encode(vectors.tobytes()).decode("ascii"),
+        }
+
+    @staticmethod
+    def _decode_vectors(record: Dict) -> np.ndarray:
+        raw = base64.b64decode(record["vectors"])
+        return np.frombuffer(raw, dtype=np.float32).reshape(record["shape"])
+
+    def _read_spool(self, path: str) -> List[Dict]:
+        records = []
+        if not os.path.exists(path):
+            return records
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write; everything before it is intact
+                    logger.warning(f"Skipping truncated spool record in {path}")
+                    break
+        return records
+
+    # -- public API ----------------------------------------------------
+    def recover(self):
+        """Write spooled records left over from a previous run into the store"""
+        records = self._read_spool(self._flushing_path) + self._read_spool(self._spool_path)
+        if not records:
+            return
+        logger.info(f"Recovering {len(records)} spooled uploads into the vector store")
+        self._write_records(records)
+        for path in (self._flushing_path, self._spool_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def add(self, texts: List[str], metadatas: List[Dict], embeddings,
+            ids: Optional[List[str]] = None) -> None:
+        """Durably queue one upload's chunks for the next batched write"""
+        if not texts:
+            return
+        record = self._encode(texts, metadatas, embeddings, ids)
+        line = json.dumps(record) + "\n"
+
+        with self._lock:
+            self._spool.write(line)
+            self._spool.flush()
+            os.fsync(self._spool.fileno())
+            self._records.append(record)
+            self._pending_chunks += len(texts)
+            should_flush = self._pending_chunks >= self.max_batch
+
+        if should_flush:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all pending chunks to the store; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._records:
+                    self._last_flush = time.monotonic()
+                    return 0
+                records = self._records
+                self._records = []
+                self._pending_chunks = 0
+                # Rotate the spool so uploads arriving during the write land in a fresh file
+                self._spool.close()
+                os.replace(self._spool_path, self._flushing_path)
+                self._spool = open(self._spool_path, "a", encoding="utf-8")
+
+            try:
+                written = self._write_records(records)
+            except Exception:
+                self._restore(records)
+                raise
+            os.remove(self._flushing_path)
+            self._last_flush = time.monotonic()
+            return written
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending_chunks
+
+    def start(self):
+        """Start the background thread that flushes on the time threshold"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="ingest-flush", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 1)
+            self._thread = None
+        self.flush()
+        with self._lock:
+            self._spool.close()
+
+    # -- internals -----------------------------------------------------
+    def _write_records(self, records: List[Dict]) -> int:
+        texts, metadatas, vectors, ids = [], [], [], []
+        for record in records:
+            texts.extend(record["texts"])
+            metadatas.extend(record["metadatas"])
+            # Spools written before chunk ids existed have none
+            ids.extend(record.get("ids") or [None] * len(record["texts"]))
+            vectors.append(self._decode_vectors(record))
+
+        self.vectorstore.add_texts(texts, metadatas, embeddings=np.vstack(vectors), ids=ids)
+        self.vectorstore.persist()
+        logger.info(f"Flushed {len(texts)} text chunks from {len(records)} uploads to vector store")
+        return len(texts)
+
+    def _restore(self, records: List[Dict]):
+        """Put a failed batch back in front of the queue and the spool"""
+        with self._lock:
+            self._spool.close()
+            with open(self._spool_path, "r", encoding="utf-8") as f:
+                newer = f.read()
+            with open(self._flushing_path, "a", encoding="utf-8") as f:
+                f.write(newer)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(self._flushing_path, self._spool_path)
+            self._spool = open(self._spool_path, "a", encoding="utf-8")
+            self._records = records + self._records
+            self._pending_chunks = sum(len(r["texts"]) for r in self._records)
+
+    def _run(self):
+        while not self._stop.wait(min(self.flush_interval, 0.5)):
+            if time.monotonic() - self._last_flush < self.flush_interval:
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                # The batch was put back in the spool and is retried on the next tick
+                logger.error(f"Error flushing ingestion buffer: {e}")
\ No newline at end of file
@@ -1,21 +1,89 @@
-from typing import List, Dict
+from typing import Any, Callable, List, Dict, Optional
 from app.services.gemini_service import GeminiService
+from app.utils.metrics import registry
+from app.utils.shared_cache import SharedCache
+from app.utils.singleflight import SingleFlight, flight_key
 import json
 
+_mcq_flights = SingleFlight("generate_mcq")
+
+GENERATION_CACHE = registry.counter(
+    "tutor_generation_cache_total", "Generated study material lookups by kind and result", ["kind", "result"]
+)
+
 class MCPService:
-    def __init__(self):
+    def __init__(self, cache: Optional[SharedCache] = None, ttl: float = 0):
         self.gemini_service = GeminiService()
+        # Identical requests within ttl seconds reuse one generation, readable by key
+        self.cache = cache
+        self.ttl = ttl
+    
+    @staticmethod
+    def mcq_key(topic: str, context: str = "") -> str:
+        return flight_key(topic, context)
+    
+    @staticmethod
+    def summary_key(content: str) -> str:
+        return flight_key(content)
+    
+    def material(self, kind: str, key: str) -> Optional[Any]:
+        """A stored generation ("mcq" or "summary") by its key; None if never stored or expired"""
+        if self.cache is None or not self.ttl:
+            return None
+        return self.cache.get(f"generation:{kind}:{key}")
+    
+    def _cached(self, kind: str, key: str, generate: Callable[[], Any],
+                cacheable: Callable[[Any], bool] = bool, fresh: bool = False) -> Any:
+        """Reuse a stored generation; ``fresh`` always generates and stores the new result"""
+        if self.cache is None or not self.ttl:
+            return generate()
+        cache_key = f"generation:{kind}:{key}"
+        value = None if fresh else self.cache.get(cache_key)
+        if value is not None:
+            GENERATION_CACHE.inc(kind=kind, result="hit")
+            return value
+        GENERATION_CACHE.inc(kind=kind, result="miss")
+        value = generate()
+        if cacheable(value):
+            self.cache.set(cache_key, value, ttl=self.ttl)
+        return value
     
-    def generate_mcqs(self, topic: str, context: str = "") -> List[Dict]:
+    def generate_mcqs(self, topic: str, context: str = "", fresh: bool = False) -> List[Dict]:
         """Generate multiple choice questions using Gemini"""
-        return self.gemini_service.generate_mcq(topic, context)
+        key = self.mcq_key(topic, context)
+        return _mcq_flights.do(flight_key(key, fresh), lambda: self._cached(
+            "mcq", key,
+            lambda: self.gemini_service.generate_mcq(topic, context),
+            # Canned questions from a failed generation are not worth keeping
+            lambda mcqs: bool(mcqs) and not any(mcq.get("fallback") for mcq in mcqs),
+            fresh
+        ))
     
-    def generate_summary(self, content: str) -> str:
+    def generate_summary(self, content: str, fresh: bool = False) -> str:
         """Generate summary using Gemini"""
-        return self.gemini_service.generate_summary(content)
+        return self._cached(
+            "summary", self.summary_key(content),
+            lambda: self.gemini_service.generate_summary(content),
+            fresh=fresh
+        )
     
     def generate_revision_notes(self, topic: str, content: str) -> str:
-        """Generate mock revision notes"""
+        """Generate revision notes with the key concepts of a text"""
+        if self.gemini_service.use_gemini:
+            prompt = f"""
+        Write concise revision notes on "{topic}" from the following content:
+        
+        {content}
+        
+        Include:
+        1. Key concepts and definitions
+        2. Important formulas or facts
+        3. Common mistakes to avoid
+        
+        Use short bullet points suitable for last-minute revision.
+        """
+            return self.gemini_service.generate_response(prompt)
+        
         return f"""
 Revision Notes for {topic}:
 
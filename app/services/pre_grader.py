@@ -0,0 +1,145 @@
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+import threading
+
+import numpy as np
+
+from app.config import Config
+from app.utils.text_processors import answer_tokens, normalize_answer
+
+# Kept as content words; a disagreement here flips the meaning. Normalized
+# like the answers, so "isn't" is "isnt" on both sides.
+_NEGATIONS = frozenset(normalize_answer(
+    "no not never none nothing neither nor cannot can't isn't aren't wasn't weren't doesn't don't "
+    "didn't won't shouldn't"
+).split())
+_SYMBOLS = frozenset("<>=^+-*/%.\u2264\u2265\u2260")
+
+
+def _exact_terms(tokens: List[str]) -> set:
+    """Numbers, signed values and operators: these must agree, not just be similar"""
+    return {t for t in tokens if any(c.isdigit() or c in _SYMBOLS for c in t)}
+
+
+def _is_subsequence(needle: List[str], haystack: List[str]) -> bool:
+    remaining = iter(haystack)
+    return all(token in remaining for token in needle)
+
+
+def _same_order(student: List[str], correct: List[str], shared: set) -> bool:
+    """Whether the shared terms appear in the same order in both answers"""
+    def order(tokens):
+        return list(OrderedDict.fromkeys(t for t in tokens if t in shared))
+    return order(student) == order(correct)
+
+
+def terms_agree(tokens: List[str], other: List[str]) -> bool:
+    """Same negations, numbers and operators, and shared terms in the same order.
+
+    Sentence embeddings barely separate "x = 5" from "x = -5" or "A > B"
+    from "B > A"; answers that fail this check never count as the same.
+    """
+    return ((set(tokens) & _NEGATIONS) == (set(other) & _NEGATIONS)
+            and _exact_terms(tokens) == _exact_terms(other)
+            and _same_order(tokens, other, set(tokens) & set(other)))
+
+
+class PreGrader:
+    """Settle clear-cut answers locally, before any model call.
+
+    Empty answers and exact matches of the model answer are certain. An
+    answer containing every term of the model answer in the same order and
+    little else, or one whose embedding is very close to it with the same
+    numbers, operators and term order, gets full marks; one that shares no
+    term and is far from it in embedding space scores zero. Signs and
+    operators are compared, never stripped, and word order counts, so
+    "A is greater than B" never gets the marks for "B is greater than A". Each decision carries a confidence, and only decisions at
+    or above ``confidence`` are returned; everything else goes to the LLM.
+    """
+
+    max_cached = 256  # model answer embeddings kept; many students answer the same question
+
+    def __init__(self, embed: Optional[Callable[[str], List[float]]] = None, confidence: float = 0.9,
+                 match_similarity: float = 0.9, off_topic_similarity: float = 0.15):
+        self.embed = embed
+        self.confidence = confidence
+        self.match_similarity = match_similarity
+        self.off_topic_similarity = off_topic_similarity
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, embed=None) -> "PreGrader":
+        return cls(
+            embed,
+            confidence=Config.PRE_GRADE_CONFIDENCE,
+            match_similarity=Config.PRE_GRADE_MATCH_SIMILARITY,
+            off_topic_similarity=Config.PRE_GRADE_OFF_TOPIC_SIMILARITY,
+        )
+
+    def grade(self, correct_answer: str, student_answer: str) -> Optional[Dict]:
+        """A grade with ``graded_by: local``, or None when the LLM should decide"""
+        decision = self.decide(correct_answer, student_answer)
+        if decision is None or decision["confidence"] < self.confidence:
+            return None
+        return decision
+
+    def decide(self, correct_answer: str, student_answer: str) -> Optional[Dict]:
+        student = normalize_answer(student_answer)
+        if not student:
+            return _grade("empty", 0, 1.0, "No answer was given.")
+        if student == normalize_answer(correct_answer):
+            return _grade("exact", 100, 1.0, "Matches the model answer.")
+
+        student_tokens = answer_tokens(student_answer)
+        correct_tokens = answer_tokens(correct_answer)
+        if not student_tokens or not correct_tokens:
+            return None
+        shared = set(student_tokens) & set(correct_tokens)
+        recall = len(shared) / len(set(correct_tokens))
+        agree = terms_agree(student_tokens, correct_tokens)
+
+        precision = len(correct_tokens) / len(student_tokens)
+        if _is_subsequence(correct_tokens, student_tokens) and precision >= 0.8 and agree:
+            return _grade("overlap", 100, 0.9 + 0.1 * precision, "Covers every key term of the model answer.")
+
+        if self.embed is None:
+            return None
+        similarity = float(self._vector(correct_answer) @ self._unit(student_answer))
+        if similarity >= self.match_similarity and recall >= 0.5 and agree:
+            return _grade("similar", 100, similarity, "Says the same as the model answer.")
+        if similarity <= self.off_topic_similarity and not shared:
+            return _grade("off_topic", 0, 1.0 - max(similarity, 0.0),
+                          "The answer does not address the question.")
+        return None
+
+    def _unit(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _vector(self, correct_answer: str) -> np.ndarray:
+        with self._lock:
+            vector = self._vectors.get(correct_answer)
+            if vector is not None:
+                self._vectors.move_to_end(correct_answer)
+                return vector
+        vector = self._unit(correct_answer)
+        with self._lock:
+            self._vectors[correct_answer] = vector
+            while len(self._vectors) > self.max_cached:
+                self._vectors.popitem(last=False)
+        return vector
+
+
+def _grade(rule: str, score: int, confidence: float, feedback: str) -> Dict:
+    return {
+        "score": score,
+        "feedback": feedback,
+        "strengths": [],
+        "improvements": [],
+        "suggestions": [],
+        "graded_by": "local",
+        "rule": rule,
+        "confidence": round(confidence, 3),
+    }
@@ -0,0 +1,393 @@
+from typing import Callable, Dict, List, Optional
+import copy
+import hmac
+import logging
+import secrets
+import time
+
+from app.services.gemini_service import _normalize_mcq
+from app.services.grading_service import letter_grade
+from app.utils.metrics import registry
+from app.utils.shared_cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+QUIZ_ANSWERS = registry.counter(
+    "tutor_quiz_answers_total", "Quiz answers graded by result", ["result"]
+)
+QUIZ_SESSIONS = registry.gauge(
+    "tutor_quiz_sessions", "Active quizzes in the shared cache"
+)
+
+OPTIONS = "ABCD"
+UNANSWERED = "0"  # answer strings hold "1"-"4" for A-D
+
+
+class QuizNotFoundError(KeyError):
+    """Raised for an unknown or expired quiz or attempt id"""
+
+
+class QuizClosedError(ValueError):
+    """Raised for answers after the time limit or to a finished attempt"""
+
+
+class AnswersHiddenError(PermissionError):
+    """Raised for a result requested before the attempt is finished"""
+
+
+class QuizService:
+    """Timed MCQ quizzes taken by many students at once.
+
+    A question set is stored once per quiz; each attempt keeps one character
+    per question plus its score. Answers are graded against the server-side
+    key without a model call, and results are aggregated as they arrive.
+    Each student id gets one attempt. Correct answers and explanations stay
+    on the server until the teacher closes the quiz, so a finished attempt
+    cannot be used to answer the next one.
+
+    Quizzes live in the shared cache, so any API worker can serve any request.
+    Each quiz is a few small records (question set, aggregates, attempt list,
+    one per attempt) updated by compare-and-swap, and all of them expire
+    after ``ttl`` seconds. Attempts past their time limit are finished the
+    next time the quiz or the attempt is read, so live results count them.
+    """
+
+    index_key = "quizzes"  # quiz id -> expiry, for the active quiz limit
+
+    def __init__(self, cache: SharedCache, ttl: float = 24 * 3600, max_quizzes: int = 1000,
+                 max_attempts: int = 5000, grace: float = 5.0):
+        self.cache = cache
+        self.ttl = ttl
+        self.max_quizzes = max_quizzes
+        self.max_attempts = max_attempts
+        self.grace = grace  # seconds of network slack after the time limit
+        self.cache.add(self.index_key, {})
+
+    # -- storage -------------------------------------------------------
+    @staticmethod
+    def _key(quiz_id: str, *parts: str) -> str:
+        return ":".join(("quiz", quiz_id) + parts)
+
+    def _update(self, key: str, expires_at: Optional[float], change: Callable[[Dict], Optional[Dict]]):
+        """Apply ``change`` to a copy of the record and swap it in; retried when another
+        worker wrote first. Returns the stored record, or None when ``change`` returned None."""
+        while True:
+            current = self.cache.get(key)
+            if current is None:
+                raise QuizNotFoundError(key)
+            value = change(copy.deepcopy(current))
+            if value is None:
+                return None
+            ttl = expires_at - time.time() if expires_at else None
+            if ttl is not None and ttl <= 0:
+                raise QuizNotFoundError(key)
+            if self.cache.replace(key, current, value, ttl):
+                return value
+
+    # -- quizzes -------------------------------------------------------
+    def create(self, mcqs: List[Dict], title: str = "", time_limit: Optional[float] = None) -> Dict:
+        """Store a question set; returns the quiz with its teacher key"""
+        cleaned = [_normalize_mcq(m) if isinstance(m, dict) else None for m in mcqs or []]
+        if not cleaned or None in cleaned:
+            raise ValueError("A quiz needs at least one MCQ with a question, four options and an answer A-D")
+        if time_limit is not None and time_limit <= 0:
+            raise ValueError("time_limit must be positive")
+
+        now = time.time()
+        quiz_id = secrets.token_urlsafe(9)
+        quiz = {
+            "quiz_id": quiz_id,
+            "teacher_key": secrets.token_urlsafe(16),
+            "title": title,
+            "time_limit": time_limit,
+            "created_at": now,
+            "expires_at": now + self.ttl,
+            "key": "".join(str(OPTIONS.index(m["correct_answer"]) + 1) for m in cleaned),
+            "explanations": [m.get("explanation", "") for m in cleaned],
+            # What students see: no answers, no explanations
+            "questions": [
+                {"index": i, "question": m["question"], "options": m["options"]}
+                for i, m in enumerate(cleaned)
+            ],
+        }
+
+        def register(index):
+            index = {q: expires_at for q, expires_at in index.items() if expires_at > now}
+            if len(index) >= self.max_quizzes:
+                raise QuizClosedError("Too many active quizzes, try again later")
+            index[quiz_id] = quiz["expires_at"]
+            return index
+
+        index = self._update(self.index_key, None, register)
+        QUIZ_SESSIONS.set(len(index))
+        self.cache.set(self._key(quiz_id, "state"), {
+            "closed": False,  # closing ends open attempts and releases the answers
+            "finished": 0,
+            "option_counts": [0] * (4 * len(cleaned)),  # [question * 4 + option]
+            "score_counts": [0] * (len(cleaned) + 1),  # finished attempts per score
+        }, ttl=self.ttl)
+        # attempt id -> student id, and the open attempts with their deadlines
+        self.cache.set(self._key(quiz_id, "attempts"), {"students": {}, "open": {}}, ttl=self.ttl)
+        self.cache.set(self._key(quiz_id), quiz, ttl=self.ttl)
+        logger.info(f"Quiz {quiz_id} created with {len(cleaned)} questions")
+        return {**self.get(quiz_id), "teacher_key": quiz["teacher_key"]}
+
+    def _quiz(self, quiz_id: str) -> Dict:
+        quiz = self.cache.get(self._key(quiz_id))
+        if quiz is None or quiz["expires_at"] <= time.time():
+            raise QuizNotFoundError(quiz_id)
+        return quiz
+
+    def _state(self, quiz: Dict) -> Dict:
+        state = self.cache.get(self._key(quiz["quiz_id"], "state"))
+        if state is None:
+            raise QuizNotFoundError(quiz["quiz_id"])
+        return state
+
+    def get(self, quiz_id: str) -> Dict:
+        """The quiz as students see it"""
+        quiz = self._quiz(quiz_id)
+        return {
+            "quiz_id": quiz_id,
+            "title": quiz["title"],
+            "time_limit": quiz["time_limit"],
+            "closed": self._state(quiz)["closed"],
+            "questions": quiz["questions"],
+        }
+
+    def check_teacher_key(self, quiz_id: str, teacher_key: str) -> bool:
+        return hmac.compare_digest(self._quiz(quiz_id)["teacher_key"], teacher_key or "")
+
+    def close(self, quiz_id: str) -> Dict:
+        """Stop the quiz: open attempts are finished as they stand and answers are released"""
+        quiz = self._quiz(quiz_id)
+
+        def closed(state):
+            state["closed"] = True
+            return state
+
+        self._update(self._key(quiz_id, "state"), quiz["expires_at"], closed)
+        for attempt_id in self.cache.get(self._key(quiz_id, "attempts"), {"open": {}})["open"]:
+            self._finish(quiz, attempt_id)
+        return self.get(quiz_id)
+
+    def delete(self, quiz_id: str):
+        def unregister(index):
+            if quiz_id not in index:
+                raise QuizNotFoundError(quiz_id)
+            del index[quiz_id]
+            return index
+
+        index = self._update(self.index_key, None, unregister)
+        QUIZ_SESSIONS.set(len(index))
+        attempts = self.cache.get(self._key(quiz_id, "attempts"), {"students": {}})
+        for attempt_id, student_id in attempts["students"].items():
+            self.cache.delete(self._key(quiz_id, "attempt", attempt_id))
+            self.cache.delete(self._key(quiz_id, "student", student_id))
+        for part in ("attempts", "state"):
+            self.cache.delete(self._key(quiz_id, part))
+        self.cache.delete(self._key(quiz_id))
+
+    # -- attempts ------------------------------------------------------
+    def start(self, quiz_id: str, student_id: str) -> Dict:
+        student_id = str(student_id or "").strip()
+        if not student_id or len(student_id) > 64:
+            raise ValueError("A student_id of up to 64 characters is required")
+        quiz = self._quiz(quiz_id)
+        if self._state(quiz)["closed"]:
+            raise QuizClosedError("This quiz is closed")
+
+        ttl = quiz["expires_at"] - time.time()
+        attempt_id = secrets.token_urlsafe(12)
+        student_key = self._key(quiz_id, "student", student_id)
+        if not self.cache.add(student_key, attempt_id, ttl=ttl):
+            raise QuizClosedError("This student already has an attempt")
+        started_at = time.time()
+        deadline = started_at + quiz["time_limit"] if quiz["time_limit"] else None
+        self.cache.set(self._key(quiz_id, "attempt", attempt_id), {
+            "student_id": student_id,
+            "started_at": started_at,
+            "answers": UNANSWERED * len(quiz["key"]),
+            "score": 0,
+            "finished": False,
+        }, ttl=ttl)
+
+        def register(attempts):
+            if len(attempts["students"]) >= self.max_attempts:
+                raise QuizClosedError("This quiz has reached its attempt limit")
+            attempts["students"][attempt_id] = student_id
+            attempts["open"][attempt_id] = deadline
+            return attempts
+
+        try:
+            self._update(self._key(quiz_id, "attempts"), quiz["expires_at"], register)
+        except QuizClosedError:
+            self.cache.delete(self._key(quiz_id, "attempt", attempt_id))
+            self.cache.delete(student_key)
+            raise
+        if self._state(quiz)["closed"]:
+            # Closed while this attempt was being registered: close() may have missed it
+            self._finish(quiz, attempt_id)
+            raise QuizClosedError("This quiz is closed")
+        return {"attempt_id": attempt_id, "started_at": started_at, "deadline": deadline}
+
+    def _attempt(self, quiz: Dict, attempt_id: str) -> Dict:
+        attempt = self.cache.get(self._key(quiz["quiz_id"], "attempt", attempt_id))
+        if attempt is None:
+            raise QuizNotFoundError(attempt_id)
+        return attempt
+
+    def _overdue(self, quiz: Dict, started_at: float) -> bool:
+        return bool(quiz["time_limit"]) and time.time() > started_at + quiz["time_limit"] + self.grace
+
+    def answer(self, quiz_id: str, attempt_id: str, question: int, option: str) -> Dict:
+        """Grade one answer; each question can be answered once per attempt"""
+        quiz = self._quiz(quiz_id)
+        if not isinstance(question, int) or not 0 <= question < len(quiz["key"]):
+            raise ValueError("Unknown question index")
+        choice = OPTIONS.find(str(option or "").strip().upper()[:1]) + 1
+        if not choice:
+            raise ValueError("Answer must be one of A, B, C or D")
+        if self._state(quiz)["closed"]:
+            raise QuizClosedError("This quiz is closed")
+        correct = quiz["key"][question] == str(choice)
+
+        def record(attempt):
+            if attempt["finished"]:
+                raise QuizClosedError("This attempt is already finished")
+            if self._overdue(quiz, attempt["started_at"]):
+                raise QuizClosedError("The time limit for this attempt has passed")
+            if attempt["answers"][question] != UNANSWERED:
+                raise QuizClosedError("This question was already answered")
+            answers = attempt["answers"]
+            attempt["answers"] = answers[:question] + str(choice) + answers[question + 1:]
+            attempt["score"] += correct
+            return attempt
+
+        try:
+            self._update(self._key(quiz_id, "attempt", attempt_id), quiz["expires_at"], record)
+        except QuizNotFoundError:
+            raise QuizNotFoundError(attempt_id)
+        except QuizClosedError:
+            attempt = self._attempt(quiz, attempt_id)
+            if not attempt["finished"] and self._overdue(quiz, attempt["started_at"]):
+                self._finish(quiz, attempt_id)
+            raise
+
+        def count(state):
+            state["option_counts"][question * 4 + choice - 1] += 1
+            return state
+
+        self._update(self._key(quiz_id, "state"), quiz["expires_at"], count)
+        QUIZ_ANSWERS.inc(result="correct" if correct else "incorrect")
+        return {"question": question, "recorded": OPTIONS[choice - 1]}
+
+    def _finish(self, quiz: Dict, attempt_id: str):
+        """Mark an attempt finished and count its score, once across all workers"""
+        def finished(attempt):
+            if attempt["finished"]:
+                return None
+            attempt["finished"] = True
+            return attempt
+
+        quiz_id, expires_at = quiz["quiz_id"], quiz["expires_at"]
+        attempt = self._update(self._key(quiz_id, "attempt", attempt_id), expires_at, finished)
+        if attempt is None:
+            return
+
+        def counted(state):
+            state["finished"] += 1
+            state["score_counts"][attempt["score"]] += 1
+            return state
+
+        def closed(attempts):
+            attempts["open"].pop(attempt_id, None)
+            return attempts
+
+        self._update(self._key(quiz_id, "state"), expires_at, counted)
+        self._update(self._key(quiz_id, "attempts"), expires_at, closed)
+
+    def _finish_overdue(self, quiz: Dict):
+        """Finish open attempts whose time limit has passed"""
+        if not quiz["time_limit"]:
+            return
+        attempts = self.cache.get(self._key(quiz["quiz_id"], "attempts"), {"open": {}})
+        for attempt_id, deadline in attempts["open"].items():
+            if time.time() > deadline + self.grace:
+                self._finish(quiz, attempt_id)
+
+    def finish(self, quiz_id: str, attempt_id: str) -> Dict:
+        """Close an attempt and return its graded result"""
+        quiz = self._quiz(quiz_id)
+        self._attempt(quiz, attempt_id)
+        self._finish(quiz, attempt_id)
+        return self.result(quiz_id, attempt_id)
+
+    def result(self, quiz_id: str, attempt_id: str) -> Dict:
+        """Score of a finished attempt; correct answers and explanations once the quiz is closed"""
+        quiz = self._quiz(quiz_id)
+        attempt = self._attempt(quiz, attempt_id)
+        if not attempt["finished"]:
+            if not self._overdue(quiz, attempt["started_at"]):
+                raise AnswersHiddenError("Finish the attempt to see its result")
+            self._finish(quiz, attempt_id)
+            attempt = self._attempt(quiz, attempt_id)
+        released = self._state(quiz)["closed"]
+
+        key, answers, score = quiz["key"], attempt["answers"], attempt["score"]
+        total = len(key)
+        percentage = score / total * 100
+        questions = []
+        for i in range(total):
+            question = {"index": i, "answer": OPTIONS[int(answers[i]) - 1] if answers[i] != UNANSWERED else None}
+            if released:
+                question.update({
+                    "correct_answer": OPTIONS[int(key[i]) - 1],
+                    "correct": answers[i] == key[i],
+                    "explanation": quiz["explanations"][i],
+                })
+            questions.append(question)
+        return {
+            "quiz_id": quiz_id,
+            "attempt_id": attempt_id,
+            "student_id": attempt["student_id"],
+            "total_score": score,
+            "total_questions": total,
+            "percentage": percentage,
+            "grade": letter_grade(percentage),
+            "answers_released": released,
+            "questions": questions,
+        }
+
+    # -- teacher view --------------------------------------------------
+    def results(self, quiz_id: str) -> Dict:
+        """Live aggregate results, computed from the counters only"""
+        quiz = self._quiz(quiz_id)
+        self._finish_overdue(quiz)
+        state = self._state(quiz)
+        started = len(self.cache.get(self._key(quiz_id, "attempts"), {"students": {}})["students"])
+        option_counts, score_counts, finished = state["option_counts"], state["score_counts"], state["finished"]
+
+        total = len(quiz["key"])
+        scored = sum(score * count for score, count in enumerate(score_counts))
+        questions = []
+        for i in range(total):
+            counts = option_counts[i * 4:i * 4 + 4]
+            answered = sum(counts)
+            correct = counts[int(quiz["key"][i]) - 1]
+            questions.append({
+                "index": i,
+                "answered": answered,
+                "correct_rate": correct / answered if answered else None,
+                "option_counts": dict(zip(OPTIONS, counts)),
+            })
+        return {
+            "quiz_id": quiz_id,
+            "title": quiz["title"],
+            "closed": state["closed"],
+            "attempts_started": started,
+            "attempts_finished": finished,
+            "mean_percentage": scored / finished / total * 100 if finished else None,
+            "score_distribution": {str(score): count for score, count in enumerate(score_counts)},
+            "questions": questions,
+        }
@@ -0,0 +1,287 @@
+"""Run RAGService in one process and call it from many API workers.
+
+With ``uvicorn --workers N`` every worker would otherwise load its own copy
+of the embedding model and open the same vector store directory.
+``RAGServer`` owns the only RAGService and answers calls over a local Unix
+socket; ``RemoteRAGService`` is a drop-in client with the same methods, so
+workers stay stateless. Start the server with ``python -m app.cli.rag_server``
+and set ``RAG_SERVICE_ADDRESS`` for the API workers.
+
+Calls are pickled, so a client that can talk to the server can run code in
+it. Every connection must present an auth key: ``RAG_SERVICE_AUTHKEY`` if
+set, otherwise a random key the server writes to ``<address>.key`` (mode
+0600) and clients of the same user read.
+"""
+from multiprocessing.connection import (
+    AuthenticationError, Client, Listener, answer_challenge, deliver_challenge
+)
+from typing import Dict, List, Optional
+import logging
+import os
+import secrets
+import stat
+import threading
+
+from app.utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+# RAGService methods callable over the socket
+EXPOSED_METHODS = frozenset({
+    "add_documents",
+    "split_document",
+    "flush",
+    "embed_query",
+    "search",
+    "similarity_search",
+    "get_context_for_question",
+    "get_document",
+    "list_documents",
+    "delete_document",
+    "replace_document",
+    "export_snapshot",
+    "import_snapshot",
+    "build_topics",
+    "label_topics",
+    "list_topics",
+    "search_topic",
+})
+# Safe to resend when the connection broke mid-call. Not delete_document: if
+# the first send got through, the resend reports the document as not found.
+IDEMPOTENT_METHODS = frozenset({
+    "split_document",
+    "flush",
+    "embed_query",
+    "search",
+    "similarity_search",
+    "get_context_for_question",
+    "get_document",
+    "list_documents",
+    "export_snapshot",
+    "build_topics",
+    "label_topics",
+    "list_topics",
+    "search_topic",
+})
+
+
+def authkey_path(address: str) -> str:
+    return f"{address}.key"
+
+
+def read_authkey(address: str) -> bytes:
+    """The auth key the server at ``address`` wrote; refuses a file others can read"""
+    path = authkey_path(address)
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        raise RuntimeError(f"No auth key at {path}: start the RAG server or set RAG_SERVICE_AUTHKEY")
+    if mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise RuntimeError(f"Auth key {path} is readable by other users; it must be mode 0600")
+    with open(path, "rb") as f:
+        key = f.read().strip()
+    if not key:
+        raise RuntimeError(f"Auth key {path} is empty")
+    return key
+
+
+def ensure_authkey(address: str) -> bytes:
+    """The key in ``<address>.key``, created with mode 0600 on first use"""
+    path = authkey_path(address)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return read_authkey(address)
+    with os.fdopen(fd, "wb") as f:
+        f.write(secrets.token_hex(32).encode())
+    return read_authkey(address)
+
+
+class RAGServer:
+    """Serves one RAGService to local clients, one thread per connection.
+
+    Without ``authkey`` the key comes from ``<address>.key``, created if missing.
+    """
+
+    def __init__(self, rag_service, address: str, authkey: Optional[bytes] = None):
+        if authkey is not None and not authkey:
+            raise ValueError("RAG server auth key must not be empty")
+        self.rag_service = rag_service
+        self.address = address
+        self.authkey = authkey
+        self._listener: Optional[Listener] = None
+        self._closed = threading.Event()
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            # Left over from a previous run; a live server would still hold it
+            os.unlink(self.address)
+        os.makedirs(os.path.dirname(self.address) or ".", exist_ok=True)
+        if self.authkey is None:
+            self.authkey = ensure_authkey(self.address)
+
+        old_umask = os.umask(0o077)  # socket readable by this user only
+        try:
+            # Authentication happens per connection thread, so a client that
+            # stalls or drops mid-handshake cannot hold up or stop accept()
+            self._listener = Listener(self.address, family="AF_UNIX")
+        finally:
+            os.umask(old_umask)
+        logger.info(f"RAG service listening on {self.address}")
+
+        while not self._closed.is_set():
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._closed.is_set():
+                    break
+                raise
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                deliver_challenge(conn, self.authkey)
+                answer_challenge(conn, self.authkey)
+            except AuthenticationError:
+                logger.warning("Rejected RAG client with a wrong auth key")
+                return
+            except (EOFError, OSError):
+                return
+            while True:
+                try:
+                    method, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if method not in EXPOSED_METHODS:
+                    reply = (False, AttributeError(f"RAG service has no remote method {method!r}"))
+                else:
+                    try:
+                        reply = (True, getattr(self.rag_service, method)(*args, **kwargs))
+                    except Exception as e:
+                        reply = (False, e)
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+                except Exception as e:
+                    # Unpicklable result or exception
+                    conn.send((False, RuntimeError(f"{method} failed: {e!r}")))
+
+    def close(self):
+        self._closed.set()
+        if self._listener is not None:
+            self._listener.close()
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+class RemoteRAGService:
+    """Client for RAGServer with the RAGService interface.
+
+    Each calling thread keeps its own connection, so concurrent requests from
+    the threadpool are served in parallel by the server. Without ``authkey``
+    the key is read from the server's ``<address>.key``.
+    """
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None):
+        self.address = address
+        self.authkey = authkey
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            authkey = self.authkey or read_authkey(self.address)
+            conn = Client(self.address, family="AF_UNIX", authkey=authkey)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            conn.close()
+
+    def _call(self, method: str, *args, **kwargs):
+        attempts = 2 if method in IDEMPOTENT_METHODS else 1
+        with span("rag_rpc"):
+            for attempt in range(attempts):
+                try:
+                    conn = self._connection()
+                    conn.send((method, args, kwargs))
+                    ok, value = conn.recv()
+                    break
+                except (EOFError, OSError):
+                    # Server restarted: reconnect once for calls that are safe to repeat
+                    self._drop_connection()
+                    if attempt == attempts - 1:
+                        raise
+        if not ok:
+            raise value
+        return value
+
+    def add_documents(self, documents: List[Dict]):
+        return self._call("add_documents", documents)
+
+    def split_document(self, doc: Dict):
+        return self._call("split_document", doc)
+
+    def flush(self):
+        return self._call("flush")
+
+    def embed_query(self, query: str) -> List[float]:
+        return self._call("embed_query", query)
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        return self._call("search", query, k=k)
+
+    def similarity_search(self, query: str, k: int = 5):
+        return self._call("similarity_search", query, k=k)
+
+    def get_context_for_question(self, question: str) -> str:
+        return self._call("get_context_for_question", question)
+
+    def get_document(self, doc_id: str) -> Optional[Dict]:
+        return self._call("get_document", doc_id)
+
+    def list_documents(self) -> List[Dict]:
+        return self._call("list_documents")
+
+    def delete_document(self, doc_id: str) -> Optional[Dict]:
+        return self._call("delete_document", doc_id)
+
+    def replace_document(self, doc_id: str, document: Dict) -> Optional[Dict]:
+        return self._call("replace_document", doc_id, document)
+
+    def export_snapshot(self, path: str) -> Dict:
+        return self._call("export_snapshot", path)
+
+    def import_snapshot(self, path: str, replace: bool = False) -> Dict:
+        return self._call("import_snapshot", path, replace=replace)
+
+    def build_topics(self, n_topics: int = None) -> List[Dict]:
+        return self._call("build_topics", n_topics)
+
+    def label_topics(self, labels: Dict[str, str]) -> int:
+        return self._call("label_topics", labels)
+
+    def list_topics(self) -> Dict:
+        return self._call("list_topics")
+
+    def search_topic(self, topic_id: str, query: str = None, k: int = 5) -> List[Dict]:
+        return self._call("search_topic", topic_id, query, k=k)
+
+    def close(self):
+        """Close client connections; the server keeps running"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
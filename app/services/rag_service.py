@@ -1,55 +1,125 @@
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
 from langchain.schema import Document
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 from typing import List, Dict, Any
-import chromadb
+import json
 import os
+import time
+import numpy as np
+from app.config import Config
+from app.services.vector_store import create_vector_store
+from app.services.ingest_buffer import IngestionBuffer
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.document_registry import DocumentRegistry, chunk_id, document_id
+from app.services.retrieval_policy import RetrievalPolicy
+from app.services.chunking import StructuredChunker, split_document
+from app.services.snapshot import Snapshot, SnapshotError, write_snapshot
+from app.services.topic_index import TopicIndex, cluster_topics
+import logging
+from app.utils.metrics import registry, span
+from app.utils.singleflight import SingleFlight, flight_key
 
+logger = logging.getLogger(__name__)
 
+CHUNKS_INGESTED = registry.counter("tutor_chunks_ingested_total", "Text chunks added to the vector store")
+DOCUMENTS_INGESTED = registry.counter("tutor_documents_ingested_total", "Documents added to the vector store")
+DOCUMENTS_DELETED = registry.counter("tutor_documents_deleted_total", "Documents removed from the vector store")
 
+# Per-chunk metadata kept in the store; file-level details live in the DocumentRegistry
+CHUNK_METADATA_KEYS = ('section', 'page_start', 'page_end')
 
 
 class RAGService:
-    def __init__(self, persist_directory: str = "data/embeddings"):
+    def __init__(self, persist_directory: str = "data/embeddings", backend: str = None,
+                 use_ingest_buffer: bool = None, batch_queries: bool = None):
         self.persist_directory = persist_directory
+        self.backend = backend or Config.VECTOR_BACKEND
+        self._search_flights = SingleFlight("retrieval")
         
         # Create directory if it doesn't exist
+        fresh = not os.path.isdir(persist_directory) or not os.listdir(persist_directory)
         os.makedirs(persist_directory, exist_ok=True)
         
         # Use HuggingFace embeddings for vector storage
+        self.embedding_model = "sentence-transformers/all-MiniLM-L6-v2"
         try:
             self.embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/all-MiniLM-L6-v2",
+                model_name=self.embedding_model,
                 model_kwargs={'device': 'cpu'}  # Use CPU to avoid GPU issues
             )
         except Exception as e:
-            print(f"Error loading embeddings model: {e}")
+            logger.error(f"Error loading embeddings model: {e}")
             # Fallback to a simpler model
+            self.embedding_model = "sentence-transformers/paraphrase-MiniLM-L3-v2"
             self.embeddings = HuggingFaceEmbeddings(
-                model_name="sentence-transformers/paraphrase-MiniLM-L3-v2"
+                model_name=self.embedding_model
             )
         
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000, 
-            chunk_overlap=200,
+            chunk_size=Config.CHUNK_SIZE, 
+            chunk_overlap=Config.CHUNK_OVERLAP,
             length_function=len
         )
+        self.chunker = StructuredChunker(
+            chunk_size=Config.CHUNK_SIZE,
+            chunk_overlap=Config.CHUNK_OVERLAP
+        )
+        self.chunking_strategy = Config.CHUNKING_STRATEGY
+        self.retrieval_policy = RetrievalPolicy.from_config() if Config.ADAPTIVE_RETRIEVAL_ENABLED else None
         self.vectorstore = None
         self.initialize_vectorstore()
+        self.documents = DocumentRegistry(os.path.join(self.persist_directory, "documents.json"))
+        self.topics = TopicIndex(os.path.join(self.persist_directory, "topics"))
+        
+        # Batch writes from concurrent uploads instead of persisting after each one
+        if use_ingest_buffer is None:
+            use_ingest_buffer = Config.INGEST_BUFFER_ENABLED
+        self.ingest_buffer = None
+        if use_ingest_buffer:
+            self.ingest_buffer = IngestionBuffer(
+                self.vectorstore,
+                os.path.join(self.persist_directory, "ingest_spool"),
+                max_batch=Config.INGEST_BATCH_SIZE,
+                flush_interval=Config.INGEST_FLUSH_INTERVAL
+            )
+            self.ingest_buffer.start()
+        
+        # Embed concurrent search queries together in one model call
+        if batch_queries is None:
+            batch_queries = Config.QUERY_BATCH_ENABLED
+        self.query_batcher = None
+        if batch_queries:
+            self.query_batcher = EmbeddingBatcher(
+                self.embeddings,
+                max_batch=Config.QUERY_BATCH_SIZE,
+                max_wait=Config.QUERY_BATCH_WAIT_MS / 1000
+            )
+        
+        # A fresh instance starts from the shipped snapshot instead of re-ingesting.
+        # Only into a new directory: an empty store that was in use may have had
+        # its documents deleted, and importing again would bring them back.
+        snapshot_path = Config.VECTOR_SNAPSHOT_PATH
+        if (snapshot_path and fresh and os.path.exists(snapshot_path)
+                and not os.path.exists(self._snapshot_marker)):
+            try:
+                self.import_snapshot(snapshot_path)
+            except Exception as e:
+                logger.error(f"Error loading vector store snapshot {snapshot_path}: {e}")
     
     def initialize_vectorstore(self):
         """Initialize or load existing vector store"""
         try:
-            self.vectorstore = Chroma(
-                persist_directory=self.persist_directory,
-                embedding_function=self.embeddings
+            self.vectorstore = create_vector_store(
+                self.backend, self.persist_directory, self.embeddings
             )
-            print(f"Vector store initialized at: {self.persist_directory}")
+            logger.info(f"Vector store ({self.backend}) initialized at: {self.persist_directory}")
+        except (ImportError, ValueError):
+            # Missing optional backend or unknown backend name: keep the data on disk
+            raise
         except Exception as e:
-            print(f"Error initializing vector store: {e}")
+            logger.error(f"Error initializing vector store: {e}")
             # Try to create a new one
             try:
                 import shutil
@@ -57,13 +127,12 @@ class RAGService:
                     shutil.rmtree(self.persist_directory)
                 os.makedirs(self.persist_directory, exist_ok=True)
                 
-                self.vectorstore = Chroma(
-                    persist_directory=self.persist_directory,
-                    embedding_function=self.embeddings
+                self.vectorstore = create_vector_store(
+                    self.backend, self.persist_directory, self.embeddings
                 )
-                print("Vector store recreated successfully")
+                logger.info("Vector store recreated successfully")
             except Exception as e2:
-                print(f"Failed to recreate vector store: {e2}")
+                logger.error(f"Failed to recreate vector store: {e2}")
                 raise
     
     def add_documents(self, documents: List[Dict]):
@@ -72,37 +141,237 @@ class RAGService:
             # Split documents into chunks
             texts = []
             metadatas = []
+            ids = []
+            added = []
+            seen = set()
             
             for doc in documents:
                 if not doc.get('content'):
-                    print(f"Warning: Document {doc.get('file_name', 'unknown')} has no content")
+                    logger.warning(f"Document {doc.get('file_name', 'unknown')} has no content")
+                    continue
+                doc_id = document_id(doc)
+                if doc_id in self.documents or doc_id in seen:
+                    logger.info(f"Document {doc.get('file_name', 'unknown')} is already ingested")
                     continue
                     
-                chunks = self.text_splitter.split_text(doc['content'])
-                for i, chunk in enumerate(chunks):
+                # Bulk ingest splits in its extraction workers and passes the chunks along
+                chunks = doc.get('chunks')
+                if chunks is None:
+                    with span("chunk"):
+                        chunks = self.split_document(doc)
+                for i, (chunk, chunk_metadata) in enumerate(chunks):
                     texts.append(chunk)
-                    metadatas.append({
-                        'source': doc['file_path'],
-                        'chunk_id': i,
-                        'file_type': doc['file_type']
-                    })
+                    ids.append(chunk_id(doc_id, i))
+                    metadata = {'doc_id': doc_id, 'chunk': i}
+                    for key in CHUNK_METADATA_KEYS:
+                        if chunk_metadata.get(key) not in (None, ""):
+                            metadata[key] = chunk_metadata[key]
+                    metadatas.append(metadata)
+                seen.add(doc_id)
+                added.append((doc, len(chunks)))
             
             if texts:
-                # Add to vector store
-                self.vectorstore.add_texts(texts, metadatas)
-                self.vectorstore.persist()
-                print(f"Added {len(texts)} text chunks to vector store")
+                # Embed outside the store so concurrent uploads don't serialize on it
+                with span("embed"):
+                    embeddings = self.embeddings.embed_documents(texts)
+                if self.ingest_buffer is not None:
+                    self.ingest_buffer.add(texts, metadatas, embeddings, ids)
+                    logger.info(f"Queued {len(texts)} text chunks for the vector store")
+                else:
+                    self.vectorstore.add_texts(texts, metadatas, embeddings=embeddings, ids=ids)
+                    self.vectorstore.persist()
+                    logger.info(f"Added {len(texts)} text chunks to vector store")
+                CHUNKS_INGESTED.inc(len(texts))
+                DOCUMENTS_INGESTED.inc(len(added))
             else:
-                print("No text chunks to add")
-                
+                logger.info("No text chunks to add")
+            
+            for doc, chunk_count in added:
+                self.documents.register(doc, chunk_count)
         except Exception as e:
-            print(f"Error adding documents to vector store: {e}")
+            logger.error(f"Error adding documents to vector store: {e}")
             raise
     
+    def get_document(self, doc_id: str) -> Dict:
+        return self.documents.get(doc_id)
+    
+    def list_documents(self) -> List[Dict]:
+        return self.documents.list()
+    
+    def delete_document(self, doc_id: str) -> Dict:
+        """Remove a document and its chunks; returns its record, or None if unknown"""
+        record = self.documents.get(doc_id)
+        if record is None:
+            return None
+        # Chunks may still be waiting in the ingest buffer
+        self.flush()
+        self.vectorstore.delete(DocumentRegistry.chunk_ids(record))
+        self.vectorstore.persist()
+        self.documents.remove(doc_id)
+        DOCUMENTS_DELETED.inc()
+        logger.info(f"Deleted {record['file_name']} ({record['chunk_count']} chunks)")
+        return record
+    
+    def replace_document(self, doc_id: str, document: Dict) -> Dict:
+        """Swap an ingested document for a new version; returns the old record.
+
+        The new version (a new id, since ids come from the content) is stored
+        first and the old one deleted only after that succeeded, so a failed
+        embed or write leaves the old version in place and searchable.
+        """
+        record = self.documents.get(doc_id)
+        new_id = document_id(document)
+        if record is not None and new_id == doc_id:
+            return record  # same content, nothing to swap
+        self.add_documents([document])
+        if new_id not in self.documents:
+            raise ValueError("The new version has no text to index")
+        if record is not None:
+            self.delete_document(doc_id)
+        return record
+    
+    def export_snapshot(self, path: str) -> Dict:
+        """Write every chunk with its vector and the document records to one file"""
+        self.flush()
+        with span("snapshot_export"):
+            manifest = write_snapshot(
+                path, self.vectorstore.iter_rows(), self.documents.list(), self.embedding_model
+            )
+        logger.info(f"Exported {manifest['count']} chunks of {manifest['documents']} documents to {path}")
+        return manifest
+    
+    def import_snapshot(self, path: str, replace: bool = False) -> Dict:
+        """Load chunks and their stored vectors from a snapshot, embedding nothing.
+
+        Documents already ingested here are kept and skipped in the snapshot;
+        with ``replace`` every registered document is deleted first.
+        """
+        with Snapshot(path) as snapshot, span("snapshot_import"):
+            if snapshot.embedding_model != self.embedding_model:
+                raise SnapshotError(
+                    f"Snapshot was embedded with {snapshot.embedding_model}, "
+                    f"this service uses {self.embedding_model}"
+                )
+            self.flush()
+            if replace:
+                for record in self.documents.list():
+                    self.vectorstore.delete(DocumentRegistry.chunk_ids(record))
+                    self.documents.remove(record['document_id'])
+            existing = {record['document_id'] for record in self.documents.list()}
+
+            chunks = 0
+            for ids, texts, metadatas, vectors in snapshot.iter_batches():
+                keep = [i for i, metadata in enumerate(metadatas) if metadata.get('doc_id') not in existing]
+                if not keep:
+                    continue
+                self.vectorstore.add_texts(
+                    [texts[i] for i in keep], [metadatas[i] for i in keep],
+                    embeddings=vectors[keep], ids=[ids[i] for i in keep]
+                )
+                chunks += len(keep)
+            self.vectorstore.persist()
+            records = snapshot.documents()
+            documents = [record for record in records if record['document_id'] not in existing]
+            self.documents.restore(documents)
+        summary = {"chunks": chunks, "documents": len(documents), "skipped_documents": len(records) - len(documents)}
+        self._record_snapshot_import(path, summary)
+        logger.info(f"Imported {chunks} chunks of {len(documents)} documents from {path}")
+        return summary
+    
+    @property
+    def _snapshot_marker(self) -> str:
+        return os.path.join(self.persist_directory, "snapshot_import.json")
+    
+    def _record_snapshot_import(self, path: str, summary: Dict):
+        """Note the import in the persist directory so startup never repeats it"""
+        tmp_path = f"{self._snapshot_marker}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(dict(summary, path=os.path.abspath(path), imported_at=time.time()), f)
+        os.replace(tmp_path, self._snapshot_marker)
+    
+    def build_topics(self, n_topics: int = None) -> List[Dict]:
+        """Cluster every chunk into topics and store the topic index.
+
+        Topics get keyword labels here; the returned topics carry sample
+        passages so the caller can name them (``label_topics``).
+        """
+        self.flush()
+        ids, texts, metadatas, blocks = [], [], [], []
+        for batch_ids, batch_texts, batch_metadatas, vectors in self.vectorstore.iter_rows():
+            # Chunks stored without an id cannot be looked up again
+            keep = [i for i, chunk_id in enumerate(batch_ids) if chunk_id]
+            ids.extend(batch_ids[i] for i in keep)
+            texts.extend(batch_texts[i] for i in keep)
+            metadatas.extend(batch_metadatas[i] for i in keep)
+            blocks.append(vectors[keep])
+        if not ids:
+            raise ValueError("The knowledge base has no chunks to group into topics")
+        
+        with span("topic_build"):
+            topics, ordered_ids, ordered_vectors = cluster_topics(
+                ids, texts, metadatas, np.vstack(blocks), n_topics or Config.TOPIC_COUNT or None
+            )
+            self.topics.save(topics, ordered_ids, ordered_vectors, len(ids))
+        logger.info(f"Grouped {len(ids)} chunks into {len(topics)} topics")
+        
+        texts_by_id = dict(zip(ids, texts))
+        return [
+            {**{key: topic[key] for key in TopicIndex.public_fields},
+             'samples': [texts_by_id[chunk_id] for chunk_id in topic['representatives']]}
+            for topic in topics
+        ]
+    
+    def label_topics(self, labels: Dict[str, str]) -> int:
+        return self.topics.set_labels(labels)
+    
+    def list_topics(self) -> Dict:
+        return self.topics.summary()
+    
+    def search_topic(self, topic_id: str, query: str = None, k: int = 5) -> List[Dict]:
+        """Chunks of one topic, closest to ``query`` first, without the global index.
+
+        Without a query the topic's most central chunks are returned.
+        """
+        if query:
+            query_vector = np.asarray(self.embed_query(query), dtype=np.float32)
+            query_vector /= np.linalg.norm(query_vector) or 1.0
+            with span("vector_search"):
+                hits = self.topics.search(topic_id, query_vector, k)
+        else:
+            hits = [(chunk_id, 1.0) for chunk_id in self.topics.topic(topic_id)['representatives'][:k]]
+        
+        # Chunks deleted since the build are skipped
+        docs = self.vectorstore.get([chunk_id for chunk_id, _ in hits])
+        results = [(doc, similarity) for doc, (_, similarity) in zip(docs, hits) if doc is not None]
+        self._attach_file_names(doc for doc, _ in results)
+        return [
+            {'content': doc.page_content, 'metadata': doc.metadata, 'score': float(2.0 - 2.0 * similarity)}
+            for doc, similarity in results
+        ]
+    
+    def split_document(self, doc: Dict) -> List[tuple]:
+        """Split a processed document into (text, metadata) chunks"""
+        return split_document(doc, self.chunking_strategy, self.chunker, self.text_splitter)
+    
+    def flush(self):
+        """Write any buffered chunks to the vector store now"""
+        if self.ingest_buffer is not None:
+            self.ingest_buffer.flush()
+    
+    def close(self):
+        """Flush pending writes and stop the background flusher"""
+        if self.ingest_buffer is not None:
+            self.ingest_buffer.close()
+        if self.query_batcher is not None:
+            self.query_batcher.close()
+    
     def search(self, query: str, k: int = 5) -> List[Dict]:
         """Search for relevant documents"""
         try:
-            results = self.vectorstore.similarity_search_with_score(query, k=k)
+            results = self._search_flights.do(
+                flight_key("scored", query, k),
+                lambda: self._similarity_search_with_score(query, k)
+            )
             
             formatted_results = []
             for doc, score in results:
@@ -114,17 +383,47 @@ class RAGService:
             
             return formatted_results
         except Exception as e:
-            print(f"Error searching vector store: {e}")
+            logger.error(f"Error searching vector store: {e}")
             return []
     
+    def similarity_search(self, query: str, k: int = 5) -> List[Document]:
+        """Return the k most relevant chunks as LangChain documents"""
+        return self._search_flights.do(flight_key("docs", query, k), lambda: self._similarity_search(query, k))
+    
+    def embed_query(self, query: str) -> List[float]:
+        with span("embed_query"):
+            if self.query_batcher is not None:
+                return self.query_batcher.embed_query(query)
+            return self.embeddings.embed_query(query)
+    
+    def _similarity_search(self, query: str, k: int) -> List[Document]:
+        return [doc for doc, _ in self._similarity_search_with_score(query, k)]
+    
+    def _similarity_search_with_score(self, query: str, k: int):
+        embedding = self.embed_query(query)
+        with span("vector_search"):
+            results = self.vectorstore.similarity_search_by_vector_with_score(embedding, k=k)
+        self._attach_file_names(doc for doc, _ in results)
+        return results
+    
+    def _attach_file_names(self, docs):
+        """Attach the file name so callers can cite without another lookup"""
+        for doc in docs:
+            record = self.documents.get(doc.metadata.get('doc_id'))
+            if record is not None:
+                doc.metadata['file_name'] = record['file_name']
+    
     def get_context_for_question(self, question: str) -> str:
         """Get relevant context for a specific question"""
         try:
-            results = self.search(question, k=3)
+            if self.retrieval_policy is not None:
+                results = self.retrieval_policy.select(self.search(question, k=self.retrieval_policy.max_k))
+            else:
+                results = self.search(question, k=3)
             context = "\n\n".join([r['content'] for r in results])
             return context
         except Exception as e:
-            print(f"Error getting context: {e}")
+            logger.error(f"Error getting context: {e}")
             return ""
 
 
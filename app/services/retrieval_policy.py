@@ -0,0 +1,55 @@
+from typing import Dict, List
+import re
+
+from app.config import Config
+
+# Greetings, thanks and other messages that need no retrieval or large prompt
+_SMALL_TALK = re.compile(
+    r"^\W*(hi|hii+|hello|hey|hiya|yo|namaste|good (morning|afternoon|evening|night)"
+    r"|thanks?|thank you|thx|ty|ok(ay)?|cool|great|nice|bye|goodbye|see you|good bye"
+    r"|how are you|who are you|what can you do)"
+    r"(\s+(there|tutor|sir|ma'?am|so much|a lot|again|doing|today))*\W*$",
+    re.IGNORECASE,
+)
+
+
+class RetrievalPolicy:
+    """Choose how much retrieved context a question gets.
+
+    Scores are distances (lower is better, see BaseVectorStore). Results
+    worse than ``score_threshold`` are dropped, and of the rest only those
+    within ``score_margin`` of the best are kept, between ``min_k`` and
+    ``max_k`` of them. A clear winner therefore gets one chunk, a flat
+    distribution up to ``max_k``, and an unrelated question none.
+    """
+
+    def __init__(self, min_k: int = 1, max_k: int = 5, score_threshold: float = 1.4,
+                 score_margin: float = 0.3):
+        self.min_k = min_k
+        self.max_k = max_k
+        self.score_threshold = score_threshold
+        self.score_margin = score_margin
+
+    @classmethod
+    def from_config(cls) -> "RetrievalPolicy":
+        return cls(
+            min_k=Config.RETRIEVAL_MIN_K,
+            max_k=Config.RETRIEVAL_MAX_K,
+            score_threshold=Config.RETRIEVAL_SCORE_THRESHOLD,
+            score_margin=Config.RETRIEVAL_SCORE_MARGIN,
+        )
+
+    @staticmethod
+    def is_small_talk(question: str) -> bool:
+        return bool(_SMALL_TALK.match(question or ""))
+
+    def select(self, results: List[Dict]) -> List[Dict]:
+        """Keep the useful prefix of ``search`` results sorted best first"""
+        relevant = [r for r in results[:self.max_k] if r['score'] <= self.score_threshold]
+        if not relevant:
+            return []
+        cutoff = relevant[0]['score'] + self.score_margin
+        selected = [r for r in relevant if r['score'] <= cutoff]
+        if len(selected) < self.min_k:
+            selected = relevant[:self.min_k]
+        return selected
@@ -0,0 +1,177 @@
+"""Single-file snapshots of the vector store.
+
+A snapshot is a ZIP archive holding everything a fresh instance needs to
+serve retrieval without re-ingesting or re-embedding:
+
+- ``manifest.json``: format name, version, embedding model, dimension, counts
+- ``vectors.npy``: float32 unit vectors, one row per chunk, stored
+  uncompressed at a 64-byte aligned offset so it can be memory-mapped
+  straight out of the archive
+- ``chunks.jsonl``: id, text and metadata of each chunk, in vector order
+- ``documents.json``: the DocumentRegistry records
+
+The text parts are deflated; vectors barely compress and are mapped
+instead. Readers refuse snapshots of a newer format version.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+
+SNAPSHOT_FORMAT = "tutor-vector-snapshot"
+SNAPSHOT_VERSION = 1
+
+ALIGNMENT = 64
+_PADDING_EXTRA_ID = 0xD935  # private ZIP extra field that only pads the header
+_ZIP64_EXTRA_SIZE = 20  # added to the local header by force_zip64
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+
+Batch = Tuple[List[Optional[str]], List[str], List[Dict], np.ndarray]
+
+
+class SnapshotError(ValueError):
+    """Raised for a file that is not a usable snapshot"""
+
+
+def write_snapshot(path: str, batches: Iterable[Batch], documents: List[Dict],
+                   embedding_model: str) -> Dict:
+    """Write ``batches`` of (ids, texts, metadatas, vectors) to ``path``; returns the manifest"""
+    directory = tempfile.mkdtemp(prefix="snapshot_", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        # Stream rows to scratch files first; the vector header needs the final row count
+        count, dim = 0, 0
+        vectors_path = os.path.join(directory, "vectors.bin")
+        chunks_path = os.path.join(directory, "chunks.jsonl")
+        with open(vectors_path, "wb") as vectors_file, open(chunks_path, "w", encoding="utf-8") as chunks_file:
+            for ids, texts, metadatas, vectors in batches:
+                vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+                if not len(vectors):
+                    continue
+                if dim and vectors.shape[1] != dim:
+                    raise SnapshotError(f"Mixed vector dimensions {dim} and {vectors.shape[1]}")
+                dim = vectors.shape[1]
+                vectors_file.write(vectors.tobytes())
+                for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                    chunks_file.write(json.dumps({"id": chunk_id, "text": text, "metadata": metadata},
+                                                 ensure_ascii=False) + "\n")
+                count += len(vectors)
+
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "embedding_model": embedding_model,
+            "dim": dim,
+            "count": count,
+            "documents": len(documents),
+            "created_at": time.time(),
+        }
+        tmp_path = path + ".tmp"
+        with zipfile.ZipFile(tmp_path, "w") as archive:
+            _write_aligned_array(archive, "vectors.npy", vectors_path, (count, dim))
+            archive.write(chunks_path, "chunks.jsonl", compress_type=zipfile.ZIP_DEFLATED)
+            archive.writestr("documents.json", json.dumps(documents, ensure_ascii=False),
+                             compress_type=zipfile.ZIP_DEFLATED)
+            archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+        os.replace(tmp_path, path)
+        return manifest
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _write_aligned_array(archive: zipfile.ZipFile, name: str, raw_path: str, shape: Tuple[int, int]):
+    """Store a raw float32 file as an .npy entry whose data starts 64-byte aligned"""
+    header_start = archive.fp.tell()
+    fixed = header_start + _LOCAL_HEADER.size + len(name.encode("utf-8")) + _ZIP64_EXTRA_SIZE + 4
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    padding = -fixed % ALIGNMENT
+    info.extra = struct.pack("<HH", _PADDING_EXTRA_ID, padding) + b"\0" * padding
+    with archive.open(info, "w", force_zip64=True) as entry, open(raw_path, "rb") as raw:
+        # numpy pads the .npy header to a multiple of 64 bytes as well
+        np.lib.format.write_array_header_1_0(
+            entry, {"descr": "<f4", "fortran_order": False, "shape": shape}
+        )
+        shutil.copyfileobj(raw, entry, 1024 * 1024)
+
+
+class Snapshot:
+    """An open snapshot; vectors are memory-mapped from the archive"""
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            self._archive = zipfile.ZipFile(path)
+            self.manifest = json.loads(self._archive.read("manifest.json"))
+        except (zipfile.BadZipFile, KeyError, json.JSONDecodeError) as e:
+            raise SnapshotError(f"{path} is not a vector store snapshot: {e}")
+        if self.manifest.get("format") != SNAPSHOT_FORMAT:
+            raise SnapshotError(f"{path} is not a vector store snapshot")
+        if self.manifest.get("version", 0) > SNAPSHOT_VERSION:
+            raise SnapshotError(f"Snapshot version {self.manifest['version']} is newer than "
+                                f"the supported version {SNAPSHOT_VERSION}")
+        self.vectors = self._map_vectors()
+
+    def _map_vectors(self) -> np.ndarray:
+        info = self._archive.getinfo("vectors.npy")
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise SnapshotError("Snapshot vectors are compressed and cannot be mapped")
+        with open(self.path, "rb") as f:
+            f.seek(info.header_offset)
+            header = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER.size))
+            f.seek(header[-2] + header[-1], os.SEEK_CUR)  # file name and extra field
+            if np.lib.format.read_magic(f) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+        if fortran_order or dtype != np.float32 or len(shape) != 2:
+            raise SnapshotError("Snapshot vectors must be a float32 matrix")
+        if shape[0] != self.count:
+            raise SnapshotError(f"Snapshot holds {shape[0]} vectors for {self.count} chunks")
+        if not shape[0]:
+            return np.empty(shape, dtype=np.float32)
+        return np.memmap(self.path, dtype=np.float32, mode="r", offset=offset, shape=shape)
+
+    @property
+    def count(self) -> int:
+        return self.manifest["count"]
+
+    @property
+    def embedding_model(self) -> str:
+        return self.manifest.get("embedding_model")
+
+    def documents(self) -> List[Dict]:
+        return json.loads(self._archive.read("documents.json"))
+
+    def iter_batches(self, batch_size: int = 4096) -> Iterator[Batch]:
+        """(ids, texts, metadatas, vectors) in batches; vectors are views into the map"""
+        ids, texts, metadatas = [], [], []
+        start = 0
+        with self._archive.open("chunks.jsonl") as f:
+            for line in f:
+                record = json.loads(line)
+                ids.append(record.get("id"))
+                texts.append(record.get("text", ""))
+                metadatas.append(record.get("metadata") or {})
+                if len(ids) == batch_size:
+                    yield ids, texts, metadatas, self.vectors[start:start + len(ids)]
+                    start += len(ids)
+                    ids, texts, metadatas = [], [], []
+        if ids:
+            yield ids, texts, metadatas, self.vectors[start:start + len(ids)]
+
+    def close(self):
+        self.vectors = None
+        self._archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
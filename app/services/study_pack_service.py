@@ -0,0 +1,239 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import json
+import logging
+import os
+import threading
+import time
+
+from app.utils.metrics import registry, span
+from app.utils.shared_cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+STUDY_PACKS = registry.counter(
+    "tutor_study_packs_total", "Study pack builds by outcome", ["outcome"]
+)
+STUDY_PACK_READS = registry.counter(
+    "tutor_study_pack_reads_total", "Study pack lookups by result", ["result"]
+)
+
+
+class StudyPackService:
+    """Precomputed per-document study material.
+
+    After a document is ingested, each of its sections gets a summary,
+    revision notes and a bank of MCQs. The pack is written to
+    ``<store_directory>/<content_hash>.json``, so read endpoints return it
+    without calling the model, and re-uploading an unchanged file (same
+    content hash) does not regenerate it. Builds run on a single background
+    thread to keep LLM usage from ingestion bounded. Build status is kept in
+    a SharedCache, so with several API workers only one of them builds a
+    given pack.
+
+    A build that fails (model unavailable) stores nothing. A section whose
+    MCQs did not parse gets none rather than generic filler, and the pack is
+    saved as ``partial``. Either way the build is retried with backoff, up
+    to ``max_retries`` times, and a partial pack is replaced when it succeeds.
+    """
+
+    version = 1
+    claim_ttl = 3600  # seconds before an abandoned build may be retried
+    failure_ttl = 300  # seconds a failed build is reported before a retry
+    max_retries = 3
+
+    def __init__(self, mcp_service, store_directory: str = "data/study_packs",
+                 max_sections: int = 12, section_chars: int = 12000, mcqs_per_section: int = 5,
+                 cache: Optional[SharedCache] = None):
+        self.mcp_service = mcp_service
+        self.store_directory = store_directory
+        self.max_sections = max_sections
+        self.section_chars = section_chars
+        self.mcqs_per_section = mcqs_per_section
+
+        os.makedirs(store_directory, exist_ok=True)
+        self.cache = cache or SharedCache(os.path.join(store_directory, "status.sqlite3"))
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="study-pack")
+        self._retries: Dict[str, threading.Timer] = {}
+
+    # -- storage -------------------------------------------------------
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(self.store_directory, f"{content_hash}.json")
+
+    @staticmethod
+    def _status_key(content_hash: str) -> str:
+        return f"study_pack:{content_hash}"
+
+    def get(self, content_hash: str) -> Optional[Dict]:
+        """The stored pack, or None when it has not been built"""
+        if not _is_hash(content_hash):
+            return None
+        try:
+            with open(self._path(content_hash), "r", encoding="utf-8") as f:
+                pack = json.load(f)
+        except FileNotFoundError:
+            STUDY_PACK_READS.inc(result="miss")
+            return None
+        STUDY_PACK_READS.inc(result="hit")
+        return pack
+
+    def status(self, content_hash: str) -> str:
+        """ready, partial, pending, failed or missing"""
+        if _is_hash(content_hash) and os.path.exists(self._path(content_hash)):
+            pack = self.get(content_hash)
+            if pack is not None:
+                return "partial" if pack.get("partial") else "ready"
+        return self.cache.get(self._status_key(content_hash), "missing")
+
+    def _is_current(self, content_hash: str) -> bool:
+        pack = self.get(content_hash)
+        return pack is not None and pack.get("version") == self.version and not pack.get("partial")
+
+    def delete(self, content_hash: str):
+        timer = self._retries.pop(content_hash, None)
+        if timer is not None:
+            timer.cancel()
+        if _is_hash(content_hash) and os.path.exists(self._path(content_hash)):
+            os.remove(self._path(content_hash))
+        self.cache.delete(self._status_key(content_hash))
+
+    def _save(self, pack: Dict):
+        path = self._path(pack["content_hash"])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(pack, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    # -- building ------------------------------------------------------
+    def schedule(self, document_data: Dict, attempt: int = 0) -> str:
+        """Queue a build for an ingested document; returns its status"""
+        content_hash = document_data.get("content_hash")
+        if not _is_hash(content_hash):
+            return "missing"
+        if not self.mcp_service.gemini_service.use_gemini:
+            # Mock output is not worth storing
+            return "missing"
+        if self._is_current(content_hash):
+            return "ready"
+        # Claim the build; another worker may already hold it
+        if not self.cache.add(self._status_key(content_hash), "pending", ttl=self.claim_ttl):
+            return self.cache.get(self._status_key(content_hash), "pending")
+        self._executor.submit(self._build_and_store, document_data, attempt)
+        return "pending"
+
+    def _retry_later(self, document_data: Dict, attempt: int):
+        """Rebuild after the failure status expires, backing off on each attempt"""
+        if attempt >= self.max_retries:
+            logger.warning(f"Giving up on the study pack for {document_data.get('file_name')} "
+                           f"after {attempt + 1} attempts")
+            return
+        timer = threading.Timer(self.failure_ttl * 2 ** attempt, self.schedule, (document_data, attempt + 1))
+        timer.daemon = True
+        self._retries[document_data["content_hash"]] = timer
+        timer.start()
+
+    def _build_and_store(self, document_data: Dict, attempt: int = 0):
+        content_hash = document_data["content_hash"]
+        self._retries.pop(content_hash, None)
+        try:
+            with span("study_pack"):
+                pack = self.build(document_data)
+            self._save(pack)
+        except Exception as e:
+            logger.error(f"Study pack for {content_hash} failed: {e}")
+            STUDY_PACKS.inc(outcome="failed")
+            self.cache.set(self._status_key(content_hash), "failed", ttl=self.failure_ttl)
+            self._retry_later(document_data, attempt)
+            return
+        if pack["partial"]:
+            STUDY_PACKS.inc(outcome="partial")
+            # Keeps schedule() from rebuilding at once; the retry timer comes after it expires
+            self.cache.set(self._status_key(content_hash), "partial", ttl=self.failure_ttl)
+            self._retry_later(document_data, attempt)
+            return
+        STUDY_PACKS.inc(outcome="built")
+        self.cache.delete(self._status_key(content_hash))
+        logger.info(f"Study pack for {document_data.get('file_name')} ready ({len(pack['sections'])} sections)")
+
+    def build(self, document_data: Dict) -> Dict:
+        """Generate summary, revision notes and MCQs for every section"""
+        sections = []
+        partial = False
+        for section in self.split_sections(document_data):
+            text = section["text"][:self.section_chars]
+            topic = section["title"] or document_data.get("file_name", "this chapter")
+            mcqs = self.mcp_service.gemini_service.generate_mcq(topic, text, count=self.mcqs_per_section)
+            if any(mcq.get("fallback") for mcq in mcqs):
+                # Generic questions would outlive the outage in the pack and in quizzes built from it
+                mcqs, partial = [], True
+            sections.append({
+                "title": section["title"],
+                "page_start": section["page_start"],
+                "page_end": section["page_end"],
+                "summary": self.mcp_service.generate_summary(text),
+                "revision_notes": self.mcp_service.generate_revision_notes(topic, text),
+                "mcqs": mcqs,
+            })
+        return {
+            "version": self.version,
+            "content_hash": document_data["content_hash"],
+            "file_name": document_data.get("file_name"),
+            "created_at": time.time(),
+            "partial": partial,
+            "sections": sections,
+        }
+
+    def split_sections(self, document_data: Dict) -> List[Dict]:
+        """Group blocks into sections at the shallowest heading level present"""
+        blocks = document_data.get("blocks") or []
+        if not blocks:
+            content = document_data.get("content", "")
+            return [{"title": "", "text": content, "page_start": None, "page_end": None}] if content.strip() else []
+
+        levels = [b.get("heading_level", 0) for b in blocks if b.get("heading_level", 0) > 0]
+        split_level = min(levels) if levels else None
+
+        sections: List[Dict] = []
+        current = None
+        for block in blocks:
+            level = block.get("heading_level", 0)
+            if current is None or (split_level is not None and level == split_level):
+                current = {"title": block["text"].strip() if level else "", "parts": [],
+                           "page_start": block.get("page"), "page_end": block.get("page")}
+                sections.append(current)
+                if level:
+                    continue
+            current["parts"].append(block["text"])
+            current["page_end"] = block.get("page", current["page_end"])
+
+        sections = [s for s in sections if s["parts"]]
+        # Too many small sections: merge neighbours so the pack stays within budget
+        if len(sections) > self.max_sections:
+            per_group = -(-len(sections) // self.max_sections)
+            merged = []
+            for i in range(0, len(sections), per_group):
+                group = sections[i:i + per_group]
+                merged.append({
+                    "title": group[0]["title"],
+                    "parts": group[0]["parts"] + [
+                        part for s in group[1:] for part in ([s["title"]] if s["title"] else []) + s["parts"]
+                    ],
+                    "page_start": group[0]["page_start"],
+                    "page_end": group[-1]["page_end"],
+                })
+            sections = merged
+
+        return [
+            {"title": s["title"], "text": "\n\n".join(s["parts"]),
+             "page_start": s["page_start"], "page_end": s["page_end"]}
+            for s in sections
+        ]
+
+    def close(self):
+        for timer in list(self._retries.values()):
+            timer.cancel()
+        self._executor.shutdown(wait=False)
+
+
+def _is_hash(value) -> bool:
+    return isinstance(value, str) and len(value) == 64 and all(c in "0123456789abcdef" for c in value)
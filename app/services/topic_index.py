@@ -0,0 +1,239 @@
+"""Corpus-wide topics, precomputed from the chunk embeddings.
+
+An offline build (``python -m app.cli.topics build``) clusters every chunk
+vector with spherical k-means, names each cluster from its most distinctive
+words and then, with one LLM call per cluster, a short label. The result is
+a topic -> chunk id index in ``<persist_directory>/topics``:
+
+- ``index.json``: topics (label, keywords, size, representative chunk ids,
+  offset into the vectors) and the chunk ids in topic order
+- ``vectors.npy``: the chunk vectors in the same order, memory-mapped
+
+Listing topics reads only the JSON. Searching within a topic scores the
+query against that topic's slice of vectors, so it never touches the
+global vector index.
+"""
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from app.utils.text_processors import content_tokens
+
+KEYWORDS_PER_TOPIC = 6
+REPRESENTATIVES_PER_TOPIC = 4
+
+
+class TopicNotFoundError(KeyError):
+    """Raised for a topic id that is not in the current index"""
+
+
+def default_topic_count(chunks: int) -> int:
+    """Rule of thumb sqrt(n / 2), kept between 2 and 50 topics"""
+    return max(2, min(50, int(round(math.sqrt(chunks / 2)))))
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, block_rows: int = 4096) -> Tuple[np.ndarray, np.ndarray]:
+    """Nearest centroid of each row and its cosine similarity, in row blocks"""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    similarities = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), block_rows):
+        scores = vectors[start:start + block_rows] @ centroids.T
+        assignments[start:start + len(scores)] = scores.argmax(axis=1)
+        similarities[start:start + len(scores)] = scores.max(axis=1)
+    return assignments, similarities
+
+
+def _seed(vectors: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++: each new centroid is drawn in proportion to its distance from the chosen ones"""
+    centroids = [vectors[rng.integers(len(vectors))]]
+    distances = np.maximum(2.0 - 2.0 * (vectors @ centroids[0]).astype(np.float64), 0.0)
+    for _ in range(1, k):
+        total = distances.sum()
+        index = rng.choice(len(vectors), p=distances / total) if total > 0 else rng.integers(len(vectors))
+        centroids.append(vectors[index])
+        distances = np.minimum(distances, np.maximum(2.0 - 2.0 * (vectors @ vectors[index]), 0.0))
+    return np.array(centroids, dtype=np.float32)
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 25, seed: int = 0,
+           max_seed_rows: int = 20000) -> Tuple[np.ndarray, np.ndarray]:
+    """Spherical k-means over unit vectors; returns (unit centroids, assignments)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    k = min(k, len(vectors))
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > max_seed_rows:
+        sample = vectors[np.sort(rng.choice(len(vectors), max_seed_rows, replace=False))]
+    centroids = _seed(sample, k, rng)
+
+    assignments = None
+    for _ in range(iterations):
+        new_assignments, similarities = _assign(vectors, centroids)
+        if assignments is not None and np.array_equal(new_assignments, assignments):
+            break
+        assignments = new_assignments
+        sums = np.zeros_like(centroids)
+        for start in range(0, len(vectors), 4096):
+            block = assignments[start:start + 4096]
+            # One-hot matmul sums each cluster's rows without a Python loop per row
+            sums += np.eye(k, dtype=np.float32)[block].T @ vectors[start:start + 4096]
+        empty = np.flatnonzero(np.bincount(assignments, minlength=k) == 0)
+        if len(empty):
+            # Restart empty clusters on the rows worst served by their centroid
+            sums[empty] = vectors[np.argsort(similarities)[:len(empty)]]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = sums / norms
+    return centroids, _assign(vectors, centroids)[0]
+
+
+def _keywords(texts: List[str], assignments: np.ndarray, k: int) -> List[List[str]]:
+    """Most distinctive words per cluster: frequency in the cluster times inverse cluster frequency"""
+    counts = [Counter() for _ in range(k)]
+    for text, cluster in zip(texts, assignments):
+        counts[cluster].update(t for t in content_tokens(text) if len(t) > 2 and not t.isdigit())
+    spread = Counter()
+    for counter in counts:
+        spread.update(counter.keys())
+    keywords = []
+    for counter in counts:
+        scored = sorted(counter.items(), key=lambda item: (-item[1] * math.log(1 + k / spread[item[0]]), item[0]))
+        keywords.append([word for word, _ in scored[:KEYWORDS_PER_TOPIC]])
+    return keywords
+
+
+def _topic_id(representatives: List[str]) -> str:
+    """Id of a topic from its representative chunk ids.
+
+    A rebuild that finds the same cluster gives it the same id; any other
+    cluster gets a new one, so an id from an older build either still means
+    the same topic or is not found.
+    """
+    return hashlib.sha1("\n".join(sorted(representatives)).encode("utf-8")).hexdigest()[:12]
+
+
+def cluster_topics(ids: List[str], texts: List[str], metadatas: List[Dict], vectors: np.ndarray,
+                   n_topics: Optional[int] = None) -> Tuple[List[Dict], List[str], np.ndarray]:
+    """Cluster chunks into topics; returns (topics, ids in topic order, vectors in topic order)"""
+    n_topics = n_topics or default_topic_count(len(ids))
+    centroids, assignments = kmeans(vectors, n_topics)
+    k = len(centroids)
+    keywords = _keywords(texts, assignments, k)
+    sizes = np.bincount(assignments, minlength=k)
+
+    topics, order = [], []
+    # Largest topics first
+    for cluster in [int(c) for c in np.argsort(-sizes, kind="stable") if sizes[c]]:
+        rows = np.flatnonzero(assignments == cluster)
+        closeness = vectors[rows] @ centroids[cluster]
+        representatives = [ids[row] for row in rows[np.argsort(-closeness)[:REPRESENTATIVES_PER_TOPIC]]]
+        topics.append({
+            "topic_id": _topic_id(representatives),
+            "label": " / ".join(keywords[cluster][:3]) or f"Topic {len(topics) + 1}",
+            "keywords": keywords[cluster],
+            "size": len(rows),
+            "documents": len({metadatas[row].get("doc_id") for row in rows} - {None}),
+            "representatives": representatives,
+            "offset": len(order),
+        })
+        order.extend(int(row) for row in rows)
+    return topics, [ids[row] for row in order], np.asarray(vectors[order], dtype=np.float32)
+
+
+class TopicIndex:
+    """The topic index files of one store, reloaded when a build replaces them"""
+
+    public_fields = ("topic_id", "label", "keywords", "size", "documents")
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._index: Optional[Dict] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _current(self) -> Optional[Dict]:
+        """The index on disk, reloaded if another process rewrote it"""
+        try:
+            mtime = os.stat(self._path("index.json")).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self._path("index.json"), "r", encoding="utf-8") as f:
+                    index = json.load(f)
+                vectors = np.load(self._path("vectors.npy"), mmap_mode="r")
+                if len(vectors) != len(index["ids"]):
+                    return None  # caught between the two files of a build
+                self._index, self._vectors, self._mtime = index, vectors, mtime
+            return self._index
+
+    def _save_index(self, index: Dict):
+        tmp_path = self._path("index.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path("index.json"))
+
+    def save(self, topics: List[Dict], ids: List[str], vectors: np.ndarray, chunk_count: int):
+        os.makedirs(self.directory, exist_ok=True)
+        # Vectors first: readers only reload when index.json changes
+        tmp_path = self._path("vectors.tmp.npy")
+        np.save(tmp_path, vectors)
+        os.replace(tmp_path, self._path("vectors.npy"))
+        self._save_index({"built_at": time.time(), "chunk_count": chunk_count, "topics": topics, "ids": ids})
+
+    def set_labels(self, labels: Dict[str, str]) -> int:
+        """Replace topic labels; returns how many were updated"""
+        index = self._current()
+        if index is None:
+            return 0
+        index = dict(index, topics=[dict(t) for t in index["topics"]])
+        updated = 0
+        for topic in index["topics"]:
+            label = (labels.get(topic["topic_id"]) or "").strip()
+            if label:
+                topic["label"] = label
+                updated += 1
+        self._save_index(index)
+        return updated
+
+    def summary(self) -> Dict:
+        index = self._current()
+        if index is None:
+            return {"topics": [], "built_at": None, "chunk_count": 0}
+        return {
+            "topics": [{key: topic[key] for key in self.public_fields} for topic in index["topics"]],
+            "built_at": index["built_at"],
+            "chunk_count": index["chunk_count"],
+        }
+
+    @staticmethod
+    def _find(index: Optional[Dict], topic_id: str) -> Dict:
+        for topic in (index or {}).get("topics", []):
+            if topic["topic_id"] == str(topic_id):
+                return topic
+        raise TopicNotFoundError(topic_id)
+
+    def topic(self, topic_id: str) -> Dict:
+        return self._find(self._current(), topic_id)
+
+    def search(self, topic_id: str, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """(chunk id, cosine similarity) of the topic's k chunks closest to ``query``"""
+        self._current()
+        with self._lock:
+            index, vectors = self._index, self._vectors
+        topic = self._find(index, topic_id)
+        start, end = topic["offset"], topic["offset"] + topic["size"]
+        similarities = np.asarray(vectors[start:end]) @ query
+        best = np.argsort(-similarities)[:k]
+        return [(index["ids"][start + int(i)], float(similarities[i])) for i in best]
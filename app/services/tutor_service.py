@@ -3,12 +3,51 @@ from langchain.chains import ConversationalRetrievalChain
 from langchain.prompts import PromptTemplate
 from typing import Dict, List
 import json
+import os
+from app.config import Config
 from app.services.gemini_service import GeminiService
+from app.services.retrieval_policy import RetrievalPolicy
+from app.services.topic_index import TopicNotFoundError
+from app.utils.metrics import STAGE_LATENCY, registry, span
+from app.utils.singleflight import SingleFlight, flight_key
+
+_ask_flights = SingleFlight("ask")
+
+RETRIEVAL_K = registry.histogram(
+    "tutor_retrieval_k", "Context chunks used per question", buckets=(0, 1, 2, 3, 4, 5, 8, 10)
+)
+PROMPT_TOKENS = registry.histogram(
+    "tutor_prompt_tokens", "Estimated prompt tokens per question (chars / 4)",
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096)
+)
+ASK_SHORTCUTS = registry.counter(
+    "tutor_ask_shortcuts_total", "Questions answered without retrieval or without context", ["reason"]
+)
+TOKENS_SAVED = registry.counter(
+    "tutor_prompt_tokens_saved_total", "Estimated prompt tokens saved against fixed k=3 retrieval"
+)
+LATENCY_SAVED = registry.counter(
+    "tutor_latency_saved_seconds_total", "Estimated time saved by answering small talk directly"
+)
+
+NO_CONTEXT = "No relevant documents found in the knowledge base."
+SMALL_TALK_REPLY = ("Hi! I'm your study tutor. Ask me a question about your uploaded material "
+                    "or any exam topic and I'll explain it step by step.")
+BASELINE_K = 3  # retrieval depth before the adaptive policy, used to report savings
+
+
+def _mean(histogram, **labels) -> float:
+    snapshot = histogram.snapshot(**labels)
+    return snapshot[0] / snapshot[1] if snapshot and snapshot[1] else 0.0
+
 
 class TutorService:
-    def __init__(self, vectorstore, model_name: str = "gemini"):
-        self.vectorstore = vectorstore
+    def __init__(self, rag_service, model_name: str = "gemini", adaptive_retrieval: bool = None):
+        self.rag_service = rag_service
         self.gemini_service = GeminiService()
+        if adaptive_retrieval is None:
+            adaptive_retrieval = Config.ADAPTIVE_RETRIEVAL_ENABLED
+        self.retrieval_policy = RetrievalPolicy.from_config() if adaptive_retrieval else None
         self.memory = ConversationBufferMemory(
             memory_key="chat_history",
             return_messages=True
@@ -32,37 +71,99 @@ class TutorService:
             """
         )
     
-    def ask_question(self, question: str, user_id: str = None) -> Dict:
-        """Handle student questions with context retrieval"""
+    def ask_question(self, question: str, user_id: str = None, topic_id: str = None) -> Dict:
+        """Handle student questions with context retrieval, optionally within one topic"""
+        # Students asking the same question at once share one answer
+        return _ask_flights.do(flight_key(question, topic_id), lambda: self._answer(question, topic_id))
+    
+    def _answer(self, question: str, topic_id: str = None) -> Dict:
+        policy = self.retrieval_policy
+        if policy is not None and policy.is_small_talk(question):
+            return self._small_talk()
+        
         try:
             # Get relevant context
-            context_docs = self.vectorstore.similarity_search(question, k=3)
-            context = "\n\n".join([doc.page_content for doc in context_docs])
-        except:
-            context = "No relevant documents found in the knowledge base."
+            k = BASELINE_K if policy is None else policy.max_k
+            if topic_id is not None:
+                results = self.rag_service.search_topic(topic_id, question, k=k)
+            else:
+                results = self.rag_service.search(question, k=k)
+            selected = results if policy is None else policy.select(results)
+        except TopicNotFoundError:
+            raise
+        except Exception:
+            results = selected = []
+        
+        RETRIEVAL_K.observe(len(selected))
+        if policy is not None:
+            baseline = sum(len(r['content']) for r in results[:BASELINE_K])
+            used = sum(len(r['content']) for r in selected)
+            if baseline > used:
+                TOKENS_SAVED.inc((baseline - used) // 4)
+        if selected:
+            context = "\n\n".join(r['content'] for r in selected)
+        else:
+            # Nothing close enough: a short prompt instead of unrelated chunks
+            ASK_SHORTCUTS.inc(reason="no_context")
+            context = NO_CONTEXT
         
         # Generate response using Gemini
-        prompt = f"""
-        You are an educational tutor. Answer this question with examples and explanations:
+        with span("prompt_build"):
+            prompt = f"""
+            You are an educational tutor. Answer this question with examples and explanations:
 
-            Context: {context}
-            Question: {question}
+                Context: {context}
+                Question: {question}
 
-            Include:
-            - Clear explanation
-            - Relevant examples
-            - Key points to remember
-            - Practice suggestions
-            - And limit solution to 100 words only 
+                Include:
+                - Clear explanation
+                - Relevant examples
+                - Key points to remember
+                - Practice suggestions
+                - And limit solution to 100 words only 
 
-        """
+            """
         
-        answer = self.gemini_service.generate_response(prompt, context)
+        PROMPT_TOKENS.observe(len(prompt) // 4)
+        
+        # Student-facing and latency sensitive: allow a hedged second request.
+        # The context is already in the prompt, so it is not passed again.
+        answer = self.gemini_service.generate_response(prompt, hedge=True)
         
         return {
             'answer': answer,
-            'sources': [{'source': 'uploaded_documents', 'chunk_id': i} for i in range(len(context_docs))],
-            'context_used': context[:500] + "..." if len(context) > 500 else context
+            'sources': [self._citation(r['metadata']) for r in selected],
+            'context_used': context[:500] + "..." if len(context) > 500 else context,
+            'retrieval': {'k': len(selected), 'shortcut': None if selected else 'no_context'}
+        }
+    
+    def _small_talk(self) -> Dict:
+        """Answer greetings and thanks without retrieval or a model call"""
+        ASK_SHORTCUTS.inc(reason="small_talk")
+        LATENCY_SAVED.inc(sum(
+            _mean(STAGE_LATENCY, stage=stage)
+            for stage in ("embed_query", "vector_search", "rag_rpc", "prompt_build", "llm_call")
+        ))
+        TOKENS_SAVED.inc(int(_mean(PROMPT_TOKENS)))
+        return {
+            'answer': SMALL_TALK_REPLY,
+            'sources': [],
+            'context_used': "",
+            'retrieval': {'k': 0, 'shortcut': 'small_talk'}
+        }
+    
+    @staticmethod
+    def _citation(metadata: Dict) -> Dict:
+        """File, page and section of a retrieved chunk"""
+        # Chunks stored before the document registry only carry their file path
+        file_name = metadata.get('file_name') or os.path.basename(metadata.get('source') or "") or None
+        return {
+            'document_id': metadata.get('doc_id'),
+            'file_name': file_name,
+            'page_start': metadata.get('page_start'),
+            'page_end': metadata.get('page_end'),
+            'section': metadata.get('section'),
+            'chunk': metadata.get('chunk', metadata.get('chunk_id')),
         }
     
     def get_conversation_history(self) -> List[Dict]:
@@ -0,0 +1,160 @@
+"""Compact encodings of the unit vectors kept by the local vector stores.
+
+A codec turns float32 vectors into smaller codes and scores a query against
+codes without decoding them. Scores are approximate inner products, so the
+store rescores the best candidates with the exact float vectors when it
+still has them.
+
+- ``int8``: per-dimension scalar quantization, 4x smaller.
+- ``pca``: projection onto the top ``dim`` principal components, stored as
+  float16 (384 -> 128 dims is 6x smaller).
+
+A codec fitted on a small first batch does not describe the vectors that
+come later, so the store refits once the row count has grown
+``refit_growth``-fold since the last fit, until ``settled_rows`` rows.
+"""
+from typing import Optional
+import numpy as np
+
+SCORE_BLOCK_ROWS = 2048  # rows upcast at a time; small enough to stay in cache
+
+
+def _blocked_dot(codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """codes @ query in row blocks, so only one block is ever upcast"""
+    out = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+        block = codes[start:start + SCORE_BLOCK_ROWS]
+        out[start:start + len(block)] = block.astype(np.float32) @ query
+    return out
+
+
+class VectorCodec:
+    """Identity codec: plain float32"""
+
+    name = "float32"
+    refit_growth = 4
+    settled_rows = 20000
+    fit_rows = 0
+
+    def fit(self, vectors: np.ndarray):
+        pass
+
+    def can_fit(self, rows: int, dim: int) -> bool:
+        return True
+
+    def needs_refit(self, rows: int) -> bool:
+        """Whether a store that has grown to ``rows`` should be re-encoded with a new fit"""
+        if not self.fitted:
+            return True
+        return self.fit_rows < self.settled_rows and rows >= self.refit_growth * self.fit_rows
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float32)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.asarray(codes, dtype=np.float32)
+
+    def score(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return codes @ query
+
+    def state(self) -> dict:
+        return {}
+
+    def load_state(self, state: dict):
+        pass
+
+    @property
+    def fitted(self) -> bool:
+        return True
+
+
+class Int8Codec(VectorCodec):
+    name = "int8"
+
+    def __init__(self):
+        self.scale: Optional[np.ndarray] = None
+
+    def fit(self, vectors):
+        scale = np.abs(vectors).max(axis=0).astype(np.float32) / 127.0
+        scale[scale == 0] = 1.0
+        self.scale = scale
+        self.fit_rows = len(vectors)
+
+    def encode(self, vectors):
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def decode(self, codes):
+        return codes.astype(np.float32) * self.scale
+
+    def score(self, codes, query):
+        # (codes * scale) @ q == codes @ (scale * q)
+        return _blocked_dot(codes, query * self.scale)
+
+    def state(self):
+        return {"scale": self.scale, "fit_rows": np.int64(self.fit_rows)}
+
+    def load_state(self, state):
+        self.scale = state["scale"]
+        self.fit_rows = int(state.get("fit_rows", 0))  # 0 (older stores): refit on the next write
+
+    @property
+    def fitted(self):
+        return self.scale is not None
+
+
+class PCACodec(VectorCodec):
+    name = "pca"
+    max_fit_rows = 20000
+
+    def __init__(self, dim: int = 128):
+        self.dim = dim
+        self.mean: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None
+
+    def fit(self, vectors):
+        sample = vectors
+        if len(vectors) > self.max_fit_rows:
+            rows = np.random.default_rng(0).choice(len(vectors), self.max_fit_rows, replace=False)
+            sample = vectors[np.sort(rows)]
+        sample = np.asarray(sample, dtype=np.float32)
+        self.mean = sample.mean(axis=0)
+        _, _, vt = np.linalg.svd(sample - self.mean, full_matrices=False)
+        self.components = vt[:self.dim].astype(np.float32)
+        self.fit_rows = len(vectors)
+
+    def can_fit(self, rows, dim):
+        # Fewer rows than dimensions leaves fewer components than asked for, for good
+        return rows >= max(dim, self.dim)
+
+    def encode(self, vectors):
+        return ((vectors - self.mean) @ self.components.T).astype(np.float16)
+
+    def decode(self, codes):
+        return codes.astype(np.float32) @ self.components + self.mean
+
+    def score(self, codes, query):
+        # (mean + codes @ C) @ q == mean @ q + codes @ (C @ q)
+        return _blocked_dot(codes, self.components @ query) + float(self.mean @ query)
+
+    def state(self):
+        return {"mean": self.mean, "components": self.components, "fit_rows": np.int64(self.fit_rows)}
+
+    def load_state(self, state):
+        self.mean = state["mean"]
+        self.components = state["components"]
+        self.fit_rows = int(state.get("fit_rows", 0))
+
+    @property
+    def fitted(self):
+        return self.components is not None
+
+
+def create_codec(name: str, pca_dim: int = 128) -> VectorCodec:
+    name = (name or "float32").lower()
+    if name == "float32":
+        return VectorCodec()
+    if name == "int8":
+        return Int8Codec()
+    if name == "pca":
+        return PCACodec(pca_dim)
+    raise ValueError(f"Unsupported vector codec: {name}")
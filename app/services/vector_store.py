@@ -0,0 +1,533 @@
+from langchain.schema import Document
+from typing import List, Dict, Iterator, Tuple, Optional, Set
+import numpy as np
+import json
+import logging
+import os
+import threading
+
+from app.config import Config
+from app.services.vector_codecs import create_codec
+
+logger = logging.getLogger(__name__)
+
+
+class BaseVectorStore:
+    """Common interface for the vector store backends used by RAGService.
+
+    Scores returned by every backend are squared L2 distances between unit
+    vectors (lower is better), which is what Chroma reports by default.
+    """
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict]] = None,
+                  embeddings: Optional[List[List[float]]] = None,
+                  ids: Optional[List[Optional[str]]] = None) -> None:
+        """Add chunks; ``ids`` lets callers delete them later by the same ids"""
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]) -> None:
+        raise NotImplementedError
+
+    def get(self, ids: List[str]) -> List[Optional[Document]]:
+        """Chunks by id, in order; None for ids that are not stored"""
+        raise NotImplementedError
+
+    def similarity_search_with_score(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embeddings.embed_query(query), k=k)
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float],
+                                               k: int = 5) -> List[Tuple[Document, float]]:
+        """Search with a query vector that was already embedded by the caller"""
+        raise NotImplementedError
+
+    def similarity_search(self, query: str, k: int = 5) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
+
+    def persist(self):
+        """Flush pending writes to disk"""
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def iter_rows(self, batch_size: int = 4096) -> Iterator[Tuple[List, List[str], List[Dict], np.ndarray]]:
+        """Every live chunk as (ids, texts, metadatas, unit vectors) batches"""
+        raise NotImplementedError
+
+
+class ChromaVectorStore(BaseVectorStore):
+    """Chroma (SQLite + HNSW) backend, the original storage of RAGService"""
+
+    def __init__(self, persist_directory: str, embeddings):
+        super().__init__(embeddings)
+        from langchain_community.vectorstores import Chroma
+
+        self.persist_directory = persist_directory
+        self.store = Chroma(
+            persist_directory=persist_directory,
+            embedding_function=embeddings
+        )
+
+    def add_texts(self, texts, metadatas=None, embeddings=None, ids=None):
+        import uuid
+        ids = [i or str(uuid.uuid4()) for i in ids] if ids else [str(uuid.uuid4()) for _ in texts]
+        if embeddings is None:
+            self.store.add_texts(texts, metadatas, ids=ids)
+            return
+        self.store._collection.upsert(
+            ids=ids,
+            embeddings=[list(map(float, e)) for e in embeddings],
+            metadatas=metadatas,
+            documents=texts
+        )
+
+    def delete(self, ids):
+        if ids:
+            self.store.delete(ids=list(ids))
+
+    def get(self, ids):
+        found = self.store._collection.get(ids=list(ids), include=["documents", "metadatas"])
+        chunks = {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        return [chunks.get(chunk_id) for chunk_id in ids]
+
+    def similarity_search_with_score(self, query, k=5):
+        return self.store.similarity_search_with_score(query, k=k)
+
+    def similarity_search_by_vector_with_score(self, embedding, k=5):
+        return self.store.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+
+    def persist(self):
+        # Chroma >= 0.4 persists automatically and dropped persist()
+        if hasattr(self.store, "persist"):
+            self.store.persist()
+
+    def count(self):
+        return self.store._collection.count()
+
+    def iter_rows(self, batch_size=4096):
+        for offset in range(0, self.count(), batch_size):
+            batch = self.store._collection.get(
+                include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset
+            )
+            if not batch["ids"]:
+                break
+            yield (batch["ids"], batch["documents"], [m or {} for m in batch["metadatas"]],
+                   _LocalVectorStore._normalize(batch["embeddings"]))
+
+
+class _LocalVectorStore(BaseVectorStore):
+    """Base for in-process backends that keep chunks next to a vector file.
+
+    Chunks live in ``chunks.jsonl``; vectors are unit-normalised float32 and
+    the persisted part is loaded memory-mapped. Vectors added since the last
+    ``persist()`` are held in RAM and searched alongside the mapped part.
+    Deleted rows are tombstoned and skipped by search; once they exceed
+    ``compact_ratio`` of the store, ``persist()`` rewrites it without them.
+
+    The ingest buffer persists from its own thread while requests search, so
+    every read and write of the row lists and vector files holds ``_lock``.
+    """
+
+    chunks_file = "chunks.jsonl"
+    compact_ratio = 0.2
+
+    def __init__(self, persist_directory: str, embeddings):
+        super().__init__(embeddings)
+        self.persist_directory = persist_directory
+        os.makedirs(persist_directory, exist_ok=True)
+
+        self.texts: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._deleted: Set[int] = set()
+        self._chunks_dirty = False
+        self._persisted_count = 0
+        self._pending: List[np.ndarray] = []
+        self._lock = threading.RLock()
+        self._load_chunks()
+        self._load_vectors()
+
+    # -- chunk storage -------------------------------------------------
+    def _load_chunks(self):
+        path = os.path.join(self.persist_directory, self.chunks_file)
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                row = len(self.texts)
+                self.texts.append(record.get("text", ""))
+                self.metadatas.append(record.get("metadata") or {})
+                self.ids.append(record.get("id"))
+                if record.get("deleted"):
+                    self._deleted.add(row)
+                elif record.get("id"):
+                    self._rows[record["id"]] = row
+        self._persisted_count = len(self.texts)
+
+    def _write_chunks(self):
+        path = os.path.join(self.persist_directory, self.chunks_file)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for row, (text, metadata, chunk_id) in enumerate(zip(self.texts, self.metadatas, self.ids)):
+                if row in self._deleted:
+                    # Keeps row numbers aligned with the vector file until compaction
+                    f.write(json.dumps({"id": chunk_id, "deleted": True}) + "\n")
+                else:
+                    f.write(json.dumps({"id": chunk_id, "text": text, "metadata": metadata}) + "\n")
+        os.replace(tmp_path, path)
+        self._chunks_dirty = False
+
+    # -- vectors -------------------------------------------------------
+    def _load_vectors(self):
+        raise NotImplementedError
+
+    def _write_vectors(self, new_vectors: np.ndarray, replace: bool = False):
+        """Append ``new_vectors`` to the persisted vectors, or replace them all"""
+        raise NotImplementedError
+
+    def _stored_vectors(self) -> np.ndarray:
+        """All persisted vectors as one in-memory array"""
+        raise NotImplementedError
+
+    def _search_vectors(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        raise NotImplementedError
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _compact(self):
+        """Rewrite vectors and chunks without the deleted rows"""
+        with self._lock:
+            vectors = self._stored_vectors()
+            if self._pending:
+                vectors = np.vstack([vectors] + self._pending) if len(vectors) else np.vstack(self._pending)
+            keep = [row for row in range(len(self.texts)) if row not in self._deleted]
+
+            self.texts = [self.texts[row] for row in keep]
+            self.metadatas = [self.metadatas[row] for row in keep]
+            self.ids = [self.ids[row] for row in keep]
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids) if chunk_id}
+            self._deleted = set()
+            self._pending = []
+
+            self._write_vectors(vectors[keep], replace=True)
+            self._write_chunks()
+            self._persisted_count = len(self.texts)
+            self._load_vectors()
+
+    # -- public API ----------------------------------------------------
+    def add_texts(self, texts, metadatas=None, embeddings=None, ids=None):
+        if not texts:
+            return
+        if embeddings is None:
+            embeddings = self.embeddings.embed_documents(list(texts))
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [None] * len(texts)
+        vectors = self._normalize(embeddings)
+
+        with self._lock:
+            # Re-adding an id replaces the old chunk
+            self.delete([chunk_id for chunk_id in ids if chunk_id])
+            start = len(self.ids)
+            for offset, chunk_id in enumerate(ids):
+                if chunk_id:
+                    self._rows[chunk_id] = start + offset
+            self.ids.extend(ids)
+            self.texts.extend(texts)
+            self.metadatas.extend(metadatas)
+            # Vectors last: a search never sees a row it cannot resolve to a chunk
+            self._pending.append(vectors)
+
+    def delete(self, ids):
+        with self._lock:
+            for chunk_id in ids:
+                row = self._rows.pop(chunk_id, None)
+                if row is not None:
+                    self._deleted.add(row)
+                    self.texts[row] = ""
+                    self.metadatas[row] = {}
+                    self._chunks_dirty = True
+
+    def get(self, ids):
+        with self._lock:
+            rows = [self._rows.get(chunk_id) for chunk_id in ids]
+            return [
+                None if row is None else Document(page_content=self.texts[row], metadata=dict(self.metadatas[row]))
+                for row in rows
+            ]
+
+    def similarity_search_by_vector_with_score(self, embedding, k=5):
+        query_vector = self._normalize(embedding)[0]
+        with self._lock:
+            if len(self.texts) <= len(self._deleted):
+                return []
+            results = []
+            # Over-fetch by the tombstone count so k live rows remain after filtering
+            for index, similarity in self._search_vectors(query_vector, k + len(self._deleted)):
+                if index in self._deleted:
+                    continue
+                doc = Document(page_content=self.texts[index], metadata=dict(self.metadatas[index]))
+                results.append((doc, float(2.0 - 2.0 * similarity)))
+                if len(results) == k:
+                    break
+            return results
+
+    def persist(self):
+        with self._lock:
+            if self._deleted and len(self._deleted) > self.compact_ratio * len(self.texts):
+                self._compact()
+                return
+            if self._pending:
+                new_vectors = np.vstack(self._pending)
+                self._write_vectors(new_vectors)
+                self._pending = []
+                self._persisted_count = len(self.texts)
+                self._load_vectors()
+                self._write_chunks()
+            elif self._chunks_dirty:
+                self._write_chunks()
+
+    def count(self):
+        with self._lock:
+            return len(self.texts) - len(self._deleted)
+
+    def iter_rows(self, batch_size=4096):
+        with self._lock:
+            self.persist()
+            vectors = self._stored_vectors()
+            live = [row for row in range(len(self.texts)) if row not in self._deleted]
+            ids, texts, metadatas = list(self.ids), list(self.texts), list(self.metadatas)
+        for start in range(0, len(live), batch_size):
+            rows = live[start:start + batch_size]
+            yield ([ids[row] for row in rows], [texts[row] for row in rows],
+                   [metadatas[row] for row in rows], np.asarray(vectors[rows], dtype=np.float32))
+
+
+def _top_k(similarities: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest values, best first"""
+    k = min(k, similarities.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-similarities, k - 1)[:k]
+    return candidates[np.argsort(-similarities[candidates])]
+
+
+class NumpyVectorStore(_LocalVectorStore):
+    """Brute-force dot-product search over a memory-mapped float32 matrix.
+
+    With a compact ``codec`` (``int8`` or ``pca``, see vector_codecs) search
+    scans the codes, held in RAM, and rescores the best ``k *
+    rescore_factor`` rows with the exact float vectors, which stay
+    memory-mapped and are read only for those rows. With ``keep_float``
+    off the float file is not kept and scores come from the codes alone.
+    """
+
+    vectors_file = "vectors.npy"
+    codes_file = "codes.npy"
+    codec_file = "codec.npz"
+
+    def __init__(self, persist_directory: str, embeddings, codec: str = None,
+                 rescore_factor: int = None, keep_float: bool = None, pca_dim: int = None):
+        self.codec = create_codec(codec or Config.VECTOR_CODEC, pca_dim or Config.VECTOR_PCA_DIM)
+        self.rescore_factor = rescore_factor or Config.VECTOR_RESCORE_FACTOR
+        keep_float = Config.VECTOR_KEEP_FLOAT if keep_float is None else keep_float
+        self.keep_float = keep_float or self.codec.name == "float32"
+        self._codes: Optional[np.ndarray] = None
+        super().__init__(persist_directory, embeddings)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.persist_directory, name)
+
+    def _load_vectors(self):
+        path = self._path(self.vectors_file)
+        self._matrix = np.load(path, mmap_mode="r") if os.path.exists(path) else None
+        self._codes = None
+        if self.codec.name == "float32":
+            return
+
+        if os.path.exists(self._path(self.codec_file)) and os.path.exists(self._path(self.codes_file)):
+            with np.load(self._path(self.codec_file)) as saved:
+                stored_codec = str(saved["name"])
+                state = {key: saved[key] for key in saved.files if key != "name"}
+            if stored_codec != self.codec.name and self._matrix is None:
+                # Only codes on disk: keep serving them with the codec they were written with
+                logger.warning(f"Vector store holds {stored_codec} codes and no float vectors; "
+                               f"ignoring VECTOR_CODEC={self.codec.name}")
+                self.codec = create_codec(stored_codec)
+            if stored_codec == self.codec.name:
+                self.codec.load_state(state)
+                self._codes = np.load(self._path(self.codes_file))
+        
+        persisted = len(self._matrix) if self._matrix is not None else 0
+        if self._matrix is not None and (self._codes is None or len(self._codes) != persisted):
+            if not self.codec.can_fit(persisted, self._matrix.shape[1]):
+                self._codes = None  # too few rows to fit yet; search the float vectors
+                return
+            # Codec changed, or the store predates it: encode once from the float vectors
+            logger.info(f"Encoding {persisted} vectors with the {self.codec.name} codec")
+            self.codec.fit(np.asarray(self._matrix))
+            self._save_codes(self.codec.encode(np.asarray(self._matrix)))
+            self._codes = np.load(self._path(self.codes_file))
+
+    def _save_codes(self, codes: np.ndarray):
+        tmp_path = self._path(self.codes_file) + ".tmp.npy"
+        np.save(tmp_path, codes)
+        np.savez(self._path(self.codec_file) + ".tmp.npz", name=self.codec.name, **self.codec.state())
+        self._codes = None
+        os.replace(tmp_path, self._path(self.codes_file))
+        os.replace(self._path(self.codec_file) + ".tmp.npz", self._path(self.codec_file))
+
+    def _persisted_rows(self) -> int:
+        if self._matrix is not None:
+            return len(self._matrix)
+        return len(self._codes) if self._codes is not None else 0
+
+    def _stored_vectors(self):
+        if self._matrix is not None:
+            return np.asarray(self._matrix)
+        if self._codes is not None:
+            return self.codec.decode(self._codes)
+        return np.empty((0, 0), dtype=np.float32)
+
+    def _write_vectors(self, new_vectors, replace=False):
+        new_vectors = new_vectors.astype(np.float32, copy=False)
+        persisted = 0 if replace else self._persisted_rows()
+        rows = persisted + len(new_vectors)
+        compact = self.codec.name != "float32"
+        # Refit as the store outgrows the batch the codec was fitted on
+        refit = compact and (replace or self._codes is None or self.codec.needs_refit(rows))
+        encode = compact and (not refit or self.codec.can_fit(rows, new_vectors.shape[1]))
+        keep_float = self.keep_float or (compact and not encode)
+        vectors = new_vectors
+        if (keep_float or refit) and persisted:
+            vectors = np.vstack([self._stored_vectors(), new_vectors])
+
+        if encode:
+            if refit:
+                logger.info(f"Fitting the {self.codec.name} codec on {rows} vectors")
+                self.codec.fit(vectors)
+                codes = self.codec.encode(vectors)
+            else:
+                # Append to the existing codes; decoding and re-encoding would lose precision
+                codes = np.concatenate([self._codes, self.codec.encode(new_vectors)])
+            self._save_codes(codes)
+        elif compact:
+            # Not enough rows to fit the codec yet: float vectors only until there are
+            self._codes = None
+            for name in (self.codes_file, self.codec_file):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+
+        path = self._path(self.vectors_file)
+        # Drop the mapping before replacing the file underneath it
+        self._matrix = None
+        if keep_float:
+            tmp_path = path + ".tmp.npy"
+            np.save(tmp_path, vectors)
+            os.replace(tmp_path, path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def _search_vectors(self, query, k):
+        results: List[Tuple[int, float]] = []
+        if self._codes is not None and len(self._codes):
+            approximate = self.codec.score(self._codes, query)
+            candidates = _top_k(approximate, k * self.rescore_factor)
+            if self._matrix is not None:
+                rows = np.sort(candidates)  # sorted reads touch fewer mapped pages
+                exact = np.asarray(self._matrix[rows]) @ query
+                results = [(int(rows[i]), float(exact[i])) for i in _top_k(exact, k)]
+            else:
+                results = [(int(i), float(approximate[i])) for i in candidates[:k]]
+        elif self._matrix is not None and len(self._matrix):
+            similarities = self._matrix @ query
+            results = [(int(i), float(similarities[i])) for i in _top_k(similarities, k)]
+
+        if self._pending:
+            offset = self._persisted_rows()
+            similarities = np.concatenate([block @ query for block in self._pending])
+            results.extend((offset + int(i), float(similarities[i])) for i in _top_k(similarities, k))
+            results.sort(key=lambda item: -item[1])
+        return results[:k]
+
+
+class FaissVectorStore(_LocalVectorStore):
+    """Exact inner-product FAISS index, loaded with FAISS's mmap reader"""
+
+    index_file = "index.faiss"
+
+    def __init__(self, persist_directory: str, embeddings):
+        import faiss
+        self.faiss = faiss
+        super().__init__(persist_directory, embeddings)
+
+    def _load_vectors(self):
+        path = os.path.join(self.persist_directory, self.index_file)
+        if os.path.exists(path):
+            self._index = self.faiss.read_index(path, self.faiss.IO_FLAG_MMAP)
+        else:
+            self._index = None
+
+    def _stored_vectors(self):
+        if self._index is None or not self._index.ntotal:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._index.reconstruct_n(0, self._index.ntotal)
+
+    def _write_vectors(self, new_vectors, replace=False):
+        path = os.path.join(self.persist_directory, self.index_file)
+        index = self.faiss.IndexFlatIP(new_vectors.shape[1])
+        if not replace and self._index is not None and self._index.ntotal:
+            index.add(self._index.reconstruct_n(0, self._index.ntotal))
+        index.add(new_vectors)
+        tmp_path = path + ".tmp"
+        self.faiss.write_index(index, tmp_path)
+        self._index = None
+        os.replace(tmp_path, path)
+
+    def _search_vectors(self, query, k):
+        results = []
+        offset = 0
+        if self._index is not None and self._index.ntotal:
+            scores, ids = self._index.search(query.reshape(1, -1), min(k, self._index.ntotal))
+            results.extend((int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0)
+            offset = self._index.ntotal
+        if self._pending:
+            pending = np.vstack(self._pending)
+            similarities = pending @ query
+            results.extend((offset + int(i), float(similarities[i])) for i in _top_k(similarities, k))
+        results.sort(key=lambda item: -item[1])
+        return results[:k]
+
+
+VECTOR_BACKENDS = {
+    "chroma": ChromaVectorStore,
+    "numpy": NumpyVectorStore,
+    "faiss": FaissVectorStore,
+}
+
+
+def create_vector_store(backend: str, persist_directory: str, embeddings) -> BaseVectorStore:
+    """Build the vector store for the configured backend"""
+    backend = (backend or "chroma").lower()
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unsupported vector backend: {backend}")
+
+    if backend == "chroma":
+        # Keep Chroma at the top level so existing stores are picked up
+        return ChromaVectorStore(persist_directory, embeddings)
+    return VECTOR_BACKENDS[backend](os.path.join(persist_directory, backend), embeddings)
@@ -0,0 +1,264 @@
+"""Admission control: priority classes, bounded queues and per-tenant fairness.
+
+Every gated request needs one of ``max_concurrent`` slots before it runs.
+Routes are mapped to priority classes; when a slot frees up it goes to the
+highest-priority class with a waiter, so a burst of teacher summaries on
+whole chapters queues behind student questions instead of ahead of them.
+Within a class, tenants take turns, so one tenant's burst cannot fill the
+class. A tenant is the client address; the ``X-Tenant-ID`` header is only
+honoured on requests from a configured trusted proxy, since any client
+could otherwise pick a fresh tenant per request and skip the tenant cap.
+
+Nothing waits longer than its class allows:
+
+- full class queue or tenant queue: 429 with Retry-After, at once
+- estimated wait beyond the class deadline: 503 with Retry-After, at once
+- still queued at the deadline: 503 with Retry-After
+
+The controller is per process; with several API workers each enforces its
+own limits.
+"""
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional
+import asyncio
+import math
+import time
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+from app.utils.metrics import registry
+
+ADMISSION_QUEUE = registry.gauge(
+    "tutor_admission_queue_depth", "Requests waiting for a worker slot", ["priority"]
+)
+ADMISSION_ACTIVE = registry.gauge(
+    "tutor_admission_active", "Requests holding a worker slot", ["priority"]
+)
+ADMISSION_WAIT = registry.histogram(
+    "tutor_admission_wait_seconds", "Time admitted requests spent queued", ["priority"]
+)
+ADMISSION_REJECTED = registry.counter(
+    "tutor_admission_rejected_total", "Requests turned away before running", ["priority", "reason"]
+)
+
+
+class AdmissionRejected(Exception):
+    """The request was not admitted; carries the HTTP status and Retry-After seconds"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class PriorityClass:
+    """Rank 0 is served first; ``max_active`` caps the slots the class may hold at once"""
+
+    def __init__(self, name: str, rank: int, max_wait: float, max_queue: int, max_active: int):
+        self.name = name
+        self.rank = rank
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.max_active = max_active
+
+
+class _Waiter:
+    __slots__ = ("tenant", "future", "enqueued")
+
+    def __init__(self, tenant: str, future: asyncio.Future):
+        self.tenant = tenant
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+class AdmissionController:
+    """Slot scheduler for one event loop; all methods run on that loop"""
+
+    def __init__(self, max_concurrent: int, classes: List[PriorityClass], tenant_queue: int,
+                 service_time: float = 1.0):
+        self.max_concurrent = max_concurrent
+        self.tenant_queue = tenant_queue
+        self.classes = {c.name: c for c in sorted(classes, key=lambda c: c.rank)}
+        self._active = {name: 0 for name in self.classes}
+        self._queued = {name: 0 for name in self.classes}
+        # Per class: tenant -> waiters, in round-robin order
+        self._queues: Dict[str, "OrderedDict[str, deque]"] = {name: OrderedDict() for name in self.classes}
+        # Per class EWMA of slot hold time, for wait estimates: a summary holds
+        # its slot far longer than a question
+        self._service_time = {name: service_time for name in self.classes}
+        for name in self.classes:
+            ADMISSION_QUEUE.set(0, priority=name)
+            ADMISSION_ACTIVE.set(0, priority=name)
+
+    @classmethod
+    def from_config(cls, config) -> "AdmissionController":
+        slots = config.ADMISSION_MAX_CONCURRENT
+        queue = config.ADMISSION_QUEUE_SIZE
+        batch_slots = max(1, int(slots * config.ADMISSION_BATCH_SHARE))
+        return cls(slots, [
+            PriorityClass("interactive", 0, config.ADMISSION_INTERACTIVE_MAX_WAIT, queue, slots),
+            PriorityClass("standard", 1, config.ADMISSION_STANDARD_MAX_WAIT, queue, slots),
+            PriorityClass("batch", 2, config.ADMISSION_BATCH_MAX_WAIT, queue, batch_slots),
+        ], tenant_queue=config.ADMISSION_TENANT_QUEUE)
+
+    @property
+    def active(self) -> int:
+        return sum(self._active.values())
+
+    def _has_room(self, priority: PriorityClass) -> bool:
+        return self.active < self.max_concurrent and self._active[priority.name] < priority.max_active
+
+    def _estimated_wait(self, priority: PriorityClass) -> float:
+        """Seconds until a new request of this class would start"""
+        work = sum(self._queued[c.name] * self._service_time[c.name]
+                   for c in self.classes.values() if c.rank <= priority.rank)
+        capacity = min(self.max_concurrent, priority.max_active)
+        return (work + self._service_time[priority.name]) / capacity
+
+    def _reject(self, priority: PriorityClass, status_code: int, reason: str, detail: str, wait: float):
+        ADMISSION_REJECTED.inc(priority=priority.name, reason=reason)
+        raise AdmissionRejected(status_code, detail, max(1, math.ceil(wait)))
+
+    def _grant(self, priority: PriorityClass):
+        self._active[priority.name] += 1
+        ADMISSION_ACTIVE.set(self._active[priority.name], priority=priority.name)
+
+    def _dequeued(self, priority: PriorityClass):
+        self._queued[priority.name] -= 1
+        ADMISSION_QUEUE.set(self._queued[priority.name], priority=priority.name)
+
+    def _dispatch(self):
+        """Hand free slots to waiters: highest class first, tenants in turn"""
+        for priority in self.classes.values():
+            tenants = self._queues[priority.name]
+            while tenants and self._has_room(priority):
+                tenant, waiters = next(iter(tenants.items()))
+                waiter = waiters.popleft()
+                if waiters:
+                    tenants.move_to_end(tenant)
+                else:
+                    del tenants[tenant]
+                self._dequeued(priority)
+                if not waiter.future.done():
+                    self._grant(priority)
+                    waiter.future.set_result(True)
+            if self.active >= self.max_concurrent:
+                return
+
+    def _remove(self, priority: PriorityClass, waiter: _Waiter):
+        waiters = self._queues[priority.name].get(waiter.tenant)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del self._queues[priority.name][waiter.tenant]
+            self._dequeued(priority)
+
+    async def acquire(self, name: str, tenant: str) -> float:
+        """Wait for a slot; returns the start time to pass to ``release``.
+
+        Raises ``AdmissionRejected`` instead of queueing past the class deadline.
+        """
+        priority = self.classes[name]
+        waiting_ahead = any(self._queued[c.name] for c in self.classes.values() if c.rank <= priority.rank)
+        if not waiting_ahead and self._has_room(priority):
+            self._grant(priority)
+            ADMISSION_WAIT.observe(0.0, priority=name)
+            return time.monotonic()
+
+        estimate = self._estimated_wait(priority)
+        if self._queued[name] >= priority.max_queue:
+            self._reject(priority, 429, "queue_full", "Server busy, try again shortly", estimate)
+        tenants = self._queues[name]
+        if len(tenants.get(tenant, ())) >= self.tenant_queue:
+            self._reject(priority, 429, "tenant_queue_full", "Too many queued requests for this tenant", estimate)
+        if estimate > priority.max_wait:
+            self._reject(priority, 503, "deadline", "Server overloaded, try again later", estimate)
+
+        waiter = _Waiter(tenant, asyncio.get_running_loop().create_future())
+        tenants.setdefault(tenant, deque()).append(waiter)
+        self._queued[name] += 1
+        ADMISSION_QUEUE.set(self._queued[name], priority=name)
+        try:
+            await asyncio.wait({waiter.future}, timeout=priority.max_wait)
+        except BaseException:
+            # Client went away: give back a slot granted meanwhile, or leave the queue
+            if waiter.future.done():
+                self._free(priority)
+            else:
+                waiter.future.cancel()
+                self._remove(priority, waiter)
+            raise
+        if not waiter.future.done():
+            waiter.future.cancel()
+            self._remove(priority, waiter)
+            self._reject(priority, 503, "deadline", "Server overloaded, try again later",
+                         self._estimated_wait(priority))
+        ADMISSION_WAIT.observe(time.monotonic() - waiter.enqueued, priority=name)
+        return time.monotonic()
+
+    def _free(self, priority: PriorityClass):
+        self._active[priority.name] -= 1
+        ADMISSION_ACTIVE.set(self._active[priority.name], priority=priority.name)
+        self._dispatch()
+
+    def release(self, name: str, started: float):
+        self._service_time[name] = 0.8 * self._service_time[name] + 0.2 * (time.monotonic() - started)
+        self._free(self.classes[name])
+
+
+class AdmissionMiddleware:
+    """Gate the routes listed in ``priorities`` (route path -> class name).
+
+    Runs before the request body is read, so rejected uploads cost nothing,
+    and holds the slot until the response has been sent.
+    """
+
+    def __init__(self, app, controller: AdmissionController, router, priorities: Dict[str, str],
+                 tenant_header: str = "x-tenant-id", trusted_proxies: Iterable[str] = ()):
+        self.app = app
+        self.controller = controller
+        self.router = router
+        self.priorities = priorities
+        self.tenant_header = tenant_header
+        self.trusted_proxies = frozenset(trusted_proxies)
+
+    def _priority(self, scope) -> Optional[str]:
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                scope["route"] = route  # lets the request metrics label rejections too
+                return self.priorities.get(getattr(route, "path", None))
+        return None
+
+    def _tenant(self, scope) -> str:
+        client = scope.get("client")
+        address = client[0] if client else "anonymous"
+        if address in self.trusted_proxies:
+            tenant = Headers(scope=scope).get(self.tenant_header)
+            if tenant:
+                return tenant[:64]
+        return address
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        priority = self._priority(scope)
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            started = await self.controller.acquire(priority, self._tenant(scope))
+        except AdmissionRejected as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code,
+                                    headers={"Retry-After": str(e.retry_after)})
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(priority, started)
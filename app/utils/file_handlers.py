@@ -0,0 +1,331 @@
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import aiofiles
+import aiofiles.os
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+
+class UploadTooLargeError(ValueError):
+    """Raised as soon as an upload grows past the configured size limit"""
+
+
+class UploadNotFoundError(KeyError):
+    """Raised for an unknown, expired or already completed resumable upload id"""
+
+
+class UploadsFullError(Exception):
+    """Raised when open resumable uploads already reserve all the allowed space"""
+
+
+def file_sha256(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def content_addressed_path(upload_folder: str, content_hash: str, file_ext: str) -> str:
+    """Files are stored under their SHA-256 so same-name uploads never collide"""
+    return os.path.join(upload_folder, f"{content_hash}{file_ext}")
+
+
+async def _stream_to_file(chunks: AsyncIterator[bytes], path: str, max_size: int,
+                          hasher=None, already_received: int = 0) -> int:
+    """Write an async byte stream to ``path``; returns the number of bytes written"""
+    size = 0
+    try:
+        async with aiofiles.open(path, "wb") as out:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                size += len(chunk)
+                if already_received + size > max_size:
+                    raise UploadTooLargeError(f"File exceeds the {max_size} byte limit")
+                if hasher is not None:
+                    hasher.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        if os.path.exists(path):
+            await aiofiles.os.remove(path)
+        raise
+    return size
+
+
+class MultipartFileStream:
+    """One file field of a multipart/form-data body, read as the body arrives.
+
+    Form parsing (``UploadFile = File(...)``) spools the whole body before
+    the endpoint runs; this hands the file's bytes to the caller chunk by
+    chunk, so a size limit stops the upload without reading the rest.
+    Other fields are skipped.
+    """
+
+    def __init__(self, body: AsyncIterator[bytes], content_type: str, field: str = "file"):
+        content_type, params = parse_options_header(content_type or "")
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise ValueError("Expected a multipart/form-data body")
+        self.field = field.encode()
+        self.filename: Optional[str] = None
+        self._body = body.__aiter__()
+        self._events: "deque[Tuple[str, bytes]]" = deque()
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_file = False
+        self._done = False
+        self._parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    # -- parser callbacks ------------------------------------------------
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._in_file = (not self._done and options.get(b"name") == self.field
+                         and options.get(b"filename") is not None)
+        if self._in_file:
+            self._events.append(("start", options[b"filename"]))
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self._events.append(("data", bytes(data[start:end])))
+
+    def _on_part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self._done = True
+            self._events.append(("end", b""))
+
+    # -- reading -----------------------------------------------------------
+    async def _next_event(self) -> Tuple[str, bytes]:
+        while not self._events:
+            try:
+                chunk = await self._body.__anext__()
+            except StopAsyncIteration:
+                return "eof", b""
+            self._parser.write(chunk)
+        return self._events.popleft()
+
+    async def open(self) -> str:
+        """Read up to the start of the file field; returns its client file name"""
+        while True:
+            kind, value = await self._next_event()
+            if kind == "start":
+                self.filename = os.path.basename(value.decode("utf-8", "replace").replace("\\", "/"))
+                return self.filename
+            if kind == "eof":
+                raise ValueError(f"No {self.field.decode()} field in the form")
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        while True:
+            kind, value = await self._next_event()
+            if kind == "data":
+                if value:
+                    yield value
+            elif kind == "end":
+                return
+            elif kind == "eof":
+                raise ValueError("The upload ended before the file was complete")
+
+
+async def _finalize(tmp_path: str, upload_folder: str, content_hash: str, file_ext: str) -> str:
+    final_path = content_addressed_path(upload_folder, content_hash, file_ext)
+    if os.path.exists(final_path):
+        # Identical content was uploaded before; keep the existing copy
+        await aiofiles.os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, final_path)
+    return final_path
+
+
+async def save_upload_stream(chunks: AsyncIterator[bytes], upload_folder: str, file_ext: str,
+                             max_size: int) -> Tuple[str, str, int]:
+    """Stream an upload to disk, hashing on the fly.
+
+    Returns ``(file_path, sha256_hex, size)``. The write is aborted with
+    UploadTooLargeError the moment ``max_size`` is exceeded.
+    """
+    os.makedirs(upload_folder, exist_ok=True)
+    tmp_path = os.path.join(upload_folder, f".incoming-{uuid.uuid4().hex}.part")
+    hasher = hashlib.sha256()
+    size = await _stream_to_file(chunks, tmp_path, max_size, hasher=hasher)
+    content_hash = hasher.hexdigest()
+    return await _finalize(tmp_path, upload_folder, content_hash, file_ext), content_hash, size
+
+
+class ResumableUploadStore:
+    """Multi-part uploads that can be resumed after a dropped connection.
+
+    Each upload gets a directory under ``{upload_folder}/.resumable`` holding
+    a small state file and one file per received part. Parts can arrive in
+    any order and be re-sent; completing the upload concatenates them in
+    order into the content-addressed upload folder.
+
+    An upload that receives nothing for ``ttl`` seconds expires and its
+    directory is deleted, at startup or when the next upload is created.
+    The declared sizes of open uploads may add up to ``max_reserved`` bytes.
+    """
+
+    state_file = "state.json"
+
+    def __init__(self, upload_folder: str, max_size: int, part_size: int,
+                 ttl: float = 24 * 3600, max_reserved: Optional[int] = None):
+        self.upload_folder = upload_folder
+        self.root = os.path.join(upload_folder, ".resumable")
+        self.max_size = max_size
+        self.part_size = part_size
+        self.ttl = ttl
+        self.max_reserved = max_reserved
+        os.makedirs(self.root, exist_ok=True)
+        self.sweep()
+
+    def _expired(self, directory: str) -> bool:
+        # Adding or replacing a part touches the directory
+        return time.time() - os.path.getmtime(directory) > self.ttl
+
+    def sweep(self) -> int:
+        """Delete expired uploads; returns how many"""
+        removed = 0
+        for name in os.listdir(self.root):
+            directory = os.path.join(self.root, name)
+            try:
+                if os.path.isdir(directory) and self._expired(directory):
+                    shutil.rmtree(directory)
+                    removed += 1
+            except FileNotFoundError:
+                pass  # completed or swept meanwhile
+        return removed
+
+    def _reserved(self) -> int:
+        """Declared bytes of the uploads still open"""
+        reserved = 0
+        for name in os.listdir(self.root):
+            try:
+                reserved += self._read_state(os.path.join(self.root, name))['total_size']
+            except (OSError, ValueError, KeyError):
+                pass
+        return reserved
+
+    def _directory(self, upload_id: str) -> str:
+        # upload ids are uuid hex; anything else could escape the root
+        if not upload_id.isalnum():
+            raise UploadNotFoundError(upload_id)
+        directory = os.path.join(self.root, upload_id)
+        if not os.path.isdir(directory):
+            raise UploadNotFoundError(upload_id)
+        if self._expired(directory):
+            shutil.rmtree(directory, ignore_errors=True)
+            raise UploadNotFoundError(upload_id)
+        return directory
+
+    def _part_path(self, directory: str, part_number: int) -> str:
+        return os.path.join(directory, f"{part_number:06d}.part")
+
+    def _read_state(self, directory: str) -> Dict:
+        with open(os.path.join(directory, self.state_file), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _parts(self, directory: str) -> List[Tuple[int, int]]:
+        parts = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".part") and name[:-5].isdigit():
+                parts.append((int(name[:-5]), os.path.getsize(os.path.join(directory, name))))
+        return parts
+
+    def create(self, filename: str, file_ext: str, total_size: int) -> Dict:
+        if total_size > self.max_size:
+            raise UploadTooLargeError(f"File exceeds the {self.max_size} byte limit")
+        self.sweep()
+        if self.max_reserved is not None and self._reserved() + total_size > self.max_reserved:
+            raise UploadsFullError("Too many unfinished uploads; try again later")
+        upload_id = uuid.uuid4().hex
+        directory = os.path.join(self.root, upload_id)
+        os.makedirs(directory)
+        state = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'file_ext': file_ext,
+            'total_size': total_size,
+            'created': time.time(),
+        }
+        with open(os.path.join(directory, self.state_file), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        return {'upload_id': upload_id, 'part_size': self.part_size}
+
+    def status(self, upload_id: str) -> Dict:
+        directory = self._directory(upload_id)
+        state = self._read_state(directory)
+        parts = self._parts(directory)
+        state['received_parts'] = [number for number, _ in parts]
+        state['received_bytes'] = sum(size for _, size in parts)
+        return state
+
+    async def write_part(self, upload_id: str, part_number: int, chunks: AsyncIterator[bytes]) -> Dict:
+        directory = self._directory(upload_id)
+        state = self._read_state(directory)
+        # Bytes already held in other parts count against the limit
+        received = sum(size for number, size in self._parts(directory) if number != part_number)
+        limit = min(self.max_size, state['total_size'], received + self.part_size)
+
+        tmp_path = self._part_path(directory, part_number) + ".tmp"
+        size = await _stream_to_file(chunks, tmp_path, limit, already_received=received)
+        os.replace(tmp_path, self._part_path(directory, part_number))
+        return {'part_number': part_number, 'size': size, 'received_bytes': received + size}
+
+    async def complete(self, upload_id: str) -> Tuple[str, str, int, Dict]:
+        """Assemble the parts; returns ``(file_path, sha256_hex, size, state)``"""
+        directory = self._directory(upload_id)
+        state = self._read_state(directory)
+        parts = self._parts(directory)
+        numbers = [number for number, _ in parts]
+        if numbers != list(range(len(numbers))) or sum(size for _, size in parts) != state['total_size']:
+            raise ValueError(
+                f"Upload incomplete: have parts {numbers} totalling "
+                f"{sum(size for _, size in parts)} of {state['total_size']} bytes"
+            )
+
+        async def read_parts():
+            for number in numbers:
+                async with aiofiles.open(self._part_path(directory, number), "rb") as part:
+                    while True:
+                        chunk = await part.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        yield chunk
+
+        file_path, content_hash, size = await save_upload_stream(
+            read_parts(), self.upload_folder, state['file_ext'], self.max_size
+        )
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+        return file_path, content_hash, size, state
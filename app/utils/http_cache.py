@@ -0,0 +1,219 @@
+"""Response compression and conditional requests.
+
+``CompressionMiddleware`` compresses text responses with Brotli when the
+optional ``brotli`` package is installed and the client accepts it, and
+with gzip otherwise. Streamed responses are compressed chunk by chunk.
+
+``etag_response`` gives a rendered GET response a weak ETag derived from
+its body and answers ``If-None-Match`` with 304 Not Modified, so clients
+revalidating study material they already hold download nothing.
+``CachedStaticFiles`` adds a Cache-Control max-age to static assets, which
+Starlette already serves with ETags.
+"""
+from typing import Optional
+import hashlib
+import zlib
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.utils.metrics import registry
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSION_BYTES = registry.counter(
+    "tutor_http_compression_bytes_total", "Response bytes before (raw) and after (sent) compression",
+    ["encoding", "stage"]
+)
+CONDITIONAL_REQUESTS = registry.counter(
+    "tutor_http_conditional_total", "ETag-tagged responses by route and result", ["route", "result"]
+)
+NOT_MODIFIED_BYTES = registry.counter(
+    "tutor_http_not_modified_bytes_saved_total", "Body bytes not sent because the client copy was current"
+)
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml",
+                      "image/svg+xml")
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        # Sync flush so a streamed chunk reaches the client now, not at the end
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """``br`` or ``gzip`` if the client accepts it (q > 0), preferring Brotli"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name)
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware, so streaming responses stay streamed"""
+
+    def __init__(self, app, minimum_size: int = 500, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _compressor(self, encoding: str):
+        return _Brotli(self.brotli_quality) if encoding == "br" else _Gzip(self.gzip_level)
+
+    def _should_compress(self, start: dict, body: bytes, more_body: bool) -> bool:
+        headers = Headers(raw=start["headers"])
+        if start["status"] < 200 or start["status"] in (204, 304) or "content-encoding" in headers:
+            return False
+        if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            return False
+        return more_body or len(body) >= self.minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = accepted_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+        passthrough = False
+        raw_bytes = sent_bytes = 0
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough, raw_bytes, sent_bytes
+            if message["type"] == "http.response.start":
+                start = message  # held until the first body chunk shows what we are sending
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not self._should_compress(start, body, more_body):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = self._compressor(encoding)
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                del headers["Content-Length"]
+                if not more_body:
+                    data = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(data))
+                    COMPRESSION_BYTES.inc(len(body), encoding=encoding, stage="raw")
+                    COMPRESSION_BYTES.inc(len(data), encoding=encoding, stage="sent")
+                    await send(start)
+                    await send({"type": "http.response.body", "body": data})
+                    return
+                await send(start)
+
+            data = compressor.compress(body) + (compressor.flush() if more_body else compressor.finish())
+            raw_bytes += len(body)
+            sent_bytes += len(data)
+            if not more_body:
+                COMPRESSION_BYTES.inc(raw_bytes, encoding=encoding, stage="raw")
+                COMPRESSION_BYTES.inc(sent_bytes, encoding=encoding, stage="sent")
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip()) == opaque
+        for tag in if_none_match.split(",")
+    )
+
+
+def etag_response(request: Request, response: Response, cache_control: str = "no-cache") -> Response:
+    """Tag a rendered response with a body-hash ETag; 304 when the client's copy matches.
+
+    The ETag is weak because compression changes the bytes on the wire but
+    not the content.
+    """
+    if response.status_code != 200:
+        return response
+    etag = f'W/"{hashlib.sha256(response.body).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        if request.method not in ("GET", "HEAD"):
+            # A failed precondition on an unsafe method is 412, never 304
+            CONDITIONAL_REQUESTS.inc(route=route, result="precondition_failed")
+            return Response(status_code=412, headers=headers)
+        CONDITIONAL_REQUESTS.inc(route=route, result="not_modified")
+        NOT_MODIFIED_BYTES.inc(len(response.body))
+        return Response(status_code=304, headers=headers)
+    CONDITIONAL_REQUESTS.inc(route=route, result="full")
+    response.headers.update(headers)
+    return response
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with a Cache-Control max-age on every file"""
+
+    def __init__(self, *args, max_age: int = 86400, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = f"public, max-age={max_age}"
+
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = self.cache_control
+        return response
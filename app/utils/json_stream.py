@@ -0,0 +1,103 @@
+"""Tolerant parsing of JSON produced by an LLM.
+
+Model output is often almost-JSON: wrapped in markdown fences, cut off at the
+token limit, or carrying trailing commas. These helpers recover every
+complete object they can instead of discarding the whole response.
+"""
+from typing import Any, Dict, List, Optional
+import json
+import re
+
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+
+def strip_code_fences(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        newline = text.find("\n")
+        text = text[newline + 1:] if newline != -1 else text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
+def loads_lenient(text: str) -> Any:
+    """json.loads, retried once with trailing commas removed"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(_TRAILING_COMMA.sub(r"\1", text))
+
+
+class IncrementalObjectParser:
+    """Yield complete top-level JSON objects from a stream of text chunks.
+
+    Objects are recognised by balanced braces (outside strings) regardless of
+    what surrounds them, so an enclosing array, fences, prose or a truncated
+    tail do not prevent earlier objects from being returned.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.malformed = 0
+
+    def feed(self, text: str) -> List[Dict]:
+        objects = []
+        for char in text:
+            if self._depth:
+                self._buffer.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"' and self._depth:
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._buffer = [char]
+                self._depth += 1
+            elif char == "}" and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = "".join(self._buffer)
+                    self._buffer = []
+                    try:
+                        parsed = loads_lenient(candidate)
+                    except json.JSONDecodeError:
+                        self.malformed += 1
+                        continue
+                    if isinstance(parsed, dict):
+                        objects.append(parsed)
+        return objects
+
+    @property
+    def incomplete(self) -> bool:
+        """True when the stream ended inside an object"""
+        return self._depth > 0
+
+
+def salvage_objects(text: str) -> List[Dict]:
+    """All complete JSON objects found in ``text``"""
+    return IncrementalObjectParser().feed(text)
+
+
+def parse_json_object(text: str) -> Optional[Dict]:
+    """Parse a single JSON object from model output, or None"""
+    cleaned = strip_code_fences(text)
+    try:
+        parsed = loads_lenient(cleaned)
+        if isinstance(parsed, dict):
+            return parsed
+    except json.JSONDecodeError:
+        pass
+    objects = salvage_objects(cleaned)
+    return objects[0] if objects else None
@@ -0,0 +1,190 @@
+"""Retry, circuit breaker and request hedging helpers for remote calls."""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional, TypeVar
+import random
+import threading
+import time
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the provider while the circuit is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` failures in a row the circuit opens and calls
+    fail fast for ``reset_timeout`` seconds. Then one trial call is let
+    through (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until the next trial call is allowed"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def before_call(self):
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError("Circuit open: provider marked unavailable")
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                raise CircuitOpenError("Circuit half-open: trial call in flight")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_ignored(self):
+        """A call that says nothing about provider health (e.g. a 400): frees the trial slot only"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def call_with_retry(func: Callable[[], T], policy: RetryPolicy, is_retryable: Callable[[BaseException], bool],
+                    breaker: Optional[CircuitBreaker] = None,
+                    on_retry: Optional[Callable[[BaseException], None]] = None) -> T:
+    """Call ``func`` until it succeeds, a non-retryable error occurs or retries run out"""
+    attempt = 0
+    while True:
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            result = func()
+        except Exception as e:
+            retryable = is_retryable(e)
+            if breaker is not None:
+                if retryable:
+                    breaker.record_failure()
+                else:
+                    # A bad request says nothing about provider health: neither close nor open
+                    breaker.record_ignored()
+            if not retryable or attempt >= policy.max_retries:
+                raise
+            if on_retry is not None:
+                on_retry(e)
+            time.sleep(policy.delay(attempt))
+            attempt += 1
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+
+class HedgeBudget:
+    """Caps hedges at ``ratio`` of calls: each call earns ``ratio`` of a token, a hedge spends one.
+
+    Under overload every call is slow; without a budget every call would
+    hedge and double the load on a provider that is already struggling.
+    """
+
+    def __init__(self, ratio: float = 0.1, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def record_call(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+
+def hedged_call(func: Callable[[], T], hedge_delay: float, executor: ThreadPoolExecutor,
+                on_hedge: Optional[Callable[[], None]] = None,
+                on_hedge_won: Optional[Callable[[], None]] = None,
+                budget: Optional[HedgeBudget] = None) -> T:
+    """Run ``func``; if it has not finished ``hedge_delay`` seconds after it started,
+    start a second copy and return whichever finishes successfully first.
+
+    The delay counts from when the primary starts running, not from when it
+    was queued, so a busy pool does not turn every call into a hedge. If
+    the pool cannot start the primary within ``hedge_delay`` it is
+    saturated: the call is taken back and run unhedged in the caller's
+    thread, so a full pool never leaves the caller waiting without limit.
+    """
+    started = threading.Event()
+
+    def primary_call():
+        started.set()
+        return func()
+
+    if budget is not None:
+        budget.record_call()
+    primary = executor.submit(primary_call)
+    if not started.wait(hedge_delay) and primary.cancel():
+        return func()
+    done, _ = wait([primary], timeout=hedge_delay)
+    if done or (budget is not None and not budget.try_spend()):
+        return primary.result()
+
+    if on_hedge is not None:
+        on_hedge()
+    hedge = executor.submit(func)
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge and on_hedge_won is not None:
+                    on_hedge_won()
+                # The slower copy keeps running in the pool; its result is discarded
+                return future.result()
+            error = future.exception()
+    raise error
@@ -0,0 +1,89 @@
+"""Key/value cache in a SQLite file shared by every worker process.
+
+State that must agree across ``uvicorn --workers N`` processes (for example
+which worker is building a study pack) lives here instead of in a
+per-process dict. Values are JSON, entries can expire, and ``add`` is an
+atomic insert-if-absent that works as a cross-process claim. Expired rows
+are deleted when the cache is opened and every ``purge_every`` writes, so
+the file does not keep every study pack, generation and grade ever stored.
+"""
+from typing import Any, Optional
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SharedCache:
+    def __init__(self, path: str, purge_every: int = 1000):
+        self.path = path
+        self.purge_every = purge_every
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._writes = itertools.count(1)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        self.purge_expired()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _wrote(self):
+        if self.purge_every and next(self._writes) % self.purge_every == 0:
+            self.purge_expired()
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + ttl if ttl else None)
+        )
+        self._wrote()
+
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store ``value`` only if ``key`` is absent or expired; True if stored"""
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO cache (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE cache.expires_at IS NOT NULL AND cache.expires_at <= ?",
+            (key, json.dumps(value), now + ttl if ttl else None, now)
+        )
+        self._wrote()
+        return cursor.rowcount == 1
+
+    def replace(self, key: str, expected: Any, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store ``value`` only if ``key`` still holds ``expected``; True if stored"""
+        cursor = self._connection().execute(
+            "UPDATE cache SET value = ?, expires_at = ? WHERE key = ? AND value = ?",
+            (json.dumps(value), time.time() + ttl if ttl else None, key, json.dumps(expected))
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        """Delete expired rows; returns how many"""
+        cursor = self._connection().execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        )
+        return cursor.rowcount
@@ -0,0 +1,79 @@
+"""Coalesce identical concurrent calls into one in-flight computation.
+
+When many requests with the same inputs arrive together (a class opening the
+same quiz), only the first caller runs the work; the others wait for it and
+receive the same result or exception. Nothing is cached once the call
+finishes, so later requests still get a fresh answer.
+"""
+from typing import Callable, Dict, Hashable, TypeVar
+import hashlib
+import threading
+
+from app.config import Config
+from app.utils.metrics import registry
+from app.utils.text_processors import normalize_text
+
+T = TypeVar("T")
+
+FLIGHTS = registry.counter(
+    "tutor_singleflight_requests_total",
+    "Calls through a single-flight group, executed or coalesced onto an in-flight call",
+    ["group", "outcome"],
+)
+
+
+def flight_key(*parts) -> str:
+    """Stable key from normalized inputs"""
+    joined = "\x1f".join(normalize_text(p) if isinstance(p, str) else repr(p) for p in parts)
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Per-key deduplication of concurrent calls, safe across threads"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], T]) -> T:
+        if not Config.SINGLE_FLIGHT_ENABLED:
+            return func()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            FLIGHTS.inc(group=self.name, outcome="coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        FLIGHTS.inc(group=self.name, outcome="executed")
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
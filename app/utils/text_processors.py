@@ -0,0 +1,60 @@
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r"\s+")
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_APOSTROPHES = re.compile(r"['\u2019]")
+# What normalize_answer keeps: signs, decimal points, exponents, units and comparisons
+_NON_SYMBOL_PUNCTUATION = re.compile(r"[^\w\s.^<>=+\-*/%\u2264\u2265\u2260]")
+_SENTENCE_DOTS = re.compile(r"(?<!\d)\.|\.(?!\d)")
+_OPERATORS = re.compile(r"\s*([<>=^\u2264\u2265\u2260]+)\s*")
+STOPWORDS = frozenset(
+    "a an the of to in on at by for from with and or as is are was were be been it its this that "
+    "these those which what who whom how why when where there their they them he she his her we "
+    "our you your i my me so than then into over under also can will would should could may might "
+    "do does did has have had".split()
+)
+
+
+def normalize_text(text: str, strip_punctuation: bool = False) -> str:
+    """Case-fold and collapse whitespace so trivially different inputs compare equal.
+
+    With ``strip_punctuation`` (used for student answers) punctuation is
+    dropped too and Unicode compatibility forms are folded, so "H2O." and
+    "h2o" are the same answer.
+    """
+    text = (text or "").casefold()
+    if strip_punctuation:
+        text = _APOSTROPHES.sub("", unicodedata.normalize("NFKC", text))  # "isn't" -> "isnt"
+        text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def normalize_answer(text: str) -> str:
+    """Normalize an answer for comparison without changing what it says.
+
+    Like ``normalize_text(strip_punctuation=True)`` but signs, decimal
+    points, exponents and comparison operators are kept, so "X = -5." and
+    "x=-5" are equal while "-5" and "5", or "a>b" and "a<b", are not.
+    """
+    text = unicodedata.normalize("NFKC", (text or "").casefold()).replace("\u2212", "-")
+    text = _APOSTROPHES.sub("", text)
+    text = _NON_SYMBOL_PUNCTUATION.sub(" ", text)
+    text = _SENTENCE_DOTS.sub(" ", text)
+    text = _OPERATORS.sub(r" \1 ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+
+def content_tokens(text: str) -> set:
+    """Distinct normalized words of ``text`` without stopwords"""
+    return {t for t in normalize_text(text, strip_punctuation=True).split() if t not in STOPWORDS}
+
+
+def answer_tokens(text: str) -> list:
+    """Words and symbols of ``normalize_answer(text)`` in order, without stopwords.
+
+    Single letters are kept even when they are stopwords: in an answer "a"
+    and "i" are as likely to be variables as words.
+    """
+    return [t for t in normalize_answer(text).split() if t not in STOPWORDS or len(t) == 1]
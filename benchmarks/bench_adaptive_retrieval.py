@@ -0,0 +1,96 @@
+"""Latency and prompt size of /ask, fixed k=3 retrieval vs the adaptive policy.
+
+Questions are a mix of greetings, questions about the seeded corpus and
+questions the corpus cannot answer. Both modes run the same TutorService
+against the same store; point GEMINI_API_ENDPOINT at
+``benchmarks.fake_llm_server`` to exclude model variance. Prompt tokens are
+estimated as characters / 4.
+
+Usage: python -m benchmarks.bench_adaptive_retrieval [--questions 200] [--documents 20]
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.bench_ingest import make_document
+from benchmarks.load_test import QUESTIONS, percentile
+
+GREETINGS = ["hi", "Hello there!", "thanks", "thank you so much", "ok", "bye"]
+OFF_TOPIC = [
+    "What is the capital of Australia?",
+    "Recommend a good pizza place nearby",
+    "Who won the football world cup in 2018?",
+    "Translate 'good morning' into Japanese",
+]
+
+
+def run(tutor, questions):
+    prompts = []
+    generate = tutor.gemini_service.generate_response
+
+    def recording_generate(prompt, *args, **kwargs):
+        prompts.append(len(prompt) // 4)
+        return generate(prompt, *args, **kwargs)
+
+    tutor.gemini_service.generate_response = recording_generate
+    latencies, shortcuts = [], {}
+    try:
+        for question in questions:
+            start = time.perf_counter()
+            result = tutor._answer(question)
+            latencies.append(time.perf_counter() - start)
+            reason = result.get('retrieval', {}).get('shortcut')
+            shortcuts[reason] = shortcuts.get(reason, 0) + 1
+    finally:
+        tutor.gemini_service.generate_response = generate
+    latencies.sort()
+    return latencies, prompts, shortcuts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--greeting-share", type=float, default=0.15)
+    parser.add_argument("--off-topic-share", type=float, default=0.15)
+    args = parser.parse_args()
+
+    from app.services.rag_service import RAGService
+    from app.services.tutor_service import TutorService
+
+    rng = random.Random(0)
+    questions = []
+    for _ in range(args.questions):
+        roll = rng.random()
+        if roll < args.greeting_share:
+            questions.append(rng.choice(GREETINGS))
+        elif roll < args.greeting_share + args.off_topic_share:
+            questions.append(rng.choice(OFF_TOPIC))
+        else:
+            questions.append(rng.choice(QUESTIONS))
+
+    directory = tempfile.mkdtemp(prefix="bench_adaptive_")
+    try:
+        rag = RAGService(persist_directory=directory, use_ingest_buffer=False)
+        rag.add_documents([make_document(i, paragraphs=10) for i in range(args.documents)])
+
+        print(f"{'mode':<9} {'p50 ms':>8} {'p99 ms':>8} {'total s':>8} {'LLM calls':>9} "
+              f"{'tokens/call':>11} {'tokens':>8}  shortcuts")
+        for mode, adaptive in (("fixed", False), ("adaptive", True)):
+            tutor = TutorService(rag, adaptive_retrieval=adaptive)
+            tutor._answer("warm up")
+            latencies, prompts, shortcuts = run(tutor, questions)
+            mean_tokens = sum(prompts) / len(prompts) if prompts else 0
+            shortcut_text = ", ".join(f"{k}={v}" for k, v in sorted(shortcuts.items(), key=str) if k)
+            print(f"{mode:<9} {percentile(latencies, 0.50) * 1000:>8.1f} "
+                  f"{percentile(latencies, 0.99) * 1000:>8.1f} {sum(latencies):>8.2f} "
+                  f"{len(prompts):>9} {mean_tokens:>11.0f} {sum(prompts):>8}  {shortcut_text or '-'}")
+        rag.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
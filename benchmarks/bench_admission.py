@@ -0,0 +1,66 @@
+"""Student /ask latency while a teacher bursts /generate-summary.
+
+Sends ``--questions`` sequential /ask requests on their own, then again
+while ``--burst`` concurrent whole-chapter summaries run from one tenant.
+Run it against an instance with ADMISSION_ENABLED=true and again with
+false to see how much the summaries delay the questions, and how many
+summaries were turned away (429/503) instead of queueing. The tenant
+headers only count with ADMISSION_TRUSTED_PROXIES=127.0.0.1.
+
+Usage:
+    python -m benchmarks.bench_admission --url http://127.0.0.1:8000 [--burst 40] [--questions 20]
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import argparse
+import statistics
+import time
+
+import httpx
+
+CHAPTER = " ".join(
+    f"Section {i}: momentum is conserved when no external force acts on the system of carts." for i in range(400)
+)
+
+
+def ask_latencies(client: httpx.Client, questions: int) -> List[float]:
+    latencies = []
+    for i in range(questions):
+        start = time.perf_counter()
+        client.post("/ask", json={"question": f"What is momentum? ({i})"}, headers={"X-Tenant-ID": "student"})
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(url: str, i: int) -> int:
+    response = httpx.post(f"{url}/generate-summary", json={"content": f"{CHAPTER} [{i}]"},
+                          headers={"X-Tenant-ID": "teacher"}, timeout=300)
+    return response.status_code
+
+
+def report(name: str, latencies: List[float]):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{name:>12} | p50 {statistics.median(ordered) * 1000:8.1f} ms | p95 {p95 * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--burst", type=int, default=40)
+    parser.add_argument("--questions", type=int, default=20)
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.url, timeout=300) as client:
+        report("idle", ask_latencies(client, args.questions))
+        with ThreadPoolExecutor(args.burst) as pool:
+            summaries = [pool.submit(summarize, args.url, i) for i in range(args.burst)]
+            time.sleep(0.2)  # let the burst arrive first
+            report("under burst", ask_latencies(client, args.questions))
+            statuses = Counter(future.result() for future in summaries)
+    print("summaries: " + ", ".join(f"{count} x {status}" for status, count in sorted(statuses.items())))
+
+
+if __name__ == "__main__":
+    main()
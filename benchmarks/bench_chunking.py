@@ -0,0 +1,77 @@
+"""Compare structured chunking with the plain recursive splitter.
+
+Reports chunk count, average chunk size, retrieved context size and the
+retrieval hit rate: the share of questions whose expected answer text shows
+up in one of the top-k retrieved chunks.
+
+Usage:
+    python -m benchmarks.bench_chunking book.pdf notes.docx --questions qa.jsonl [--k 3]
+
+``qa.jsonl`` holds one ``{"question": ..., "answer": ...}`` object per line,
+where ``answer`` is a short span copied from the document.
+"""
+import argparse
+import json
+import re
+import shutil
+import tempfile
+
+from app.services.document_processor import DocumentProcessor
+from app.services.rag_service import RAGService
+
+
+def normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def evaluate(strategy: str, documents, questions, k: int) -> dict:
+    directory = tempfile.mkdtemp(prefix="bench_chunking_")
+    try:
+        rag = RAGService(persist_directory=directory, backend="numpy", use_ingest_buffer=False)
+        rag.chunking_strategy = strategy
+
+        chunk_sizes = []
+        for doc in documents:
+            chunk_sizes.extend(len(text) for text, _ in rag.split_document(doc))
+        rag.add_documents(documents)
+
+        hits = 0
+        context_chars = 0
+        for item in questions:
+            results = rag.search(item['question'], k=k)
+            context_chars += sum(len(r['content']) for r in results)
+            answer = normalize(item['answer'])
+            if any(answer in normalize(r['content']) for r in results):
+                hits += 1
+
+        return {
+            'chunks': len(chunk_sizes),
+            'avg_chunk_chars': sum(chunk_sizes) / max(len(chunk_sizes), 1),
+            'hit_rate': hits / max(len(questions), 1),
+            'avg_context_chars': context_chars / max(len(questions), 1),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--questions", required=True)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    processor = DocumentProcessor()
+    documents = [processor.process_document(path) for path in args.files]
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [json.loads(line) for line in f if line.strip()]
+
+    print(f"{'strategy':<11} {'chunks':>7} {'avg chars':>10} {'hit rate':>9} {'ctx chars':>10}")
+    for strategy in ("recursive", "structured"):
+        r = evaluate(strategy, documents, questions, args.k)
+        print(f"{strategy:<11} {r['chunks']:>7} {r['avg_chunk_chars']:>10.0f} "
+              f"{r['hit_rate']:>9.1%} {r['avg_context_chars']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
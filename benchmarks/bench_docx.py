@@ -0,0 +1,95 @@
+"""DOCX extraction speed, the previous paragraph loop vs the ordered block generator.
+
+Generates DOCX files with headings, body paragraphs, bullet lists and
+tables, then times both extractors. "legacy" is the previous
+implementation (python-docx paragraph objects, ``text +=`` in a loop,
+tables ignored); "blocks" is DocumentProcessor.iter_docx_blocks. Also
+reports how much text each one returns, since tables were skipped before.
+
+Usage: python -m benchmarks.bench_docx [--sections 50,200,800] [--rounds 3]
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from docx import Document
+
+from app.services.document_processor import DocumentProcessor
+
+WORDS = ("force energy momentum velocity acceleration mass charge field wave "
+         "frequency pressure volume temperature entropy equilibrium reaction").split()
+
+
+def make_docx(path: str, sections: int, seed: int = 0):
+    rng = random.Random(seed)
+    doc = Document()
+    doc.add_heading("Generated study notes", 0)
+    for s in range(sections):
+        doc.add_heading(f"Section {s}: {rng.choice(WORDS)}", 1)
+        for _ in range(8):
+            doc.add_paragraph(" ".join(rng.choice(WORDS) for _ in range(60)))
+        for _ in range(4):
+            doc.add_paragraph(" ".join(rng.choice(WORDS) for _ in range(8)), style="List Bullet")
+        table = doc.add_table(rows=10, cols=4)
+        for r, row in enumerate(table.rows):
+            for c, cell in enumerate(row.cells):
+                cell.text = f"{rng.choice(WORDS)} = {rng.randint(1, 999)}" if r else f"Column {c}"
+    doc.save(path)
+
+
+def legacy_extract(path: str):
+    """The extractor this benchmark replaced"""
+    doc = Document(path)
+    blocks = []
+    text = ""
+    for paragraph in doc.paragraphs:
+        text += paragraph.text + "\n"
+        stripped = paragraph.text.strip()
+        if stripped:
+            style = paragraph.style.name if paragraph.style is not None else ""
+            blocks.append({'text': stripped, 'page': None, 'heading_level': 1 if style.startswith("Heading") else 0})
+    return blocks, text
+
+
+def blocks_extract(processor: DocumentProcessor, path: str):
+    blocks = list(processor.iter_docx_blocks(path))
+    return blocks, "\n".join(block['text'] for block in blocks)
+
+
+def timed(func, rounds: int):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", default="50,200,800")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    processor = DocumentProcessor()
+    directory = tempfile.mkdtemp(prefix="bench_docx_")
+    try:
+        print(f"{'sections':>8} {'MB':>6} {'mode':<7} {'seconds':>8} {'blocks':>7} {'chars':>10} {'tables':>7}")
+        for sections in (int(s) for s in args.sections.split(",")):
+            path = os.path.join(directory, f"notes_{sections}.docx")
+            make_docx(path, sections)
+            size = os.path.getsize(path) / 1e6
+            for mode, func in (("legacy", lambda: legacy_extract(path)),
+                               ("blocks", lambda: blocks_extract(processor, path))):
+                seconds, (blocks, text) = timed(func, args.rounds)
+                tables = sum(1 for b in blocks if b.get('kind') == 'table')
+                print(f"{sections:>8} {size:>6.1f} {mode:<7} {seconds:>8.3f} {len(blocks):>7} {len(text):>10} {tables:>7}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Bandwidth and backend calls saved by compression, ETags and generation reuse.
+
+Fetches each route ``--repeats`` times from a running instance in three
+modes: uncompressed with no validators (the old behaviour), compressed,
+and compressed with If-None-Match revalidation as a browser or the
+frontend does. Generations are POSTed once in that mode and then
+revalidated on the GET resource their Content-Location names. Reports
+bytes on the wire per mode and reads the generation cache counters from
+/metrics to show how many LLM generations the repeats did not trigger.
+Generation reuse is opt-in: start the instance with GENERATION_CACHE_TTL
+set, e.g. 3600.
+
+Usage:
+    python -m benchmarks.bench_http_cache --url http://127.0.0.1:8000 [--repeats 20]
+"""
+from typing import Dict, List, Tuple
+import argparse
+import re
+import time
+
+import httpx
+
+SUMMARY_TEXT = " ".join(
+    f"Newton's second law relates force, mass and acceleration; example {i} applies it to a cart."
+    for i in range(60)
+)
+ROUTES: List[Tuple[str, str, Dict]] = [
+    ("GET", "/", {}),
+    ("GET", "/topics", {}),
+    ("POST", "/generate-mcq", {"topic": "Newton's laws of motion"}),
+    ("POST", "/generate-summary", {"content": SUMMARY_TEXT}),
+]
+MODES = ("identity", "compressed", "revalidated")
+
+
+def generation_counts(client: httpx.Client) -> Dict[str, float]:
+    text = client.get("/metrics", headers={"Accept-Encoding": "identity"}).text
+    counts = {}
+    for result, value in re.findall(r'tutor_generation_cache_total\{[^}]*result="(\w+)"[^}]*\} (\S+)', text):
+        counts[result] = counts.get(result, 0.0) + float(value)
+    return counts
+
+
+def fetch(client: httpx.Client, method: str, path: str, body: Dict, mode: str, etag: str = None,
+          location: str = None):
+    headers = {"Accept-Encoding": "identity" if mode == "identity" else "gzip, br"}
+    if mode == "revalidated" and etag:
+        headers["If-None-Match"] = etag
+    if method == "GET":
+        return client.get(path, headers=headers)
+    if mode == "revalidated" and location:
+        return client.get(location, headers=headers)
+    return client.post(path, json=body, headers=headers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.url, timeout=120) as client:
+        before = generation_counts(client)
+        print(f"{'route':<24} | {'mode':<11} | {'wire bytes':>10} | {'304s':>4} | {'ms/req':>7}")
+        for method, path, body in ROUTES:
+            for mode in MODES:
+                wire = not_modified = 0
+                etag = location = None
+                start = time.perf_counter()
+                for _ in range(args.repeats):
+                    response = fetch(client, method, path, body, mode, etag, location)
+                    wire += response.num_bytes_downloaded
+                    not_modified += response.status_code == 304
+                    etag = response.headers.get("etag", etag)
+                    location = response.headers.get("content-location", location)
+                elapsed = (time.perf_counter() - start) / args.repeats * 1000
+                print(f"{method + ' ' + path:<24} | {mode:<11} | {wire:>10} | {not_modified:>4} | {elapsed:7.1f}")
+        after = generation_counts(client)
+
+    hits = after.get("hit", 0) - before.get("hit", 0)
+    misses = after.get("miss", 0) - before.get("miss", 0)
+    print(f"generations: {misses:.0f} produced, {hits:.0f} reused instead of calling the model")
+
+
+if __name__ == "__main__":
+    main()
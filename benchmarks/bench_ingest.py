@@ -0,0 +1,61 @@
+"""Ingest throughput under concurrent uploads, with and without write batching.
+
+Usage: python -m benchmarks.bench_ingest [--uploads 10] [--rounds 5] [--backend chroma]
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import random
+import shutil
+import tempfile
+import time
+
+from app.services.rag_service import RAGService
+
+WORDS = ("force mass energy momentum velocity acceleration charge field wave "
+         "photon electron orbit reaction enzyme cell matrix vector integral").split()
+
+
+def make_document(index: int, paragraphs: int = 30) -> dict:
+    rng = random.Random(index)
+    content = "\n\n".join(
+        " ".join(rng.choice(WORDS) for _ in range(120)) for _ in range(paragraphs)
+    )
+    return {
+        'file_name': f"doc_{index}.txt",
+        'file_path': f"bench/doc_{index}.txt",
+        'file_type': '.txt',
+        'content': content,
+    }
+
+
+def run(backend: str, buffered: bool, uploads: int, rounds: int) -> float:
+    directory = tempfile.mkdtemp(prefix="bench_ingest_")
+    try:
+        rag = RAGService(persist_directory=directory, backend=backend, use_ingest_buffer=buffered)
+        documents = [make_document(i) for i in range(uploads * rounds)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=uploads) as pool:
+            list(pool.map(lambda doc: rag.add_documents([doc]), documents))
+        rag.close()
+        elapsed = time.perf_counter() - start
+        return len(documents) / elapsed
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uploads", type=int, default=10, help="concurrent uploads")
+    parser.add_argument("--rounds", type=int, default=5, help="uploads per client")
+    parser.add_argument("--backend", default="chroma")
+    args = parser.parse_args()
+
+    for buffered in (False, True):
+        rate = run(args.backend, buffered, args.uploads, args.rounds)
+        mode = "write-behind buffer" if buffered else "persist per upload"
+        print(f"{args.backend:>7} | {mode:<20} | {rate:8.2f} uploads/sec")
+
+
+if __name__ == "__main__":
+    main()
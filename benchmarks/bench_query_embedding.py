@@ -0,0 +1,67 @@
+"""Query embedding throughput and latency, one call per query vs micro-batched.
+
+Each client thread embeds queries back to back, as concurrent /ask requests
+do inside RAGService.search. Reports queries/sec and p50/p99 latency per
+concurrency level for direct calls and for EmbeddingBatcher at each wait.
+
+Usage: python -m benchmarks.bench_query_embedding [--concurrency 1,8,32] [--waits-ms 0,2,5]
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import random
+import time
+
+from langchain_community.embeddings import HuggingFaceEmbeddings
+
+from app.services.embedding_batcher import EmbeddingBatcher
+from benchmarks.load_test import QUESTIONS, percentile
+
+
+def run(embed, concurrency: int, per_client: int):
+    latencies = []
+
+    def client(seed: int):
+        rng = random.Random(seed)
+        for _ in range(per_client):
+            # Distinct text per call, so nothing is shared between requests
+            query = f"{rng.choice(QUESTIONS)} ({rng.random():.6f})"
+            start = time.perf_counter()
+            embed(query)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, percentile(latencies, 0.50), percentile(latencies, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--waits-ms", default="0,2,5", help="batcher max wait values to compare")
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=50, help="queries per client")
+    args = parser.parse_args()
+
+    embeddings = HuggingFaceEmbeddings(model_name=args.model, model_kwargs={'device': 'cpu'})
+    embeddings.embed_query("warm up")
+
+    print(f"{'mode':<16} {'conc':>5} {'q/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        rate, p50, p99 = run(embeddings.embed_query, concurrency, args.queries)
+        print(f"{'direct':<16} {concurrency:>5} {rate:>9.1f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f}")
+        for wait_ms in (float(w) for w in args.waits_ms.split(",")):
+            batcher = EmbeddingBatcher(embeddings, max_batch=args.max_batch, max_wait=wait_ms / 1000)
+            try:
+                rate, p50, p99 = run(batcher.embed_query, concurrency, args.queries)
+            finally:
+                batcher.close()
+            mode = f"batched {wait_ms:g}ms"
+            print(f"{mode:<16} {concurrency:>5} {rate:>9.1f} {p50 * 1000:>8.1f} {p99 * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
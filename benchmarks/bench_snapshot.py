@@ -0,0 +1,69 @@
+"""Cold start from a snapshot versus re-ingesting every document.
+
+Ingests ``--documents`` synthetic documents into a fresh store, exports a
+snapshot, then times three ways for a new instance to get the same store:
+re-ingesting (chunking and embedding everything again), importing the
+snapshot, and just opening it (memory-mapping the vectors).
+
+Usage: python -m benchmarks.bench_snapshot [--documents 200] [--backend numpy]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from app.config import Config
+from app.services.rag_service import RAGService
+from app.services.snapshot import Snapshot
+from benchmarks.bench_ingest import make_document
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--backend", default="numpy")
+    args = parser.parse_args()
+
+    Config.VECTOR_SNAPSHOT_PATH = ""  # load explicitly below
+    directory = tempfile.mkdtemp(prefix="bench_snapshot_")
+    try:
+        documents = [make_document(i) for i in range(args.documents)]
+
+        start = time.perf_counter()
+        source = RAGService(persist_directory=os.path.join(directory, "source"), backend=args.backend,
+                            use_ingest_buffer=False)
+        source.add_documents(documents)
+        ingest_seconds = time.perf_counter() - start
+
+        path = os.path.join(directory, "snapshot.zip")
+        start = time.perf_counter()
+        manifest = source.export_snapshot(path)
+        export_seconds = time.perf_counter() - start
+        source.close()
+
+        start = time.perf_counter()
+        target = RAGService(persist_directory=os.path.join(directory, "target"), backend=args.backend,
+                            use_ingest_buffer=False)
+        result = target.import_snapshot(path)
+        import_seconds = time.perf_counter() - start
+        target.close()
+        assert result["chunks"] == manifest["count"]
+
+        start = time.perf_counter()
+        with Snapshot(path) as snapshot:
+            snapshot.vectors[-1].sum()
+        open_seconds = time.perf_counter() - start
+
+        size = os.path.getsize(path)
+        print(f"{args.documents} documents, {manifest['count']} chunks, snapshot {size / 1e6:.1f} MB")
+        print(f"{'re-ingest':>18} | {ingest_seconds:8.3f} s")
+        print(f"{'export snapshot':>18} | {export_seconds:8.3f} s")
+        print(f"{'import snapshot':>18} | {import_seconds:8.3f} s  ({ingest_seconds / import_seconds:.1f}x faster)")
+        print(f"{'open snapshot':>18} | {open_seconds:8.3f} s")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Recall, memory and disk of the numpy store's vector codecs on your own corpus.
+
+Reads the float vectors of an existing numpy store (``--store``, default
+data/embeddings/numpy) or generates clustered synthetic vectors
+(``--synthetic N``). Held-out rows are used as queries; every codec and
+rescore factor is compared with exact float32 search by recall@k. "RAM" is
+what a search scans (the codes, or the float matrix for float32); "disk"
+is every vector file the store keeps.
+
+Usage:
+    python -m benchmarks.bench_vector_codecs [--store DIR | --synthetic 100000] [--k 5]
+        [--codecs float32,int8,pca] [--rescore 1,4,10] [--no-float]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.vector_store import NumpyVectorStore, _top_k
+
+
+def synthetic_vectors(count: int, dim: int = 384, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """Clustered vectors with a decaying spectrum, roughly like sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    basis = np.linalg.qr(rng.normal(size=(dim, dim)))[0].astype(np.float32)
+    spectrum = (np.arange(1, dim + 1) ** -0.8).astype(np.float32)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    latent = centers[rng.integers(0, clusters, count)] + 0.6 * rng.normal(size=(count, dim)).astype(np.float32)
+    vectors = (latent * spectrum) @ basis
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def directory_bytes(path: str, names) -> int:
+    return sum(os.path.getsize(os.path.join(path, n)) for n in names if os.path.exists(os.path.join(path, n)))
+
+
+def evaluate(base: np.ndarray, queries: np.ndarray, truth, codec: str, rescore: int, keep_float: bool,
+             pca_dim: int, k: int):
+    directory = tempfile.mkdtemp(prefix="bench_codecs_")
+    try:
+        store = NumpyVectorStore(directory, embeddings=None, codec=codec, rescore_factor=rescore,
+                                 keep_float=keep_float, pca_dim=pca_dim)
+        store.add_texts([""] * len(base), embeddings=base)
+        store.persist()
+        ram = store._codes.nbytes if store._codes is not None else store._matrix.nbytes
+        disk = directory_bytes(directory, (store.vectors_file, store.codes_file, store.codec_file))
+
+        hits = 0
+        start = time.perf_counter()
+        for query, expected in zip(queries, truth):
+            found = {index for index, _ in store._search_vectors(query, k)}
+            hits += len(found & expected)
+        latency = (time.perf_counter() - start) / len(queries)
+        return hits / (len(queries) * k), ram, disk, latency
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default="data/embeddings/numpy")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead of --store")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--codecs", default="float32,int8,pca")
+    parser.add_argument("--rescore", default="1,4,10", help="rescore factors to compare")
+    parser.add_argument("--pca-dim", type=int, default=128)
+    parser.add_argument("--no-float", action="store_true", help="also drop the float file (codes only)")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic)
+    else:
+        vectors = np.load(os.path.join(args.store, NumpyVectorStore.vectors_file))
+    rng = np.random.default_rng(1)
+    held_out = rng.choice(len(vectors), min(args.queries, len(vectors) // 10), replace=False)
+    mask = np.ones(len(vectors), dtype=bool)
+    mask[held_out] = False
+    base, queries = np.ascontiguousarray(vectors[mask]), vectors[held_out]
+    truth = [set(_top_k(base @ q, args.k).tolist()) for q in queries]
+    print(f"{len(base)} vectors x {base.shape[1]} dims, {len(queries)} queries, recall@{args.k}")
+
+    print(f"{'codec':<8} {'rescore':>7} {'float':>5} {'recall':>7} {'RAM MB':>7} {'disk MB':>8} {'ms/query':>9}")
+    for codec in args.codecs.split(","):
+        factors = [1] if codec == "float32" else [int(f) for f in args.rescore.split(",")]
+        for keep_float in ([True, False] if args.no_float and codec != "float32" else [True]):
+            for rescore in (factors if keep_float else [1]):
+                recall, ram, disk, latency = evaluate(
+                    base, queries, truth, codec, rescore, keep_float, args.pca_dim, args.k
+                )
+                print(f"{codec:<8} {rescore:>7} {'yes' if keep_float else 'no':>5} {recall:>7.3f} "
+                      f"{ram / 1e6:>7.1f} {disk / 1e6:>8.1f} {latency * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
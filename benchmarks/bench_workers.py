@@ -0,0 +1,144 @@
+"""Memory per worker and search throughput, in-process RAG vs the shared RAG process.
+
+"embedded" starts N worker processes that each build their own RAGService
+(one model copy per worker, as ``uvicorn --workers N`` does today).
+"shared" starts one ``RAGServer`` process and N workers using
+RemoteRAGService. Every worker runs searches from several threads at once;
+RSS is read from /proc after the worker has served its first query.
+
+Usage: python -m benchmarks.bench_workers [--workers 1,2,4] [--queries 200] [--threads 4]
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import multiprocessing as mp
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks.bench_ingest import make_document
+from benchmarks.load_test import QUESTIONS
+
+
+def rss_mb(pid: str = "self") -> float:
+    """Resident set size of a process in MB (Linux)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def make_service(mode: str, directory: str, address: str):
+    if mode == "shared":
+        from app.services.rag_remote import RemoteRAGService
+        return RemoteRAGService(address)
+    from app.services.rag_service import RAGService
+    return RAGService(persist_directory=directory, use_ingest_buffer=False)
+
+
+def seed(directory: str, documents: int):
+    from app.services.rag_service import RAGService
+    rag = RAGService(persist_directory=directory, use_ingest_buffer=False)
+    rag.add_documents([make_document(i, paragraphs=10) for i in range(documents)])
+    rag.close()
+
+
+def serve(directory: str, address: str):
+    from app.services.rag_remote import RAGServer
+    from app.services.rag_service import RAGService
+    RAGServer(RAGService(persist_directory=directory, use_ingest_buffer=False), address).serve_forever()
+
+
+def wait_for_server(address: str, timeout: float = 120.0):
+    from multiprocessing.connection import Client
+    from app.services.rag_remote import read_authkey
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            Client(address, family="AF_UNIX", authkey=read_authkey(address)).close()
+            return
+        except (OSError, RuntimeError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def worker(mode: str, directory: str, address: str, queries: int, threads: int, barrier, results):
+    rag = make_service(mode, directory, address)
+    rag.similarity_search("warm up", k=3)
+    memory = rss_mb()
+    barrier.wait()
+
+    rng = random.Random(os.getpid())
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda _: rag.similarity_search(rng.choice(QUESTIONS), k=3), range(queries)))
+    results.put((memory, queries, time.perf_counter() - start))
+
+
+def run(mode: str, workers: int, directory: str, address: str, queries: int, threads: int):
+    ctx = mp.get_context("spawn")
+    server = None
+    if mode == "shared":
+        if os.path.exists(address):
+            os.unlink(address)
+        server = ctx.Process(target=serve, args=(directory, address), daemon=True)
+        server.start()
+        wait_for_server(address)
+
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=worker, args=(mode, directory, address, queries, threads, barrier, results))
+        for _ in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    rows = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+
+    server_memory = rss_mb(str(server.pid)) if server else 0.0
+    if server:
+        server.terminate()
+        server.join()
+
+    worker_memory = sum(r[0] for r in rows) / len(rows)
+    total_queries = sum(r[1] for r in rows)
+    elapsed = max(r[2] for r in rows)
+    return worker_memory, server_memory, total_queries / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--modes", default="embedded,shared")
+    parser.add_argument("--queries", type=int, default=200, help="searches per worker")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent searches per worker")
+    parser.add_argument("--documents", type=int, default=20)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_workers_")
+    address = os.path.join(directory, "rag.sock")
+    try:
+        seed(directory, args.documents)
+        print(f"{'mode':<9} {'workers':>7} {'MB/worker':>10} {'server MB':>10} {'total MB':>9} {'q/s':>9}")
+        for mode in args.modes.split(","):
+            for workers in (int(w) for w in args.workers.split(",")):
+                worker_memory, server_memory, rate = run(
+                    mode, workers, directory, address, args.queries, args.threads
+                )
+                total = worker_memory * workers + server_memory
+                print(f"{mode:<9} {workers:>7} {worker_memory:>10.0f} {server_memory:>10.0f} "
+                      f"{total:>9.0f} {rate:>9.1f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
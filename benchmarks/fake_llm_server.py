@@ -0,0 +1,187 @@
+"""Local stand-in for the Gemini REST API, for offline load tests.
+
+Implements ``models/{model}:generateContent`` and
+``models/{model}:streamGenerateContent`` with a configurable latency
+distribution and error injection. Responses are shaped after the prompt:
+MCQ prompts get a JSON list of questions, grading prompts a grade object,
+everything else a paragraph of text.
+
+Usage:
+    python -m benchmarks.fake_llm_server --port 8089 --median-ms 600 --p99-ms 3000 --error-rate 0.02
+
+Then start the app against it:
+    GEMINI_API_KEY=fake GEMINI_API_ENDPOINT=http://127.0.0.1:8089 uvicorn app.main:app
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+
+WORDS = ("the force acts on a body and changes its momentum while energy is conserved "
+         "across the closed system so students should compare each case carefully").split()
+
+
+class FakeLLMSettings:
+    median_ms = 600.0
+    p99_ms = 3000.0
+    error_rate = 0.0
+    error_status = 503
+    hang_rate = 0.0
+    hang_seconds = 120.0
+    truncate_rate = 0.0
+    stream_chunks = 8
+    answer_words = 120
+
+
+settings = FakeLLMSettings()
+app = FastAPI(title="Fake Gemini")
+
+
+def sample_latency() -> float:
+    """Log-normal latency with the configured median and p99, in seconds"""
+    median = settings.median_ms / 1000
+    if settings.p99_ms <= settings.median_ms:
+        return median
+    sigma = math.log(settings.p99_ms / settings.median_ms) / 2.326
+    return random.lognormvariate(math.log(median), sigma)
+
+
+def prompt_text(body: dict) -> str:
+    parts = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            parts.append(part.get("text", ""))
+    return "\n".join(parts)
+
+
+def fake_mcqs(count: int) -> list:
+    return [
+        {
+            "question": f"Sample question {i + 1} about {random.choice(WORDS)}?",
+            "options": [f"Option {letter} statement" for letter in "ABCD"],
+            "correct_answer": random.choice("ABCD"),
+            "explanation": "Generated by the fake LLM server.",
+        }
+        for i in range(count)
+    ]
+
+
+def fake_answer(prompt: str) -> str:
+    if "MCQ" in prompt:
+        match = re.search(r"Generate (\d+) MCQ", prompt)
+        text = json.dumps(fake_mcqs(int(match.group(1)) if match else 5))
+        if settings.truncate_rate and random.random() < settings.truncate_rate:
+            # Simulate output cut off at the token limit
+            text = text[:random.randint(len(text) // 3, len(text) - 2)]
+        return text
+    if "Student Answer:" in prompt:  # full and rubric grading prompts
+        return json.dumps({
+            "score": random.randint(40, 100),
+            "feedback": "Fake feedback.",
+            "strengths": ["Fake strength"],
+            "improvements": ["Fake improvement"],
+            "suggestions": ["Fake suggestion"],
+        })
+    return " ".join(random.choice(WORDS) for _ in range(settings.answer_words))
+
+
+def candidate(text: str, prompt: str, finished: bool = True) -> dict:
+    response = {
+        "candidates": [{
+            "content": {"parts": [{"text": text}], "role": "model"},
+            "index": 0,
+        }],
+        "usageMetadata": {
+            "promptTokenCount": len(prompt) // 4,
+            "candidatesTokenCount": len(text) // 4,
+            "totalTokenCount": (len(prompt) + len(text)) // 4,
+        },
+    }
+    if finished:
+        response["candidates"][0]["finishReason"] = "STOP"
+    return response
+
+
+async def injected_failure():
+    """Return an error response, hang, or None for a normal answer"""
+    if settings.hang_rate and random.random() < settings.hang_rate:
+        await asyncio.sleep(settings.hang_seconds)
+    if settings.error_rate and random.random() < settings.error_rate:
+        await asyncio.sleep(sample_latency() / 4)
+        return JSONResponse(
+            status_code=settings.error_status,
+            content={"error": {"code": settings.error_status, "message": "Injected failure",
+                               "status": "UNAVAILABLE"}},
+        )
+    return None
+
+
+@app.post("/{version}/models/{model}:generateContent")
+async def generate_content(version: str, model: str, request: Request):
+    failure = await injected_failure()
+    if failure is not None:
+        return failure
+    prompt = prompt_text(await request.json())
+    await asyncio.sleep(sample_latency())
+    return candidate(fake_answer(prompt), prompt)
+
+
+@app.post("/{version}/models/{model}:streamGenerateContent")
+async def stream_generate_content(version: str, model: str, request: Request):
+    failure = await injected_failure()
+    if failure is not None:
+        return failure
+    prompt = prompt_text(await request.json())
+    text = fake_answer(prompt)
+    total = sample_latency()
+    pieces = max(1, settings.stream_chunks)
+    step = math.ceil(len(text) / pieces)
+
+    async def body():
+        # The REST transport reads a JSON array streamed element by element
+        yield "["
+        for i in range(pieces):
+            await asyncio.sleep(total / pieces)
+            chunk = text[i * step:(i + 1) * step]
+            yield ("," if i else "") + json.dumps(candidate(chunk, prompt, finished=i == pieces - 1))
+        yield "]"
+
+    return StreamingResponse(body(), media_type="application/json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--median-ms", type=float, default=settings.median_ms)
+    parser.add_argument("--p99-ms", type=float, default=settings.p99_ms)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="fraction of requests that hang")
+    parser.add_argument("--hang-seconds", type=float, default=120.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0,
+                        help="fraction of MCQ answers cut off mid-JSON")
+    parser.add_argument("--stream-chunks", type=int, default=8)
+    parser.add_argument("--answer-words", type=int, default=120)
+    args = parser.parse_args()
+
+    settings.median_ms = args.median_ms
+    settings.p99_ms = args.p99_ms
+    settings.error_rate = args.error_rate
+    settings.error_status = args.error_status
+    settings.hang_rate = args.hang_rate
+    settings.hang_seconds = args.hang_seconds
+    settings.truncate_rate = args.truncate_rate
+    settings.stream_chunks = args.stream_chunks
+    settings.answer_words = args.answer_words
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
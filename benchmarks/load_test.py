@@ -0,0 +1,128 @@
+"""Scripted load test against a running tutor instance.
+
+Runs each workload at several concurrency levels and reports requests per
+second and p50/p95/p99 latency. Point the app at the fake LLM server
+(see benchmarks/fake_llm_server.py) to measure the service itself rather
+than the Gemini API. Every request numbers its topic or answer, so the
+generation cache and grade reuse cannot turn the model path into cache
+hits.
+
+Usage:
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 \
+        --workloads ask,generate-mcq,grade,upload --concurrency 1,8,32 --requests 200
+"""
+from typing import Callable, Dict, List
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+QUESTIONS = [
+    "What is Newton's second law?",
+    "Explain conservation of momentum with an example.",
+    "How does refraction change the speed of light?",
+    "What is the difference between speed and velocity?",
+    "Why is the work done by a centripetal force zero?",
+]
+TOPICS = ["Newton's laws", "Optics", "Thermodynamics", "Electrostatics", "Kinematics"]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def ask(client: httpx.AsyncClient, i: int) -> httpx.Response:
+    return await client.post("/ask", json={"question": random.choice(QUESTIONS)})
+
+
+async def generate_mcq(client: httpx.AsyncClient, i: int) -> httpx.Response:
+    return await client.post("/generate-mcq", json={"topic": f"{random.choice(TOPICS)}, part {i}"})
+
+
+async def grade(client: httpx.AsyncClient, i: int) -> httpx.Response:
+    return await client.post("/grade", json={
+        "question": "State Newton's second law.",
+        "correct_answer": "Force equals the rate of change of momentum, F = ma for constant mass.",
+        # The number keeps otherwise identical answers from sharing a grade
+        "student_answer": random.choice([
+            "F = ma",
+            "Force is mass times acceleration",
+            "Objects stay at rest unless acted upon",
+        ]) + f" (answer {i})",
+    })
+
+
+async def upload(client: httpx.AsyncClient, i: int) -> httpx.Response:
+    # Unique content per request so uploads are not deduplicated
+    body = (f"# Notes {i}\n\n" + " ".join(random.choice(QUESTIONS) for _ in range(200))).encode()
+    return await client.post("/upload", files={"file": (f"notes_{i}.txt", body, "text/plain")})
+
+
+WORKLOADS: Dict[str, Callable] = {
+    "ask": ask,
+    "generate-mcq": generate_mcq,
+    "grade": grade,
+    "upload": upload,
+}
+
+
+async def run_level(url: str, workload: Callable, concurrency: int, total: int, timeout: float) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                start = time.perf_counter()
+                try:
+                    response = await workload(client, i)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'errors': errors,
+        'requests': len(latencies),
+    }
+
+
+async def main_async(args):
+    print(f"{'workload':<13} {'conc':>5} {'reqs':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name in args.workloads.split(","):
+        workload = WORKLOADS[name.strip()]
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            r = await run_level(args.url, workload, concurrency, args.requests, args.timeout)
+            print(f"{name:<13} {concurrency:>5} {r['requests']:>6} {r['rps']:>8.2f} "
+                  f"{r['p50'] * 1000:>8.0f} {r['p95'] * 1000:>8.0f} {r['p99'] * 1000:>8.0f} {r['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--workloads", default="ask,generate-mcq,grade,upload")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=200, help="requests per workload and level")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
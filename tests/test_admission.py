@@ -0,0 +1,40 @@
+import time
+
+from app.utils.admission import AdmissionController, AdmissionMiddleware, PriorityClass
+
+
+def _controller():
+    return AdmissionController(2, [
+        PriorityClass("interactive", 0, 5, 10, 2),
+        PriorityClass("batch", 1, 30, 10, 1),
+    ], tenant_queue=4)
+
+
+def _scope(address, tenant=None):
+    headers = [(b"x-tenant-id", tenant.encode())] if tenant else []
+    return {"type": "http", "client": (address, 5000), "headers": headers}
+
+
+def test_tenant_header_only_trusted_from_proxy():
+    middleware = AdmissionMiddleware(None, _controller(), None, {}, trusted_proxies=["10.0.0.2"])
+    assert middleware._tenant(_scope("203.0.113.9", "teacher-1")) == "203.0.113.9"
+    assert middleware._tenant(_scope("10.0.0.2", "teacher-1")) == "teacher-1"
+    assert middleware._tenant(_scope("10.0.0.2")) == "10.0.0.2"
+
+
+def test_wait_estimate_uses_each_class_service_time():
+    controller = _controller()
+    controller._service_time = {"interactive": 0.2, "batch": 20.0}
+    controller._queued = {"interactive": 3, "batch": 2}
+    # Slow summaries do not inflate the estimate for questions
+    assert abs(controller._estimated_wait(controller.classes["interactive"]) - 0.4) < 1e-9
+    assert abs(controller._estimated_wait(controller.classes["batch"]) - 60.6) < 1e-9
+
+
+def test_release_updates_only_its_class():
+    controller = _controller()
+    controller._service_time = {"interactive": 0.2, "batch": 20.0}
+    controller._active["batch"] = 1
+    controller.release("batch", time.monotonic() - 10.0)
+    assert 17.5 < controller._service_time["batch"] < 18.5
+    assert controller._service_time["interactive"] == 0.2
@@ -0,0 +1,88 @@
+import copy
+
+import pytest
+from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+from app.config import Config
+from app.services.chunking import StructuredChunker
+from app.services.document_processor import DocumentProcessor
+
+
+@pytest.fixture(autouse=True)
+def _no_extraction_cache(monkeypatch):
+    monkeypatch.setattr(Config, "EXTRACTION_CACHE_ENABLED", False)
+
+
+def _docx(path):
+    doc = Document()
+    doc.add_heading("Kinematics", level=1)
+    doc.add_paragraph("Motion in one dimension.")
+    doc.add_paragraph("Displacement", style="List Bullet")
+    doc.add_paragraph("Velocity", style="List Bullet")
+    table = doc.add_table(rows=3, cols=2)
+    for row, cells in zip(table.rows, [("Quantity", "Unit"), ("Speed", "m/s"), ("", "")]):
+        for cell, text in zip(row.cells, cells):
+            cell.text = text
+    doc.add_heading("Dynamics", level=2)
+    wrapped = doc.add_paragraph("Inside a content control.")
+    # Wrap the last paragraph in <w:sdt><w:sdtContent>, as templates often do
+    sdt, content = OxmlElement("w:sdt"), OxmlElement("w:sdtContent")
+    wrapped._p.addprevious(sdt)
+    content.append(copy.deepcopy(wrapped._p))
+    sdt.append(content)
+    wrapped._p.getparent().remove(wrapped._p)
+    doc.add_paragraph("After the control.")
+    doc.save(str(path))
+    return str(path)
+
+
+def test_docx_blocks_come_out_in_document_order(tmp_path):
+    blocks = DocumentProcessor().extract_docx_blocks(_docx(tmp_path / "notes.docx"))
+    assert [(b["text"], b["heading_level"], b.get("kind")) for b in blocks] == [
+        ("Kinematics", 1, None),
+        ("Motion in one dimension.", 0, None),
+        ("- Displacement\n- Velocity", 0, "list"),
+        ("Quantity | Unit\nSpeed | m/s", 0, "table"),
+        ("Dynamics", 2, None),
+        ("Inside a content control.", 0, None),
+        ("After the control.", 0, None),
+    ]
+    assert blocks[2]["items"] == 2 and blocks[3]["rows"] == 2
+
+
+def test_plain_docx_text_keeps_tables(tmp_path):
+    text = DocumentProcessor().process_docx(_docx(tmp_path / "notes.docx"))
+    assert "Speed | m/s" in text
+    assert text.index("Velocity") < text.index("Quantity | Unit") < text.index("Dynamics")
+
+
+def test_numbered_items_keep_their_depth(tmp_path):
+    doc = Document()
+    for text, level in [("Forces", 0), ("Contact forces", 1), ("Friction", 2)]:
+        paragraph = doc.add_paragraph(text)
+        numbering = OxmlElement("w:numPr")
+        ilvl, num = OxmlElement("w:ilvl"), OxmlElement("w:numId")
+        ilvl.set(qn("w:val"), str(level))
+        num.set(qn("w:val"), "1")
+        numbering.extend([ilvl, num])
+        paragraph._p.get_or_add_pPr().append(numbering)
+    path = str(tmp_path / "list.docx")
+    doc.save(path)
+
+    blocks = DocumentProcessor().extract_docx_blocks(path)
+    assert blocks == [{"text": "- Forces\n  - Contact forces\n    - Friction", "page": None,
+                       "heading_level": 0, "kind": "list", "items": 3}]
+
+
+def test_large_table_is_split_between_rows_with_its_header():
+    rows = ["Element | Symbol"] + [f"Element {i} | E{i}" for i in range(40)]
+    block = {"text": "\n".join(rows), "page": None, "heading_level": 0, "kind": "table", "rows": 41}
+    chunks = StructuredChunker(chunk_size=120, chunk_overlap=0).split_blocks([block])
+    assert len(chunks) > 1
+    for text, _ in chunks:
+        lines = text.split("\n")
+        assert lines[0] == "Element | Symbol" and len(text) <= 120
+        assert all(line in rows for line in lines)
+    assert sum(len(text.split("\n")) - 1 for text, _ in chunks) == 40
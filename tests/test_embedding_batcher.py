@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+class _Embeddings:
+    """Vector = [len(text)]; the first batch blocks until ``release`` is set"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.single = []
+        self.release = threading.Event()
+        self.fail = fail
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        if len(self.batches) == 1:
+            self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("model crashed")
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        self.single.append(text)
+        return [float(len(text))]
+
+
+def _wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def _queue_behind_a_running_batch(batcher, embeddings, texts, pool):
+    first = pool.submit(batcher.embed_query, "x")
+    _wait_until(lambda: embeddings.batches)
+    futures = [pool.submit(batcher.embed_query, text) for text in texts]
+    _wait_until(lambda: batcher._queue.qsize() == len(texts))
+    embeddings.release.set()
+    return first, futures
+
+
+def test_queries_waiting_on_a_running_batch_share_the_next_call():
+    embeddings = _Embeddings()
+    batcher = EmbeddingBatcher(embeddings, max_batch=32, max_wait=0)
+    texts = ["a" * n for n in range(1, 11)]
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        first, futures = _queue_behind_a_running_batch(batcher, embeddings, texts, pool)
+        assert first.result(5) == [1.0]
+        assert [future.result(5) for future in futures] == [[float(n)] for n in range(1, 11)]
+    assert len(embeddings.batches) == 2
+    assert sorted(embeddings.batches[1]) == sorted(texts)
+    batcher.close()
+
+
+def test_batches_are_capped_at_max_batch():
+    embeddings = _Embeddings()
+    batcher = EmbeddingBatcher(embeddings, max_batch=4, max_wait=0)
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        _, futures = _queue_behind_a_running_batch(batcher, embeddings, ["q"] * 10, pool)
+        for future in futures:
+            future.result(5)
+    assert [len(batch) for batch in embeddings.batches[1:]] == [4, 4, 2]
+    batcher.close()
+
+
+def test_a_failed_batch_fails_every_caller_in_it():
+    embeddings = _Embeddings(fail=True)
+    batcher = EmbeddingBatcher(embeddings, max_wait=0)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        first, futures = _queue_behind_a_running_batch(batcher, embeddings, ["a", "b"], pool)
+        for future in [first] + futures:
+            with pytest.raises(RuntimeError, match="model crashed"):
+                future.result(5)
+    batcher.close()
+
+
+def test_closed_batcher_embeds_directly():
+    embeddings = _Embeddings()
+    embeddings.release.set()
+    batcher = EmbeddingBatcher(embeddings)
+    assert batcher.embed_query("abc") == [3.0]
+    batcher.close()
+    assert batcher.embed_query("abcd") == [4.0]
+    assert embeddings.single == ["abcd"]
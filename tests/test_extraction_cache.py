@@ -0,0 +1,99 @@
+import fitz
+import pytest
+
+import app.services.document_processor as processor_module
+from app.services.document_processor import DocumentProcessor
+from app.services.extraction_cache import ExtractionCache
+from app.utils.file_handlers import file_sha256
+
+READ_PAGE = DocumentProcessor._read_pdf_page
+
+
+def _pdf(path, pages):
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Chapter {number + 1}", fontsize=20)
+        page.insert_text((72, 120), f"Body text of page {number + 1} about momentum.", fontsize=11)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+@pytest.fixture
+def processor(tmp_path):
+    return DocumentProcessor(ExtractionCache(str(tmp_path / "cache" / "extraction.sqlite3")))
+
+
+def _count_page_reads(monkeypatch, fail_on=None):
+    reads = []
+
+    def counting(page):
+        if page.number == fail_on:
+            raise RuntimeError("worker killed")
+        reads.append(page.number)
+        return READ_PAGE(page)
+
+    monkeypatch.setattr(DocumentProcessor, "_read_pdf_page", staticmethod(counting))
+    return reads
+
+
+def test_unchanged_pdf_is_replayed_without_reading_pages(tmp_path, processor, monkeypatch):
+    path = _pdf(tmp_path / "notes.pdf", 3)
+    first = processor.process_document(path)
+    reads = _count_page_reads(monkeypatch)
+
+    second = processor.process_document(path)
+    assert reads == []
+    assert second["content"] == first["content"]
+    assert [b["page"] for b in second["blocks"]] == [1, 1, 2, 2, 3, 3]
+    assert second["blocks"][0]["heading_level"] == 1
+
+
+def test_interrupted_extraction_resumes_at_the_missing_page(tmp_path, processor, monkeypatch):
+    path = _pdf(tmp_path / "notes.pdf", 3)
+    content_hash = file_sha256(path)
+    _count_page_reads(monkeypatch, fail_on=2)
+    with pytest.raises(RuntimeError):
+        processor.extract_pdf_blocks(path, content_hash)
+    assert processor.replay(content_hash) is None  # no manifest for a partial document
+
+    reads = _count_page_reads(monkeypatch)
+    blocks = processor.extract_pdf_blocks(path, content_hash)
+    assert reads == [2]
+    assert blocks[-1]["text"] == "Body text of page 3 about momentum."
+    assert processor.replay(content_hash)["blocks"] == blocks
+
+
+def test_whole_file_formats_replay_without_the_source(tmp_path, processor):
+    path = tmp_path / "notes.txt"
+    path.write_text("# Forces\n\nF = ma relates force and acceleration.", encoding="utf-8")
+    content_hash = file_sha256(str(path))
+    first = processor.process_document(str(path))
+    path.unlink()
+
+    replayed = processor.replay(content_hash)
+    assert replayed["content"] == first["content"]
+    assert replayed["blocks"][0] == {"text": "Forces", "page": None, "heading_level": 1}
+
+
+def test_extractor_version_change_misses(tmp_path, processor, monkeypatch):
+    path = tmp_path / "notes.txt"
+    path.write_text("Momentum is mass times velocity.", encoding="utf-8")
+    content_hash = file_sha256(str(path))
+    processor.process_document(str(path))
+    monkeypatch.setattr(processor_module, "EXTRACTOR_VERSION", "v-next")
+    assert processor.replay(content_hash) is None
+
+
+def test_least_recently_used_pages_are_evicted(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "extraction.sqlite3"), max_bytes=100)
+    cache.touch_interval = 0
+    for name in ("old", "used", "new"):
+        cache.put_page(name, ".txt:v2", 0, "x" * 38)
+    assert cache.get_page("used", ".txt:v2", 0)  # refreshes last_used
+
+    assert cache.evict() == 1
+    assert cache.get_page("old", ".txt:v2", 0) is None
+    assert cache.get_page("used", ".txt:v2", 0) and cache.get_page("new", ".txt:v2", 0)
+    assert cache.size() <= 100
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.utils.file_handlers import (
+    MultipartFileStream,
+    ResumableUploadStore,
+    UploadNotFoundError,
+    UploadsFullError,
+    UploadTooLargeError,
+    save_upload_stream,
+)
+
+BOUNDARY = "BB"
+
+
+def _body(payload_chunks, read):
+    async def body():
+        yield b"--BB\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nhi\r\n"
+        yield b"--BB\r\nContent-Disposition: form-data; name=\"file\"; filename=\"dir\\\\notes.txt\"\r\n\r\n"
+        for chunk in payload_chunks:
+            read.append(len(chunk))
+            yield chunk
+        yield b"\r\n--BB--\r\n"
+    return body()
+
+
+def _upload(payload_chunks, read):
+    return MultipartFileStream(_body(payload_chunks, read), f"multipart/form-data; boundary={BOUNDARY}")
+
+
+def test_file_field_is_streamed(tmp_path):
+    async def run():
+        upload = _upload([b"momentum " * 10, b"is conserved"], [])
+        filename = await upload.open()
+        path, _, size = await save_upload_stream(upload, str(tmp_path), ".txt", 1000)
+        return filename, open(path, "rb").read(), size
+
+    filename, data, size = asyncio.run(run())
+    assert filename == "notes.txt"
+    assert data == b"momentum " * 10 + b"is conserved"
+    assert size == len(data)
+
+
+def test_size_limit_stops_reading_the_body(tmp_path):
+    read = []
+
+    async def run():
+        upload = _upload([b"a" * 1000] * 100, read)
+        await upload.open()
+        await save_upload_stream(upload, str(tmp_path), ".txt", 2500)
+
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(run())
+    assert sum(read) <= 4000
+    assert not list(tmp_path.iterdir())
+
+
+def test_missing_field_and_truncated_body_are_rejected(tmp_path):
+    async def missing():
+        async def body():
+            yield b"--BB\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nhi\r\n--BB--\r\n"
+        await MultipartFileStream(body(), "multipart/form-data; boundary=BB").open()
+
+    async def truncated():
+        async def body():
+            yield b"--BB\r\nContent-Disposition: form-data; name=\"file\"; filename=\"t.txt\"\r\n\r\nhello"
+        upload = MultipartFileStream(body(), "multipart/form-data; boundary=BB")
+        await upload.open()
+        await save_upload_stream(upload, str(tmp_path), ".txt", 1000)
+
+    with pytest.raises(ValueError):
+        asyncio.run(missing())
+    with pytest.raises(ValueError):
+        asyncio.run(truncated())
+    with pytest.raises(ValueError):
+        MultipartFileStream(iter(()), "application/json")
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def _write(store, upload_id, number, data):
+    return asyncio.run(store.write_part(upload_id, number, _chunks(data)))
+
+
+def test_resumable_parts_out_of_order_and_resent(tmp_path):
+    store = ResumableUploadStore(str(tmp_path), max_size=100, part_size=4)
+    upload_id = store.create("notes.txt", ".txt", 10)["upload_id"]
+    _write(store, upload_id, 2, b"ij")
+    _write(store, upload_id, 0, b"abXX")
+    _write(store, upload_id, 1, b"efgh")
+    _write(store, upload_id, 0, b"abcd")  # resent part replaces the first copy
+    assert store.status(upload_id)["received_parts"] == [0, 1, 2]
+
+    path, _, size, state = asyncio.run(store.complete(upload_id))
+    assert open(path, "rb").read() == b"abcdefghij" and size == 10
+    assert state["filename"] == "notes.txt"
+    with pytest.raises(UploadNotFoundError):
+        store.status(upload_id)
+
+
+def test_resumable_size_limit_counts_every_part(tmp_path):
+    store = ResumableUploadStore(str(tmp_path), max_size=100, part_size=4)
+    upload_id = store.create("notes.txt", ".txt", 6)["upload_id"]
+    _write(store, upload_id, 0, b"abcd")
+    with pytest.raises(UploadTooLargeError):
+        _write(store, upload_id, 1, b"efg")  # 7 bytes declared as 6
+    with pytest.raises(UploadTooLargeError):
+        _write(store, upload_id, 2, b"abcde")  # larger than a part
+    assert store.status(upload_id)["received_parts"] == [0]
+    with pytest.raises(UploadTooLargeError):
+        store.create("big.txt", ".txt", 101)
+
+
+def test_idle_uploads_expire_and_are_swept(tmp_path):
+    store = ResumableUploadStore(str(tmp_path), max_size=100, part_size=4, ttl=60)
+    stale = store.create("old.txt", ".txt", 8)["upload_id"]
+    _write(store, stale, 0, b"abcd")
+    long_ago = time.time() - 120
+    os.utime(os.path.join(store.root, stale), (long_ago, long_ago))
+
+    with pytest.raises(UploadNotFoundError):
+        _write(store, stale, 1, b"efgh")
+    assert not os.path.exists(os.path.join(store.root, stale))
+
+    other = store.create("old2.txt", ".txt", 8)["upload_id"]
+    os.utime(os.path.join(store.root, other), (long_ago, long_ago))
+    store.create("new.txt", ".txt", 8)
+    assert os.listdir(store.root) and other not in os.listdir(store.root)
+
+
+def test_open_uploads_share_a_byte_budget(tmp_path):
+    store = ResumableUploadStore(str(tmp_path), max_size=100, part_size=4, max_reserved=150)
+    first = store.create("a.txt", ".txt", 100)["upload_id"]
+    with pytest.raises(UploadsFullError):
+        store.create("b.txt", ".txt", 60)
+    _write(store, first, 0, b"abcd")
+    store.create("c.txt", ".txt", 50)
@@ -0,0 +1,66 @@
+import json
+
+from app.config import Config
+from app.services.gemini_service import GeminiService
+
+
+def _mcq(i, answer="A"):
+    return {"question": f"Question {i}?", "options": ["w", "x", "y", "z"],
+            "correct_answer": answer, "explanation": f"Because {i}"}
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Model:
+    """Returns the queued replies in turn; ``schema_error`` rejects structured-output settings"""
+
+    def __init__(self, replies, schema_error=False):
+        self.replies = list(replies)
+        self.schema_error = schema_error
+        self.configs = []
+
+    def generate_content(self, prompt, generation_config=None, request_options=None):
+        self.configs.append(generation_config)
+        if generation_config and self.schema_error:
+            raise TypeError("GenerationConfig.__init__() got an unexpected keyword argument 'response_schema'")
+        return _Response(self.replies.pop(0))
+
+
+def _service(model):
+    service = GeminiService.__new__(GeminiService)
+    service.model = model
+    service.use_gemini = True
+    service.json_mode = True
+    return service
+
+
+def test_truncated_mcqs_are_salvaged_and_the_rest_requested(monkeypatch):
+    monkeypatch.setattr(Config, "MCQ_REASK_ATTEMPTS", 1)
+    truncated = json.dumps([_mcq(0), _mcq(1, "C")])[:-1] + ', {"question": "Question 2?", "opt'
+    model = _Model([truncated, json.dumps([_mcq(2, "B")])])
+
+    mcqs = _service(model).generate_mcq("forces", count=3)
+    assert [m["question"] for m in mcqs] == ["Question 0?", "Question 1?", "Question 2?"]
+    assert [m["correct_answer"] for m in mcqs] == ["A", "C", "B"]
+    assert all(config["response_mime_type"] == "application/json" for config in model.configs)
+
+
+def test_invalid_mcqs_are_dropped():
+    invalid = dict(_mcq(1), options=["only", "three", "options"])
+    mcqs, outcome = _service(None)._parse_mcqs(json.dumps([_mcq(0), invalid, _mcq(2, "E")]))
+    assert outcome == "salvaged"
+    assert [m["question"] for m in mcqs] == ["Question 0?"]
+
+
+def test_rejected_schema_falls_back_to_plain_prompts():
+    model = _Model(['```json\n{"score": 8, "feedback": "Good"}\n```'], schema_error=True)
+    service = _service(model)
+
+    grade = service.grade_with_rubric("Define momentum", "p = mv", "mass times velocity")
+    assert grade["score"] == 8 and grade["strengths"] == []
+    assert not service.json_mode
+    assert model.configs[0]["response_schema"]["required"][0] == "score"
+    assert model.configs[1] is None
@@ -0,0 +1,50 @@
+import pytest
+
+from app.services.grading_service import GradingService
+
+
+class _Gemini:
+    """Grades every new answer with a distinct score so reuse is visible"""
+
+    use_gemini = True
+
+    def __init__(self):
+        self.graded = []
+
+    def build_rubric(self, question, correct_answer, context=""):
+        return f"Full marks: {correct_answer}"
+
+    def grade_with_rubric(self, question, rubric, student_answer):
+        self.graded.append(student_answer)
+        return {"score": len(self.graded), "feedback": student_answer}
+
+
+def _service():
+    # Every answer embeds to the same vector: only the term checks can refuse a reuse
+    service = GradingService(embed=lambda text: [1.0, 0.0], use_rubrics=True,
+                             reuse_similarity=0.97, pre_grading=False)
+    service.gemini_service = _Gemini()
+    return service
+
+
+@pytest.mark.parametrize("first, second", [
+    ("x = 5", "x = -5"),
+    ("A > B", "A < B"),
+    ("A is greater than B", "B is greater than A"),
+    ("The reaction is exothermic", "The reaction isn't exothermic"),
+    ("The speed is 5 m/s", "The speed is 6 m/s"),
+])
+def test_opposite_answers_are_graded_separately(first, second):
+    service = _service()
+    question = f"grading question for {first}"
+    assert service.grade_answer(question, "model answer", first)["score"] == 1
+    assert service.grade_answer(question, "model answer", second)["score"] == 2
+    assert service.gemini_service.graded == [first, second]
+
+
+def test_rephrased_answer_reuses_the_grade():
+    service = _service()
+    question = "Which gas do plants release?"
+    assert service.grade_answer(question, "Oxygen", "Plants release oxygen")["score"] == 1
+    assert service.grade_answer(question, "Oxygen", "plants release oxygen gas")["score"] == 1
+    assert service.gemini_service.graded == ["Plants release oxygen"]
@@ -0,0 +1,16 @@
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from app.utils.http_cache import etag_response
+
+
+def _request(method, if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": method, "path": "/", "headers": headers, "query_string": b""})
+
+
+def test_matching_etag_is_304_for_get_and_412_for_post():
+    etag = etag_response(_request("GET"), JSONResponse({"summary": "momentum"})).headers["etag"]
+    assert etag_response(_request("GET", etag), JSONResponse({"summary": "momentum"})).status_code == 304
+    assert etag_response(_request("POST", etag), JSONResponse({"summary": "momentum"})).status_code == 412
+    assert etag_response(_request("POST", 'W/"other"'), JSONResponse({"summary": "momentum"})).status_code == 200
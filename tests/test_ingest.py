@@ -0,0 +1,38 @@
+from app.cli.ingest import ingest
+from app.config import Config
+
+
+class _Store:
+    """Records what the CLI hands over; chunking here would mean the workers' chunks were ignored"""
+
+    def __init__(self):
+        self.documents = []
+
+    def add_documents(self, documents):
+        self.documents.extend(documents)
+
+    def split_document(self, doc):
+        raise AssertionError("documents are chunked in the extraction workers")
+
+    def flush(self):
+        pass
+
+
+def test_documents_are_chunked_once_in_the_workers(tmp_path, monkeypatch):
+    # Forked workers inherit this
+    monkeypatch.setattr(Config, "EXTRACTION_CACHE_PATH", str(tmp_path / "extraction_cache.sqlite3"))
+    library = tmp_path / "library"
+    library.mkdir()
+    (library / "momentum.txt").write_text("Momentum is conserved in a closed system. " * 80)
+    (library / "optics.txt").write_text("Light slows down in glass and bends. " * 80)
+    (library / "copy.txt").write_text("Light slows down in glass and bends. " * 80)
+    store = _Store()
+
+    progress = ingest(str(library), workers=1, batch_chunks=1024, manifest_path=str(tmp_path / "manifest.jsonl"),
+                      upload_folder=str(tmp_path / "uploads"), rag_service=store)
+
+    # Files are hashed in name order, so optics.txt is the duplicate
+    assert sorted(doc["file_name"] for doc in store.documents) == ["copy.txt", "momentum.txt"]
+    assert progress.skipped == 1
+    assert all(doc["chunks"] for doc in store.documents)
+    assert progress.chunks == sum(len(doc["chunks"]) for doc in store.documents)
@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.services.ingest_buffer import IngestionBuffer
+
+
+class _Store:
+    """Records every batch written; ``fail`` makes the next write raise"""
+
+    def __init__(self):
+        self.texts = []
+        self.ids = []
+        self.vectors = []
+        self.persisted = 0
+        self.fail = False
+
+    def add_texts(self, texts, metadatas, embeddings=None, ids=None):
+        if self.fail:
+            self.fail = False
+            raise OSError("disk full")
+        self.texts.extend(texts)
+        self.ids.extend(ids)
+        self.vectors.extend(np.asarray(embeddings).tolist())
+
+    def persist(self):
+        self.persisted += 1
+
+
+def _add(buffer, name, count=2):
+    texts = [f"{name}{i}" for i in range(count)]
+    vectors = [[float(i), 1.0] for i in range(count)]
+    buffer.add(texts, [{"source": name}] * count, vectors, ids=[f"{name}:{i}" for i in range(count)])
+
+
+def test_spool_is_replayed_after_a_crash(tmp_path):
+    crashed = IngestionBuffer(_Store(), str(tmp_path), max_batch=100)
+    _add(crashed, "a")
+    _add(crashed, "b")
+    assert crashed.vectorstore.texts == []  # still only in memory and the spool
+
+    store = _Store()
+    IngestionBuffer(store, str(tmp_path), max_batch=100)
+    assert store.texts == ["a0", "a1", "b0", "b1"]
+    assert store.ids == ["a:0", "a:1", "b:0", "b:1"]
+    assert store.vectors[1] == [1.0, 1.0]
+    assert store.persisted == 1
+    assert os.path.getsize(tmp_path / IngestionBuffer.spool_file) == 0
+
+
+def test_torn_last_record_is_skipped(tmp_path):
+    crashed = IngestionBuffer(_Store(), str(tmp_path), max_batch=100)
+    _add(crashed, "a")
+    crashed._spool.write('{"texts": ["half')  # crash mid-write
+    crashed._spool.flush()
+
+    store = _Store()
+    IngestionBuffer(store, str(tmp_path), max_batch=100)
+    assert store.texts == ["a0", "a1"]
+
+
+def test_batch_being_flushed_at_the_crash_is_replayed_first(tmp_path):
+    crashed = IngestionBuffer(_Store(), str(tmp_path), max_batch=100)
+    _add(crashed, "a")
+    crashed._spool.close()
+    os.replace(crashed._spool_path, crashed._flushing_path)  # crash during the store write
+    crashed._spool = open(crashed._spool_path, "a", encoding="utf-8")
+    _add(crashed, "b")
+
+    store = _Store()
+    IngestionBuffer(store, str(tmp_path), max_batch=100)
+    assert store.texts == ["a0", "a1", "b0", "b1"]
+    assert not os.path.exists(crashed._flushing_path)
+
+
+def test_failed_flush_keeps_the_batch(tmp_path):
+    store = _Store()
+    buffer = IngestionBuffer(store, str(tmp_path), max_batch=100)
+    _add(buffer, "a")
+    store.fail = True
+    with pytest.raises(OSError):
+        buffer.flush()
+    assert buffer.pending() == 2
+    _add(buffer, "b")
+
+    assert buffer.flush() == 4
+    assert store.texts == ["a0", "a1", "b0", "b1"]
+    buffer.close()
+
+    # Nothing is left to replay once the batch is in the store
+    replay = _Store()
+    IngestionBuffer(replay, str(tmp_path), max_batch=100)
+    assert replay.texts == []
+
+
+def test_batch_threshold_triggers_a_flush(tmp_path):
+    store = _Store()
+    buffer = IngestionBuffer(store, str(tmp_path), max_batch=3)
+    _add(buffer, "a")
+    assert store.texts == []
+    _add(buffer, "b")
+    assert store.texts == ["a0", "a1", "b0", "b1"]
+    assert buffer.pending() == 0
+    buffer.close()
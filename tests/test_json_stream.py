@@ -0,0 +1,32 @@
+from app.utils.json_stream import IncrementalObjectParser, parse_json_object, salvage_objects, strip_code_fences
+
+
+def test_truncated_array_keeps_every_complete_object():
+    text = '[{"question": "Q1", "options": ["a", "b"]}, {"question": "Q2 {with braces}"}, {"question": "Q3", "opt'
+    assert salvage_objects(text) == [
+        {"question": "Q1", "options": ["a", "b"]},
+        {"question": "Q2 {with braces}"},
+    ]
+
+
+def test_objects_split_across_chunks():
+    parser = IncrementalObjectParser()
+    assert parser.feed('Here you go: {"a": "x \\" }') == []
+    assert parser.feed('", "b": [1, 2,],}') == [{"a": 'x " }', "b": [1, 2]}]
+    assert parser.feed(' {"c": ') == []
+    assert parser.incomplete
+
+
+def test_malformed_objects_are_counted_and_skipped():
+    parser = IncrementalObjectParser()
+    assert parser.feed('{"a": nope} {"b": 2}') == [{"b": 2}]
+    assert parser.malformed == 1
+
+
+def test_single_object_from_fenced_or_chatty_output():
+    assert strip_code_fences('```json\n{"score": 7}\n```') == '{"score": 7}'
+    assert parse_json_object('```json\n{"score": 7,}\n```') == {"score": 7}
+    assert parse_json_object('The grade is {"score": 4, "feedback": "ok"} as requested') == {
+        "score": 4, "feedback": "ok"
+    }
+    assert parse_json_object("no json here") is None
@@ -0,0 +1,64 @@
+import logging
+
+import pytest
+
+from app.config import Config
+from app.utils.metrics import (
+    STAGE_ERRORS,
+    STAGE_LATENCY,
+    MetricsRegistry,
+    RequestIdFilter,
+    reset_request_id,
+    set_request_id,
+    span,
+)
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("test_requests_total", "Requests", ["route"])
+    requests.inc(route="/ask")
+    requests.inc(2, route="/ask")
+    latency = registry.histogram("test_latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 3.0):
+        latency.observe(value)
+    assert registry.counter("test_requests_total", "Requests", ["route"]) is requests
+
+    lines = registry.render().splitlines()
+    assert "# TYPE test_requests_total counter" in lines
+    assert 'test_requests_total{route="/ask"} 3' in lines
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{le="1.0"} 2' in lines
+    assert 'test_latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "test_latency_seconds_count 3" in lines
+
+
+def test_span_times_the_stage_and_counts_errors(monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_ENABLED", True)
+    before = STAGE_LATENCY.snapshot(stage="test_stage") or (0.0, 0)
+    with span("test_stage"):
+        pass
+    with pytest.raises(KeyError):
+        with span("test_stage"):
+            raise KeyError("missing")
+    assert STAGE_LATENCY.snapshot(stage="test_stage")[1] == before[1] + 2
+    assert STAGE_ERRORS.value(stage="test_stage") >= 1
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(Config, "METRICS_ENABLED", False)
+    with span("test_disabled_stage"):
+        pass
+    assert STAGE_LATENCY.snapshot(stage="test_disabled_stage") is None
+
+
+def test_log_records_carry_the_request_id():
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, "message", None, None)
+    token = set_request_id("req-42")
+    try:
+        RequestIdFilter().filter(record)
+    finally:
+        reset_request_id(token)
+    assert record.request_id == "req-42"
+    RequestIdFilter().filter(record)
+    assert record.request_id == "-"
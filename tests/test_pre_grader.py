@@ -0,0 +1,43 @@
+import pytest
+
+from app.services.pre_grader import PreGrader
+
+
+def _score(correct, student, embed=None):
+    decision = PreGrader(embed).grade(correct, student)
+    return None if decision is None else decision["score"]
+
+
+@pytest.mark.parametrize("correct, student", [
+    ("x = 2, y = 3", "x = 3, y = 2"),
+    ("-5 m/s", "5 m/s"),
+    ("5 m/s", "-5 m/s"),
+    ("A is greater than B", "B is greater than A"),
+    ("a > b", "a < b"),
+    ("10^-3", "10^3"),
+    ("The reaction is exothermic", "The reaction isn't exothermic"),
+    ("Water does not conduct electricity when pure", "Pure water doesn't conduct electricity"),
+])
+def test_no_local_full_marks_when_the_meaning_differs(correct, student):
+    assert _score(correct, student) != 100
+
+
+@pytest.mark.parametrize("correct, student", [
+    ("H2O", "h2o."),
+    ("x = -5", "X=-5"),
+    ("Photosynthesis converts light energy into chemical energy",
+     "Photosynthesis converts light energy into chemical energy in plants"),
+])
+def test_clear_matches_get_full_marks(correct, student):
+    assert _score(correct, student) == 100
+
+
+def test_similar_embeddings_need_the_same_numbers_and_order():
+    # Every answer embeds to the same vector: only the term checks can refuse
+    embed = lambda text: [1.0, 0.0]
+    assert _score("B is greater than A", "A is greater than B", embed) is None
+    assert _score("5 m/s", "6 m/s", embed) is None
+
+
+def test_empty_answer_scores_zero():
+    assert _score("42", "  ") == 0
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from app.services.quiz_service import AnswersHiddenError, QuizClosedError, QuizService
+from app.utils.shared_cache import SharedCache
+
+MCQS = [
+    {"question": f"Question {i}", "options": ["w", "x", "y", "z"], "correct_answer": "B",
+     "explanation": f"Because {i}"}
+    for i in range(3)
+]
+
+
+def _workers(tmp_path, count=2):
+    # Each service opens its own connection to one file, like separate API processes
+    path = str(tmp_path / "shared.sqlite3")
+    return [QuizService(SharedCache(path), ttl=60) for _ in range(count)]
+
+
+def test_any_worker_serves_any_request(tmp_path):
+    one, two = _workers(tmp_path)
+    quiz = one.create(MCQS, "Forces")
+    quiz_id = quiz["quiz_id"]
+    attempt_id = two.start(quiz_id, "s1")["attempt_id"]
+    one.answer(quiz_id, attempt_id, 0, "B")
+    two.answer(quiz_id, attempt_id, 1, "C")
+    with pytest.raises(QuizClosedError):
+        one.answer(quiz_id, attempt_id, 0, "A")
+    with pytest.raises(QuizClosedError):
+        one.start(quiz_id, "s1")
+
+    result = two.finish(quiz_id, attempt_id)
+    assert result["total_score"] == 1 and not result["answers_released"]
+    assert "correct_answer" not in result["questions"][0]
+    assert one.check_teacher_key(quiz_id, quiz["teacher_key"])
+
+    results = one.results(quiz_id)
+    assert results["attempts_started"] == 1 and results["attempts_finished"] == 1
+    assert results["questions"][0]["option_counts"]["B"] == 1
+    assert results["questions"][1]["option_counts"]["C"] == 1
+
+
+def test_closing_finishes_open_attempts_and_releases_answers(tmp_path):
+    one, two = _workers(tmp_path)
+    quiz_id = one.create(MCQS)["quiz_id"]
+    attempt_id = one.start(quiz_id, "s1")["attempt_id"]
+    one.answer(quiz_id, attempt_id, 2, "B")
+    with pytest.raises(AnswersHiddenError):
+        two.result(quiz_id, attempt_id)
+
+    assert two.close(quiz_id)["closed"]
+    assert one.results(quiz_id)["score_distribution"]["1"] == 1
+    result = one.result(quiz_id, attempt_id)
+    assert result["answers_released"] and result["questions"][2]["correct"]
+    with pytest.raises(QuizClosedError):
+        two.start(quiz_id, "s2")
+
+
+def test_attempts_past_the_time_limit_count_in_live_results(tmp_path):
+    one, two = _workers(tmp_path)
+    one.grace = two.grace = 0
+    quiz_id = one.create(MCQS, time_limit=0.05)["quiz_id"]
+    attempt_id = one.start(quiz_id, "s1")["attempt_id"]
+    one.answer(quiz_id, attempt_id, 0, "B")
+    time.sleep(0.1)
+
+    results = two.results(quiz_id)
+    assert results["attempts_finished"] == 1
+    assert results["mean_percentage"] == pytest.approx(100 / 3)
+    assert one.result(quiz_id, attempt_id)["total_score"] == 1
+
+
+def test_attempt_and_quiz_limits_hold_across_workers(tmp_path):
+    one, two = _workers(tmp_path)
+    one.max_attempts = two.max_attempts = 1
+    one.max_quizzes = two.max_quizzes = 1
+    quiz_id = one.create(MCQS)["quiz_id"]
+    with pytest.raises(QuizClosedError):
+        two.create(MCQS)
+    one.start(quiz_id, "s1")
+    with pytest.raises(QuizClosedError):
+        two.start(quiz_id, "s2")
+    one.delete(quiz_id)
+    two.create(MCQS)
@@ -0,0 +1,53 @@
+from multiprocessing.connection import AuthenticationError, Client
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from app.services.rag_remote import IDEMPOTENT_METHODS, RAGServer, RemoteRAGService, authkey_path
+
+
+class _Documents:
+    def __init__(self):
+        self.documents = {"d1": {"document_id": "d1"}}
+
+    def get_document(self, doc_id):
+        return self.documents.get(doc_id)
+
+    def delete_document(self, doc_id):
+        return self.documents.pop(doc_id, None)
+
+
+@pytest.fixture
+def server(tmp_path):
+    address = str(tmp_path / "rag.sock")
+    server = RAGServer(_Documents(), address)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    while not os.path.exists(address):
+        time.sleep(0.01)
+    yield server
+    server.close()
+
+
+def test_server_writes_a_private_key_and_clients_use_it(server):
+    assert stat.S_IMODE(os.stat(authkey_path(server.address)).st_mode) == 0o600
+    assert RemoteRAGService(server.address).get_document("d1") == {"document_id": "d1"}
+
+
+def test_clients_without_the_key_cannot_call(server):
+    with pytest.raises(AuthenticationError):
+        Client(server.address, family="AF_UNIX", authkey=b"guess")
+    unauthenticated = Client(server.address, family="AF_UNIX")
+    unauthenticated.send(("delete_document", ("d1",), {}))
+    with pytest.raises(Exception):
+        unauthenticated.recv()
+    # The server survived both and ran nothing for them
+    assert RemoteRAGService(server.address).get_document("d1") == {"document_id": "d1"}
+
+
+def test_empty_key_and_delete_resend_are_refused(tmp_path):
+    with pytest.raises(ValueError):
+        RAGServer(_Documents(), str(tmp_path / "rag.sock"), authkey=b"")
+    assert "delete_document" not in IDEMPOTENT_METHODS
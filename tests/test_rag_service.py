@@ -0,0 +1,67 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+import app.services.rag_service as rag_module
+from app.config import Config
+
+
+class _Embeddings:
+    """Bag-of-words hashing: deterministic and needs no model download"""
+
+    def __init__(self, **kwargs):
+        self.fail = False
+
+    def _vector(self, text):
+        vector = np.zeros(64, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        if self.fail:
+            raise RuntimeError("embedding model crashed")
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_module, "HuggingFaceEmbeddings", _Embeddings)
+    monkeypatch.setattr(Config, "VECTOR_SNAPSHOT_PATH", "")
+    service = rag_module.RAGService(str(tmp_path / "store"), backend="numpy",
+                                    use_ingest_buffer=False, batch_queries=False)
+    yield service
+    service.close()
+
+
+def _document(text, name="momentum.txt"):
+    return {"content": text, "file_name": name, "content_hash": hashlib.sha256(text.encode()).hexdigest()}
+
+
+def test_failed_replacement_keeps_the_old_version(rag):
+    old = _document("Momentum is conserved when no external force acts. " * 20)
+    rag.add_documents([old])
+    old_id = rag.list_documents()[0]["document_id"]
+
+    rag.embeddings.fail = True
+    with pytest.raises(RuntimeError):
+        rag.replace_document(old_id, _document("Impulse equals the change in momentum. " * 20))
+
+    assert [d["document_id"] for d in rag.list_documents()] == [old_id]
+    assert rag.vectorstore.count() == rag.get_document(old_id)["chunk_count"]
+    assert "conserved" in rag.search("momentum conserved external force", k=1)[0]["content"]
+
+
+def test_replacement_swaps_versions(rag):
+    rag.add_documents([_document("Momentum is conserved when no external force acts. " * 20)])
+    old_id = rag.list_documents()[0]["document_id"]
+    new = _document("Impulse equals the change in momentum. " * 20)
+
+    assert rag.replace_document(old_id, new)["document_id"] == old_id
+    documents = rag.list_documents()
+    assert [d["content_hash"] for d in documents] == [new["content_hash"]]
+    assert rag.vectorstore.count() == documents[0]["chunk_count"]
@@ -0,0 +1,140 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+from app.utils.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    HedgeBudget,
+    RetryPolicy,
+    call_with_retry,
+    hedged_call,
+)
+
+
+def _failing(errors, result="ok"):
+    """A call that raises each of ``errors`` in turn, then returns ``result``"""
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return call, calls
+
+
+def _retryable(error):
+    return isinstance(error, ConnectionError)
+
+
+NO_WAIT = RetryPolicy(max_retries=3, base_delay=0)
+
+
+def test_retryable_errors_are_retried_until_success():
+    call, calls = _failing([ConnectionError(), ConnectionError()])
+    retried = []
+    assert call_with_retry(call, NO_WAIT, _retryable, on_retry=retried.append) == "ok"
+    assert len(calls) == 3 and len(retried) == 2
+
+
+def test_retries_stop_at_the_limit_and_on_bad_requests():
+    call, calls = _failing([ConnectionError()] * 10)
+    with pytest.raises(ConnectionError):
+        call_with_retry(call, NO_WAIT, _retryable)
+    assert len(calls) == 4
+
+    call, calls = _failing([ValueError("bad request")])
+    with pytest.raises(ValueError):
+        call_with_retry(call, NO_WAIT, _retryable)
+    assert len(calls) == 1
+
+
+def test_backoff_is_capped_and_jittered():
+    policy = RetryPolicy(max_retries=5, base_delay=0.5, max_delay=2.0)
+    delays = [policy.delay(10) for _ in range(200)]
+    assert all(0 <= delay <= 2.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_breaker_opens_fails_fast_and_resets_after_a_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    call, calls = _failing([ConnectionError()] * 2)
+    with pytest.raises(ConnectionError):
+        call_with_retry(call, RetryPolicy(max_retries=1, base_delay=0), _retryable, breaker=breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(call, NO_WAIT, _retryable, breaker=breaker)
+    assert len(calls) == 2 and breaker.retry_after() > 0
+
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert call_with_retry(call, NO_WAIT, _retryable, breaker=breaker) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens_and_only_one_trial_runs():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.before_call()
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()  # the trial
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_bad_requests_do_not_count_against_the_provider():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    call, _ = _failing([ValueError("bad request")] * 3)
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            call_with_retry(call, NO_WAIT, _retryable, breaker=breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_full_pool_runs_the_call_unhedged_in_the_caller():
+    executor = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+    executor.submit(release.wait)  # the only worker is busy
+    try:
+        start = time.monotonic()
+        caller = threading.current_thread()
+        ran_in = []
+        result = hedged_call(lambda: ran_in.append(threading.current_thread()) or "answer", 0.05, executor)
+        assert result == "answer"
+        assert ran_in == [caller]
+        assert time.monotonic() - start < 1.0
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_slow_primary_is_hedged_and_the_faster_copy_wins():
+    executor = ThreadPoolExecutor(max_workers=4)
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    try:
+        assert hedged_call(call, 0.05, executor) == "fast"
+        assert len(calls) == 2
+    finally:
+        executor.shutdown()
+
+
+def test_hedge_budget_limits_hedges_to_a_share_of_calls():
+    budget = HedgeBudget(ratio=0.25, burst=1.0)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    for _ in range(4):
+        budget.record_call()
+    assert budget.try_spend()
@@ -0,0 +1,89 @@
+import pytest
+
+from app.services.retrieval_policy import RetrievalPolicy
+from app.services.tutor_service import TutorService
+
+
+def _results(*scores):
+    return [{"content": f"chunk {i}", "score": score, "metadata": {"source": "notes.pdf"}}
+            for i, score in enumerate(scores)]
+
+
+def _selected(policy, *scores):
+    return [r["content"] for r in policy.select(_results(*scores))]
+
+
+def test_depth_follows_the_score_distribution():
+    policy = RetrievalPolicy(min_k=1, max_k=5, score_threshold=1.4, score_margin=0.3)
+    assert _selected(policy, 0.2, 0.9, 1.0) == ["chunk 0"]  # clear winner
+    assert _selected(policy, 0.8, 0.85, 0.9, 0.95, 1.0, 1.05) == [f"chunk {i}" for i in range(5)]
+    assert _selected(policy, 1.5, 1.6) == []  # unrelated question
+    assert _selected(policy, 1.2, 1.3, 1.5) == ["chunk 0", "chunk 1"]
+
+
+def test_min_k_keeps_relevant_results_beyond_the_margin():
+    policy = RetrievalPolicy(min_k=2, max_k=5, score_threshold=1.4, score_margin=0.1)
+    assert _selected(policy, 0.2, 0.9, 1.0) == ["chunk 0", "chunk 1"]
+    assert _selected(policy, 0.2, 1.5) == ["chunk 0"]
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Hi!", True),
+    ("thank you so much", True),
+    ("Good morning tutor", True),
+    ("hi, what is Newton's second law?", False),
+    ("Thanks to friction, why do cars stop?", False),
+    ("", False),
+])
+def test_small_talk_detection(message, expected):
+    assert RetrievalPolicy.is_small_talk(message) is expected
+
+
+class _RAG:
+    def __init__(self, results):
+        self.results = results
+        self.searches = []
+
+    def search(self, question, k=5):
+        self.searches.append(k)
+        return self.results
+
+
+class _Gemini:
+    def __init__(self):
+        self.prompts = []
+
+    def generate_response(self, prompt, hedge=False):
+        self.prompts.append(prompt)
+        return "answer"
+
+
+def _tutor(results):
+    tutor = TutorService(_RAG(results), adaptive_retrieval=True)
+    tutor.retrieval_policy = RetrievalPolicy(min_k=1, max_k=4, score_threshold=1.4, score_margin=0.3)
+    tutor.gemini_service = _Gemini()
+    return tutor
+
+
+def test_small_talk_skips_retrieval_and_the_model():
+    tutor = _tutor(_results(0.2))
+    response = tutor._answer("hello there")
+    assert response["retrieval"] == {"k": 0, "shortcut": "small_talk"}
+    assert tutor.rag_service.searches == [] and tutor.gemini_service.prompts == []
+
+
+def test_unmatched_question_gets_no_chunks():
+    tutor = _tutor(_results(1.6, 1.7))
+    response = tutor._answer("Who won the 1998 world cup?")
+    assert response["retrieval"] == {"k": 0, "shortcut": "no_context"}
+    assert response["sources"] == []
+    assert "chunk 0" not in tutor.gemini_service.prompts[0]
+
+
+def test_close_match_sends_only_the_selected_chunks():
+    tutor = _tutor(_results(0.3, 0.4, 1.2))
+    response = tutor._answer("What is momentum?")
+    assert tutor.rag_service.searches == [4]
+    assert response["retrieval"]["k"] == 2
+    assert "chunk 1" in tutor.gemini_service.prompts[0]
+    assert "chunk 2" not in tutor.gemini_service.prompts[0]
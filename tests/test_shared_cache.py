@@ -0,0 +1,31 @@
+import time
+
+from app.utils.shared_cache import SharedCache
+
+
+def _rows(cache):
+    return cache._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+def test_expired_rows_are_deleted_every_few_writes(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"), purge_every=10)
+    for i in range(5):
+        cache.set(f"grade:{i}", {"score": i}, ttl=0.01)
+    cache.set("rubric:kept", "Full marks: F = ma")
+    time.sleep(0.02)
+    assert cache.get("grade:0") is None
+    assert _rows(cache) == 6  # expired, but still on disk
+
+    for i in range(4):
+        cache.set(f"pack:{i}", {"sections": []}, ttl=60)
+    assert _rows(cache) == 5  # the tenth write purged the expired grades
+    assert cache.get("rubric:kept") == "Full marks: F = ma"
+
+
+def test_opening_the_cache_purges_expired_rows(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SharedCache(path, purge_every=0)
+    cache.set("generation:mcq:a", [], ttl=0.01)
+    cache.add("claim:b", "worker-1", ttl=60)
+    time.sleep(0.02)
+    assert _rows(SharedCache(path)) == 1
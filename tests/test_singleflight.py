@@ -0,0 +1,83 @@
+import threading
+import time
+
+from app.utils.singleflight import FLIGHTS, SingleFlight, flight_key
+
+
+def _wait_for_followers(name, count):
+    deadline = time.monotonic() + 5
+    while FLIGHTS.value(group=name, outcome="coalesced") < count and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def _concurrently(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def test_concurrent_identical_calls_run_once():
+    flight = SingleFlight("test-identical")
+    entered, release = threading.Event(), threading.Event()
+    runs, results = [], []
+
+    def work():
+        runs.append(1)
+        entered.set()
+        release.wait(5)
+        return "answer"
+
+    leader = _concurrently(1, lambda: results.append(flight.do("k", work)))
+    entered.wait(5)
+    followers = _concurrently(7, lambda: results.append(flight.do("k", work)))
+    _wait_for_followers("test-identical", 7)
+    release.set()
+    for thread in leader + followers:
+        thread.join(5)
+
+    assert results == ["answer"] * 8
+    assert len(runs) == 1
+    assert flight.in_flight() == 0
+    assert flight.do("k", lambda: "fresh") == "fresh"  # nothing is cached afterwards
+
+
+def test_waiters_receive_the_leaders_error():
+    flight = SingleFlight("test-error")
+    entered, release = threading.Event(), threading.Event()
+    errors = []
+
+    def work():
+        entered.set()
+        release.wait(5)
+        raise ValueError("model down")
+
+    def call():
+        try:
+            flight.do("k", work)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = _concurrently(1, call)
+    entered.wait(5)
+    threads += _concurrently(3, call)
+    _wait_for_followers("test-error", 3)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert errors == ["model down"] * 4
+
+
+def test_different_keys_do_not_wait_on_each_other():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    _concurrently(1, lambda: flight.do("slow", lambda: release.wait(5)))
+    try:
+        assert flight.do("other", lambda: 42) == 42
+    finally:
+        release.set()
+
+
+def test_flight_key_normalizes_text():
+    assert flight_key("What is  Momentum?", 3) == flight_key("what is momentum?", 3)
+    assert flight_key("momentum", 3) != flight_key("momentum", 4)
@@ -0,0 +1,30 @@
+import numpy as np
+
+from app.services.topic_index import cluster_topics
+
+
+def _cluster(center, rows, rng):
+    vectors = (center + 0.1 * rng.normal(size=(rows, len(center)))).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_topic_ids_survive_a_rebuild_that_reorders_topics():
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(3, 16))
+    vectors = np.concatenate([_cluster(center, 30, rng) for center in centers])
+    ids = [f"c{i}" for i in range(90)]
+    before, _, _ = cluster_topics(ids, ["momentum"] * 90, [{}] * 90, vectors, 3)
+
+    # New chunks make the second cluster the largest, so it moves to the front
+    extra = _cluster(centers[1], 40, rng)
+    after, _, _ = cluster_topics(ids + [f"e{i}" for i in range(40)], ["momentum"] * 130, [{}] * 130,
+                                 np.concatenate([vectors, extra]), 3)
+
+    grown = {f"c{i}" for i in range(30, 60)}
+    before_ids = {t["topic_id"] for t in before if not set(t["representatives"]) & grown}
+    after_ids = {t["topic_id"] for t in after}
+    assert len(before_ids) == 2 and before_ids <= after_ids
+    # The grown cluster is a different topic now: its old id is gone
+    (old,) = [t["topic_id"] for t in before if set(t["representatives"]) & grown]
+    assert old not in after_ids
+    assert after[0]["size"] == 70
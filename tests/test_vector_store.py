@@ -0,0 +1,126 @@
+import threading
+
+import numpy as np
+import pytest
+
+from app.services.vector_store import NumpyVectorStore, create_vector_store
+
+
+class _NoEmbeddings:
+    def embed_documents(self, texts):
+        raise AssertionError("vectors are passed in explicitly")
+
+
+class _AxisEmbeddings:
+    """Each text is the index of its axis, so the expected neighbour is known"""
+
+    def __init__(self, dim=8):
+        self.dim = dim
+
+    def _vector(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        vector[int(text.split()[-1]) % self.dim] = 1.0
+        vector[(int(text.split()[-1]) + 1) % self.dim] = 0.1
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+def _unit_rows(rng, n, dim):
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_search_during_persist_returns_the_right_chunks(tmp_path):
+    rng = np.random.default_rng(0)
+    dim = 32
+    store = NumpyVectorStore(str(tmp_path), _NoEmbeddings(), codec="float32")
+    old = _unit_rows(rng, 20000, dim)
+    store.add_texts([f"old{i}" for i in range(len(old))], embeddings=old, ids=[f"old{i}" for i in range(len(old))])
+    store.persist()
+
+    new = _unit_rows(rng, 5, dim)
+    errors = []
+    stop = threading.Event()
+
+    def search():
+        while not stop.is_set():
+            try:
+                doc, score = store.similarity_search_by_vector_with_score(new[0], k=1)[0]
+                if doc.page_content != "new0":
+                    errors.append(doc.page_content)
+            except Exception as e:  # any race surfaces here
+                errors.append(repr(e))
+
+    store.add_texts([f"new{i}" for i in range(5)], embeddings=new, ids=[f"new{i}" for i in range(5)])
+    threads = [threading.Thread(target=search) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        for round_ in range(5):
+            store.persist()
+            extra = _unit_rows(rng, 50, dim)
+            store.add_texts([f"extra{round_}_{i}" for i in range(50)], embeddings=extra)
+            store.delete([f"old{round_ * 1000 + i}" for i in range(1000)])
+        store.persist()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert errors == []
+    assert store.similarity_search_by_vector_with_score(new[0], k=1)[0][0].page_content == "new0"
+
+
+def test_deleting_a_batch_removes_every_chunk_of_it(tmp_path):
+    rng = np.random.default_rng(1)
+    store = NumpyVectorStore(str(tmp_path), _NoEmbeddings(), codec="float32")
+    store.add_texts(["a0", "a1", "a2"], embeddings=_unit_rows(rng, 3, 8), ids=["a:0", "a:1", "a:2"])
+    store.add_texts(["b0", "b1"], embeddings=_unit_rows(rng, 2, 8), ids=["b:0", "b:1"])
+    store.persist()
+
+    assert [doc.page_content for doc in store.get(["a:1", "b:1"])] == ["a1", "b1"]
+    store.delete(["a:0", "a:1", "a:2"])
+    store.persist()
+    assert store.count() == 2
+    assert [row for batch in store.iter_rows() for row in batch[0]] == ["b:0", "b:1"]
+
+
+@pytest.mark.parametrize("backend", ["numpy", "faiss"])
+def test_local_backends_search_persist_and_reload(tmp_path, backend):
+    if backend == "faiss":
+        pytest.importorskip("faiss")
+    embeddings = _AxisEmbeddings()
+    store = create_vector_store(backend, str(tmp_path), embeddings)
+    texts = [f"chunk {i}" for i in range(6)]
+    store.add_texts(texts, [{"source": "notes.pdf", "i": i} for i in range(6)], ids=[f"n:{i}" for i in range(6)])
+
+    doc, score = store.similarity_search_with_score("query 3", k=2)[0]
+    assert doc.page_content == "chunk 3" and doc.metadata["i"] == 3
+    assert abs(score) < 1e-5  # squared L2 between unit vectors: 0 for the same direction
+    store.delete(["n:3"])
+    store.persist()
+
+    reopened = create_vector_store(backend, str(tmp_path), embeddings)
+    assert reopened.count() == 5
+    assert reopened.get(["n:3", "n:4"])[0] is None
+    assert reopened.similarity_search("query 4", k=1)[0].page_content == "chunk 4"
+    assert "chunk 3" not in [d.page_content for d in reopened.similarity_search("query 3", k=5)]
+
+
+def test_readding_an_id_replaces_the_chunk(tmp_path):
+    store = NumpyVectorStore(str(tmp_path), _AxisEmbeddings(), codec="float32")
+    store.add_texts(["chunk 1"], ids=["a"])
+    store.add_texts(["chunk 5"], ids=["a"])
+    assert store.count() == 1
+    assert store.get(["a"])[0].page_content == "chunk 5"
+    assert store.similarity_search("query 1", k=5)[0].page_content == "chunk 5"
+
+
+def test_unknown_backend_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        create_vector_store("milvus", str(tmp_path), _AxisEmbeddings())